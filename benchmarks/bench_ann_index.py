@@ -0,0 +1,85 @@
+"""Rapport rappel / latence des types d'index FAISS par rapport à l'index flat.
+
+    python benchmarks/bench_ann_index.py --vectors 100000 --queries 1000
+    python benchmarks/bench_ann_index.py --embeddings models/unified_index.bin
+
+Sans --embeddings, un corpus synthétique (mélange de gaussiennes normalisées, dimension
+384 comme all-MiniLM-L6-v2) est généré. Les requêtes sont des vecteurs du corpus bruités.
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from ann_index import INDEX_TYPES, build_index, resolve_index_config  # noqa: E402
+
+
+def synthetic_embeddings(n_vectors, dimension, seed=0):
+    rng = np.random.default_rng(seed)
+    n_clusters = max(10, n_vectors // 500)
+    centers = rng.standard_normal((n_clusters, dimension)).astype("float32")
+    data = centers[rng.integers(0, n_clusters, n_vectors)]
+    data += 0.35 * rng.standard_normal(data.shape).astype("float32")
+    faiss.normalize_L2(data)
+    return data
+
+
+def make_queries(embeddings, n_queries, seed=1):
+    rng = np.random.default_rng(seed)
+    queries = embeddings[rng.integers(0, len(embeddings), n_queries)].copy()
+    queries += 0.05 * rng.standard_normal(queries.shape).astype("float32")
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def index_size_mb(index):
+    return faiss.serialize_index(index).nbytes / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--vectors", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--embeddings", help="Index FAISS existant dont les vecteurs servent de corpus")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        source = faiss.read_index(args.embeddings)
+        embeddings = source.reconstruct_n(0, source.ntotal)
+    else:
+        embeddings = synthetic_embeddings(args.vectors, args.dimension)
+    queries = make_queries(embeddings, args.queries)
+    k = min(args.top_k, len(embeddings))
+
+    print(f"Corpus: {len(embeddings)} vecteurs, dimension {embeddings.shape[1]}, {len(queries)} requêtes, k={k}\n")
+    print(f"{'Index':<8} {'Paramètres':<44} {'Construction':>12} {'Latence/req':>12} {'Rappel@k':>9} {'Taille':>9}")
+
+    ground_truth = None
+    for index_type in INDEX_TYPES:
+        config = resolve_index_config(index_type, len(embeddings), embeddings.shape[1])
+        start = time.perf_counter()
+        index = build_index(embeddings, config)
+        build_time = time.perf_counter() - start
+
+        # Requêtes une par une, comme dans l'application
+        start = time.perf_counter()
+        results = np.vstack([index.search(q[None, :], k)[1] for q in queries])
+        latency_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        if ground_truth is None:
+            ground_truth = results
+        recall = np.mean([len(set(r) & set(g)) / k for r, g in zip(results, ground_truth)])
+        params = ", ".join(f"{key}={value}" for key, value in config["params"].items()) or "-"
+        print(f"{index_type:<8} {params:<44} {build_time:>10.2f} s {latency_ms:>9.3f} ms "
+              f"{recall:>9.3f} {index_size_mb(index):>6.1f} Mo")
+
+
+if __name__ == "__main__":
+    main()
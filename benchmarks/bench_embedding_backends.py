@@ -0,0 +1,75 @@
+"""Latence d'encodage des requêtes et écart de score cosinus des backends d'embeddings.
+
+    python src/embedding_backends.py models/onnx      # export ONNX (fp32 et int8), une fois
+    python benchmarks/bench_embedding_backends.py --queries 200
+
+Chaque backend est chargé dans le même processus (temps de chargement, imports compris
+pour le premier), puis encode les requêtes une par une comme l'application. L'écart est
+mesuré sur les cosinus requête/passage par rapport au backend sentence-transformers.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from embedding_backends import BACKENDS, load_embedding_backend  # noqa: E402
+
+QUERIES = [
+    "Comment transformer une demande d'achat en devis ?",
+    "réception d'une commande fournisseur",
+    "validation budgétaire d'un engagement",
+    "où trouver les factures en attente de paiement",
+    "créer un nouveau fournisseur dans le référentiel",
+]
+PASSAGES = [
+    "Transformer une demande d'achat en devis depuis le pavé Achats, puis valider le devis.",
+    "Recherche des réceptions par fournisseur : passer par la recherche avancée sur 60 jours.",
+    "La validation budgétaire est requise avant tout engagement de dépense.",
+    "Les factures en attente sont listées dans l'onglet Comptabilité fournisseurs.",
+    "La création d'un fournisseur nécessite le SIRET et un RIB validé.",
+]
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--onnx-dir", default=None)
+    args = parser.parse_args()
+
+    queries = [QUERIES[i % len(QUERIES)] + f" {i}" for i in range(args.queries)]
+    print(f"{'Backend':<22} {'Chargement':>11} {'p50':>9} {'p95':>9} {'Requêtes/s':>11} {'Écart cosinus max':>18}")
+
+    reference = None
+    for name in args.backends:
+        start = time.perf_counter()
+        backend = load_embedding_backend(name, onnx_dir=args.onnx_dir)
+        load_time = time.perf_counter() - start
+
+        backend.encode(queries[:5])  # Préchauffage
+        timings = []
+        for query in queries:
+            start = time.perf_counter()
+            backend.encode([query])
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+
+        scores = backend.encode(QUERIES) @ backend.encode(PASSAGES).T
+        if reference is None:
+            reference = scores
+        deviation = float(np.abs(scores - reference).max())
+        print(f"{name:<22} {load_time:>9.2f} s {statistics.median(timings):>6.2f} ms "
+              f"{percentile(timings, 0.95):>6.2f} ms {1000 * len(timings) / sum(timings):>11.1f} {deviation:>18.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Compare un ChatCompletionsClient créé à chaque requête et le ChatClientManager partagé.
+
+    python benchmarks/bench_llm_client.py --requests 200
+
+Le serveur factice tourne en HTTP local: le gain mesuré correspond à la création du
+client et de la connexion TCP; en production, la poignée de main TLS s'y ajoute.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from azure.ai.inference import ChatCompletionsClient  # noqa: E402
+from azure.ai.inference.models import UserMessage  # noqa: E402
+from azure.core.credentials import AzureKeyCredential  # noqa: E402
+
+from fake_llm_server import FakeLLMServer  # noqa: E402
+from llm import ChatClientManager  # noqa: E402
+
+MESSAGES = [UserMessage(content="Comment transformer une demande d'achat en devis ?")]
+
+
+def run(label, complete, n_requests):
+    timings = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        complete(messages=MESSAGES, model="fake", max_tokens=10)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    print(f"{label:<22} moyenne {statistics.mean(timings):7.2f} ms | "
+          f"p50 {timings[len(timings) // 2]:7.2f} ms | p95 {timings[int(len(timings) * 0.95) - 1]:7.2f} ms")
+    return statistics.mean(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence simulée du LLM en secondes")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(("127.0.0.1", 0), latency=args.latency).start()
+
+    def complete_new_client(**kwargs):
+        client = ChatCompletionsClient(endpoint=server.endpoint, credential=AzureKeyCredential("fake"))
+        with client:
+            return client.complete(**kwargs)
+
+    baseline = run("Client par requête", complete_new_client, args.requests)
+    connections_before = len(server.connections)
+
+    manager = ChatClientManager(endpoint=server.endpoint, api_key="fake")
+    pooled = run("Client partagé (pool)", manager.complete, args.requests)
+    pooled_connections = len(server.connections) - connections_before
+
+    print(f"Gain par requête: {baseline - pooled:.2f} ms ({(1 - pooled / baseline) * 100:.1f}%)")
+    print(f"Connexions ouvertes par le client partagé: {pooled_connections} pour {args.requests} requêtes")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
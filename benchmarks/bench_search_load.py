@@ -0,0 +1,352 @@
+"""Test de charge de bout en bout de /search: vrai serveur, LLM factice, corpus synthétique.
+
+    python benchmarks/make_corpus.py /tmp/corpus-100k --chunks 100000
+    python benchmarks/bench_search_load.py --models-dir /tmp/corpus-100k --concurrency 1 8 32
+    python benchmarks/bench_search_load.py --models-dir /tmp/corpus-100k --server uvicorn \\
+        --workers 4 --llm-latency 0.8 --json resultats.json
+
+Le script démarre le serveur LLM factice (fake_llm_server.py, latence configurable), puis
+l'application dans un sous-processus (gunicorn gthread, gunicorn + UvicornWorker ou uvicorn)
+avec MODELS_DIR pointant sur le corpus, attend /readyz, se connecte et envoie des requêtes
+/search à concurrence fixe (un thread et une connexion keep-alive par client). Pour chaque
+niveau: latences p50/p95/p99, débit, erreurs, et mémoire maximale (RSS et PSS, qui répartit
+les pages partagées) de chaque processus du serveur.
+
+Les questions sont toutes distinctes par défaut (caches de vecteurs et de réponses manqués);
+--distinct N les fait tourner sur N questions pour mesurer l'effet des caches. Le modèle
+d'embeddings réel est chargé par l'application (EMBEDDING_BACKEND est transmis).
+"""
+import argparse
+import itertools
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from fake_llm_server import FakeLLMServer  # noqa: E402
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SERVERS = ("gunicorn", "gunicorn-asgi", "uvicorn")
+
+QUESTIONS = [
+    "Comment transformer une demande d'achat en devis ?",
+    "réception d'une commande fournisseur",
+    "validation budgétaire d'un engagement",
+    "où trouver les factures en attente de paiement",
+    "créer un nouveau fournisseur dans le référentiel",
+    "relance d'une échéance de règlement",
+    "imputation analytique d'une dépense de formation",
+    "circuit de signature d'un contrat de marché",
+]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_command(server, port, workers, threads):
+    """Commande et variables d'environnement propres à chaque mode de service."""
+    if server == "uvicorn":
+        return [sys.executable, "-m", "uvicorn", "asgi_app:application", "--app-dir", "src",
+                "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers),
+                "--log-level", "warning"], {}
+    env = {
+        "GUNICORN_BIND": f"127.0.0.1:{port}",
+        "GUNICORN_WORKERS": str(workers),
+        "GUNICORN_THREADS": str(threads),
+    }
+    if server == "gunicorn-asgi":
+        env.update(GUNICORN_APP="asgi_app:application", GUNICORN_WORKER_CLASS="uvicorn.workers.UvicornWorker")
+    return [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"], env
+
+
+def start_server(args, port, llm_endpoint, log_file):
+    command, extra_env = server_command(args.server, port, args.workers, args.threads)
+    env = dict(os.environ)
+    env.update(extra_env)
+    env.update({
+        "MODELS_DIR": os.path.abspath(args.models_dir),
+        "AZURE_INFERENCE_SDK_ENDPOINT": llm_endpoint,
+        "AZURE_OPENAI_API_KEY": "fake",
+        "DEPLOYMENT_NAME": "fake",
+        # Même clé de session dans tous les workers (sinon le cookie n'est valide que dans un seul)
+        "FLASK_SECRET_KEY": "bench-search-load",
+        "ARTIFACT_WATCH_INTERVAL": "0",
+    })
+    return subprocess.Popen(command, cwd=REPO_DIR, env=env, stdout=log_file, stderr=subprocess.STDOUT)
+
+
+def wait_ready(process, base_url, timeout, log_path):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté (code {process.returncode}), voir {log_path}")
+        try:
+            if requests.get(base_url + "/readyz", timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"Serveur non prêt après {timeout:.0f} s")
+
+
+def login(base_url, username, password):
+    """Se connecte et retourne les cookies de session."""
+    response = requests.post(base_url + "/login", data={"username": username, "password": password},
+                             allow_redirects=False, timeout=10)
+    if response.status_code != 302:
+        raise RuntimeError(f"Connexion refusée pour {username} (HTTP {response.status_code})")
+    return response.cookies
+
+
+def make_question(i, distinct):
+    if distinct:
+        i %= distinct
+    return f"{QUESTIONS[i % len(QUESTIONS)]} (variante {i})"
+
+
+def process_tree(pid):
+    """pid et tous ses descendants (lecture de /proc, Linux uniquement)."""
+    children = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                # Le nom du processus (entre parenthèses) peut contenir des espaces
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        children.setdefault(int(fields[1]), []).append(int(name))
+    tree, pending = [], [pid]
+    while pending:
+        current = pending.pop()
+        tree.append(current)
+        pending.extend(children.get(current, []))
+    return tree
+
+
+def process_role(pid, server_pid):
+    if pid == server_pid:
+        return "maître"
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            command = f.read()
+    except OSError:
+        return "worker"
+    # Suivi des ressources de multiprocessing (uvicorn --workers): ne sert aucune requête
+    return "auxiliaire" if b"resource_tracker" in command else "worker"
+
+
+def memory_kb(pid):
+    """(RSS, PSS) en Ko; PSS vaut None sans /proc/<pid>/smaps_rollup."""
+    rss = pss = None
+    with open(f"/proc/{pid}/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                rss = int(line.split()[1])
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    return rss, pss
+
+
+class MemorySampler:
+    """Relève périodiquement le maximum de RSS/PSS de chaque processus du serveur."""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.peaks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def sample(self):
+        for pid in process_tree(self.pid):
+            try:
+                rss, pss = memory_kb(pid)
+            except OSError:
+                continue
+            peak = self.peaks.setdefault(pid, {"role": process_role(pid, self.pid), "rss_kb": 0, "pss_kb": 0})
+            peak["rss_kb"] = max(peak["rss_kb"], rss or 0)
+            peak["pss_kb"] = max(peak["pss_kb"], pss or 0)
+
+    def start(self):
+        self.peaks = {}
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="memory-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.sample()
+        return self.peaks
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+
+def run_level(url, cookies, concurrency, duration, warmup, counter, distinct, timeout):
+    """Envoie des requêtes avec concurrency clients pendant warmup + duration secondes.
+
+    Seules les requêtes commencées après le préchauffage sont comptées.
+    """
+    start = time.perf_counter()
+    measure_from = start + warmup
+    deadline = measure_from + duration
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def client():
+        with requests.Session() as session:
+            session.cookies.update(cookies)
+            while True:
+                sent = time.perf_counter()
+                if sent >= deadline:
+                    return
+                question = make_question(next(counter), distinct)
+                try:
+                    response = session.post(url, json={"query": question}, timeout=timeout)
+                    response.content
+                    error = None if response.status_code == 200 else f"HTTP {response.status_code}"
+                except requests.RequestException as e:
+                    error = type(e).__name__
+                elapsed = time.perf_counter() - sent
+                if sent < measure_from:
+                    continue
+                with lock:
+                    if error:
+                        errors.append(error)
+                    else:
+                        latencies.append(elapsed * 1000)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    # Fenêtre réelle: les dernières requêtes se terminent après l'échéance
+    window = max(time.perf_counter(), deadline) - measure_from
+
+    latencies.sort()
+    result = {"concurrency": concurrency, "requests": len(latencies), "errors": len(errors),
+              "throughput": len(latencies) / window}
+    if latencies:
+        result.update(p50_ms=percentile(latencies, 0.50), p95_ms=percentile(latencies, 0.95),
+                      p99_ms=percentile(latencies, 0.99), max_ms=latencies[-1])
+    if errors:
+        result["error_kinds"] = {kind: errors.count(kind) for kind in sorted(set(errors))}
+    return result
+
+
+def print_level(result, peaks):
+    if result["requests"]:
+        print(f"{result['concurrency']:>6} {result['requests']:>9} {result['errors']:>7} "
+              f"{result['throughput']:>9.1f} {result['p50_ms']:>9.1f} {result['p95_ms']:>9.1f} "
+              f"{result['p99_ms']:>9.1f} {result['max_ms']:>9.1f}")
+    else:
+        print(f"{result['concurrency']:>6} {0:>9} {result['errors']:>7}   aucune réponse valide")
+    if result.get("error_kinds"):
+        print("       erreurs: " + ", ".join(f"{kind} x{count}" for kind, count in result["error_kinds"].items()))
+    for pid, peak in sorted(peaks.items()):
+        pss = f", PSS {peak['pss_kb'] / 1024:.0f} Mo" if peak["pss_kb"] else ""
+        print(f"       {peak['role']} {pid}: RSS {peak['rss_kb'] / 1024:.0f} Mo{pss}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models-dir", required=True, help="Corpus créé par make_corpus.py (ou un vrai models/)")
+    parser.add_argument("--server", default="gunicorn", choices=SERVERS)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=4, help="Threads par worker gunicorn (gthread)")
+    parser.add_argument("--endpoint", default="/search", choices=("/search", "/search/stream"))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--duration", type=float, default=30.0, help="Durée mesurée par niveau (secondes)")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Préchauffage non mesuré par niveau (secondes)")
+    parser.add_argument("--distinct", type=int, default=0,
+                        help="Nombre de questions distinctes (0: toutes différentes, caches manqués)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Latence simulée du LLM (secondes)")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="Délai entre fragments du LLM factice en streaming (secondes)")
+    parser.add_argument("--username", default="admin")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--startup-timeout", type=float, default=600.0)
+    parser.add_argument("--request-timeout", type=float, default=120.0)
+    parser.add_argument("--server-log", default=None, help="Journal du serveur (défaut: fichier temporaire)")
+    parser.add_argument("--json", default=None, help="Écrit les résultats dans ce fichier JSON")
+    args = parser.parse_args()
+
+    llm_server = FakeLLMServer(("127.0.0.1", 0), latency=args.llm_latency,
+                               token_latency=args.token_latency).start()
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    log_path = args.server_log or tempfile.mkstemp(prefix="bench-search-", suffix=".log")[1]
+    log_file = open(log_path, "wb")
+    process = start_server(args, port, llm_server.endpoint, log_file)
+    sampler = MemorySampler(process.pid)
+    measure_memory = os.path.isdir("/proc")
+    results = []
+    try:
+        start = time.perf_counter()
+        wait_ready(process, base_url, args.startup_timeout, log_path)
+        startup_seconds = time.perf_counter() - start
+        cookies = login(base_url, args.username, args.password)
+        print(f"Serveur {args.server} ({args.workers} workers) prêt en {startup_seconds:.1f} s, "
+              f"LLM factice {args.llm_latency}s, journal: {log_path}")
+        print(f"{'Conc.':>6} {'Requêtes':>9} {'Erreurs':>7} {'Req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+              f"{'p99 ms':>9} {'max ms':>9}")
+
+        counter = itertools.count()
+        for concurrency in args.concurrency:
+            if measure_memory:
+                sampler.start()
+            result = run_level(base_url + args.endpoint, cookies, concurrency, args.duration, args.warmup,
+                               counter, args.distinct, args.request_timeout)
+            peaks = sampler.stop() if measure_memory else {}
+            result["memory"] = {str(pid): peak for pid, peak in sorted(peaks.items())}
+            results.append(result)
+            print_level(result, peaks)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        log_file.close()
+        llm_server.shutdown()
+
+    if args.json:
+        report = {
+            "settings": {key: value for key, value in vars(args).items() if key != "json"},
+            "startup_seconds": startup_seconds,
+            "llm_requests": llm_server.request_count,
+            "levels": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"Résultats écrits dans {args.json}")
+
+
+if __name__ == "__main__":
+    main()
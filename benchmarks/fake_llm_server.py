@@ -0,0 +1,144 @@
+"""Serveur local imitant l'API chat completions d'Azure AI Inference.
+
+Utilisé par les benchmarks pour mesurer l'application sans appeler Azure:
+
+    python benchmarks/fake_llm_server.py --port 8099 --latency 0.5
+
+puis AZURE_INFERENCE_SDK_ENDPOINT=http://127.0.0.1:8099 dans l'environnement.
+"""
+import argparse
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_ANSWER = (
+    "<p>Voici les documents en relation avec votre question :</p>"
+    "<ul><li><strong>Document de test</strong><br />"
+    "<em>Description :</em> Réponse générée par le serveur factice.</li></ul>"
+)
+
+
+def make_handler(latency=0.0, answer=DEFAULT_ANSWER, token_latency=0.0):
+    class FakeCompletionsHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 pour permettre le keep-alive côté client
+        protocol_version = "HTTP/1.1"
+        # Évite les 40 ms de délai Nagle/ACK retardé entre en-têtes et corps en keep-alive
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            self.server.record_request(self.client_address)
+            if latency:
+                time.sleep(latency)
+            if body.get("stream"):
+                self._stream(body)
+                return
+
+            payload = json.dumps({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": answer},
+                }],
+                "usage": {"prompt_tokens": 100, "completion_tokens": 50, "total_tokens": 150},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _write_chunk(self, data):
+            self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+            self.wfile.flush()
+
+        def _stream(self, body):
+            """Réponse en Server-Sent Events, un fragment par mot (encodage chunked)."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            words = answer.split(" ")
+            for i, word in enumerate(words):
+                if token_latency:
+                    time.sleep(token_latency)
+                update = {
+                    "id": "chatcmpl-fake",
+                    "created": int(time.time()),
+                    "model": body.get("model", "fake"),
+                    "choices": [{
+                        "index": 0,
+                        "delta": {"role": "assistant", "content": word + (" " if i < len(words) - 1 else "")},
+                        "finish_reason": "stop" if i == len(words) - 1 else None,
+                    }],
+                }
+                self._write_chunk(f"data: {json.dumps(update)}\n\n".encode("utf-8"))
+            self._write_chunk(b"data: [DONE]\n\n")
+            self._write_chunk(b"")
+
+    return FakeCompletionsHandler
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Serveur HTTP multi-thread qui compte les requêtes et les connexions distinctes."""
+
+    daemon_threads = True
+
+    def __init__(self, address, latency=0.0, answer=DEFAULT_ANSWER, token_latency=0.0):
+        super().__init__(address, make_handler(latency, answer, token_latency))
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.connections = set()
+
+    def record_request(self, client_address):
+        with self._lock:
+            self.request_count += 1
+            self.connections.add(client_address)
+
+    def handle_error(self, request, client_address):
+        # Connexion keep-alive fermée par le client: sans intérêt pour les mesures
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+    @property
+    def endpoint(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        """Démarre le serveur dans un thread d'arrière-plan et le retourne."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence simulée en secondes")
+    parser.add_argument("--token-latency", type=float, default=0.0,
+                        help="Délai entre deux fragments en mode streaming (secondes)")
+    args = parser.parse_args()
+
+    server = FakeLLMServer((args.host, args.port), latency=args.latency, token_latency=args.token_latency)
+    print(f"Serveur LLM factice sur {server.endpoint} (latence {args.latency}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Génère un corpus synthétique au format des artefacts unifiés, pour les tests de charge.
+
+    python benchmarks/make_corpus.py /tmp/corpus-100k --chunks 100000
+    python benchmarks/make_corpus.py /tmp/corpus-1m --chunks 1000000 --index-type hnsw
+
+Le dossier produit est un dossier models/ versionné (CURRENT + versions/<version>, avec
+manifeste), servi par l'application avec MODELS_DIR=<dossier>. Il contient l'index FAISS
+et sa configuration, les chunks et métadonnées au format compact et l'index mots-clés
+(pas d'ancien JSON/pickle). Les textes suivent une distribution de Zipf sur un vocabulaire
+métier; les vecteurs sont un mélange de gaussiennes normalisées (dimension 384 comme
+all-MiniLM-L6-v2): les réponses n'ont pas de sens, seuls les coûts sont réalistes.
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import artifact_versions  # noqa: E402
+from ann_index import INDEX_TYPES, build_index, resolve_index_config, save_index_config  # noqa: E402
+from artifact_store import write_artifacts  # noqa: E402
+from bench_ann_index import synthetic_embeddings  # noqa: E402
+from keyword_index import KeywordIndex  # noqa: E402
+
+# Mêmes noms de fichiers que create_unified_vectordb.py / app_unified.py
+INDEX_FILE = "unified_index.bin"
+INDEX_CONFIG_FILE = "unified_index_config.json"
+KEYWORDS_FILE = "unified_keywords.pkl"
+
+WORDS = (
+    "achat devis commande fournisseur facture paiement réception engagement budget validation "
+    "demande article catalogue contrat marché service comptabilité référentiel siret rib "
+    "avoir livraison stock inventaire immobilisation amortissement exercice clôture tiers "
+    "centre coût analytique imputation workflow circuit signature approbation rejet relance "
+    "échéance règlement virement mandat titre recette dépense crédit dotation formation "
+    "stagiaire session plateau technique agence région direction utilisateur profil droit "
+    "écran menu onglet recherche filtre export import modèle procédure guide étape"
+).split()
+CATEGORIES = ("Documentation", "Procédure", "FAQ", "Guide utilisateur", "Note de service")
+
+
+def synthetic_texts(n_chunks, words_per_chunk, vocabulary_size, seed=0):
+    """Textes de words_per_chunk mots tirés selon une loi de Zipf (mots métier les plus fréquents)."""
+    rng = np.random.default_rng(seed)
+    vocabulary = WORDS + [f"terme{i}" for i in range(max(0, vocabulary_size - len(WORDS)))]
+    ranks = np.arange(1, len(vocabulary) + 1)
+    weights = 1.0 / ranks
+    weights /= weights.sum()
+    vocabulary = np.asarray(vocabulary, dtype=object)
+    texts = []
+    block = 10000
+    for start in range(0, n_chunks, block):
+        size = min(block, n_chunks - start)
+        ids = rng.choice(len(vocabulary), size=(size, words_per_chunk), p=weights)
+        texts.extend(" ".join(row) for row in vocabulary[ids])
+    return texts
+
+
+def synthetic_metadata(n_chunks, chunks_per_document=20, seed=0):
+    """Métadonnées à la forme de celles du script d'indexation (titre, catégorie, page, url)."""
+    rng = np.random.default_rng(seed)
+    metadata = []
+    for i in range(n_chunks):
+        document = i // chunks_per_document
+        meta = {
+            "source": f"documents/doc_{document:07d}.pdf",
+            "title": f"Document {document} - {WORDS[document % len(WORDS)]}",
+            "category": CATEGORIES[document % len(CATEGORIES)],
+            "page": int(i % chunks_per_document) + 1,
+        }
+        if rng.random() < 0.3:
+            meta["url"] = f"https://documentation.example/doc/{document}"
+            meta["url_category"] = meta["category"]
+        metadata.append(meta)
+    return metadata
+
+
+def make_corpus(models_dir, n_chunks, index_type="flat", dimension=384, words_per_chunk=120,
+                vocabulary_size=5000, seed=0):
+    """Écrit et publie une version d'artefacts synthétiques dans models_dir.
+
+    Retourne (version, durée de chaque étape en secondes).
+    """
+    timings = {}
+    start = time.perf_counter()
+    chunks = synthetic_texts(n_chunks, words_per_chunk, vocabulary_size, seed)
+    metadata = synthetic_metadata(n_chunks, seed=seed)
+    timings["textes"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    embeddings = synthetic_embeddings(n_chunks, dimension, seed)
+    config = resolve_index_config(index_type, n_chunks, dimension)
+    index = build_index(embeddings, config)
+    del embeddings
+    timings["index"] = time.perf_counter() - start
+
+    os.makedirs(models_dir, exist_ok=True)
+    version, directory = artifact_versions.create_version(models_dir)
+    try:
+        start = time.perf_counter()
+        faiss.write_index(index, os.path.join(directory, INDEX_FILE))
+        save_index_config(config, os.path.join(directory, INDEX_CONFIG_FILE))
+        write_artifacts(directory, chunks, metadata)
+        timings["écriture"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        KeywordIndex.build(chunks, metadata).save(os.path.join(directory, KEYWORDS_FILE))
+        timings["mots-clés"] = time.perf_counter() - start
+
+        artifact_versions.commit_version(models_dir, version, {
+            "vectors": index.ntotal, "chunks": len(chunks), "metadata": len(metadata)
+        })
+    except BaseException:
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+    artifact_versions.publish(models_dir, version)
+    return version, timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("models_dir", help="Dossier models/ à créer (ou à compléter d'une nouvelle version)")
+    parser.add_argument("--chunks", type=int, default=10000)
+    parser.add_argument("--index-type", default="flat", choices=INDEX_TYPES)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--words-per-chunk", type=int, default=120)
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Taille du vocabulaire")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    version, timings = make_corpus(args.models_dir, args.chunks, args.index_type, args.dimension,
+                                   args.words_per_chunk, args.vocabulary, args.seed)
+    directory = artifact_versions.version_dir(args.models_dir, version)
+    size = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+    print(f"Version {version}: {args.chunks} chunks, index {args.index_type}, {size / 1e6:.1f} Mo")
+    print("  " + ", ".join(f"{step} {seconds:.1f} s" for step, seconds in timings.items()))
+    print(f"Servir avec: MODELS_DIR={args.models_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Configuration gunicorn de l'application.
+
+    gunicorn -c gunicorn.conf.py
+
+preload_app: l'application (modèle d'embeddings, index FAISS, chunks, métadonnées) est
+chargée une seule fois dans le processus maître, qui attend la fin du chargement avant
+de créer les workers. Les workers héritent de ces données en lecture seule et partagent
+les mêmes pages mémoire (copy-on-write) au lieu de tout recharger chacun.
+
+Mode ASGI (uvicorn dans gunicorn): GUNICORN_APP=asgi_app:application
+GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker.
+
+Métriques: chaque worker écrit les siennes dans METRICS_DIR (par défaut un dossier
+temporaire propre au port), vidé au démarrage; /metrics les additionne.
+"""
+import os
+import tempfile
+
+pythonpath = "src"
+wsgi_app = os.environ.get("GUNICORN_APP", "app_unified:app")
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:7860")
+workers = int(os.environ.get("GUNICORN_WORKERS", "2"))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+# Réponses LLM en streaming: délai large
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+preload_app = os.environ.get("GUNICORN_PRELOAD", "1") == "1"
+# Délai maximal d'attente du chargement dans le maître avant de créer les workers
+startup_timeout = float(os.environ.get("STARTUP_TIMEOUT", "600"))
+accesslog = "-"
+# Lu par l'application, importée après ce fichier
+os.environ.setdefault("METRICS_DIR", os.path.join(tempfile.gettempdir(), f"chatbot-metrics-{bind.rsplit(':', 1)[-1]}"))
+
+
+def on_starting(server):
+    """Efface les métriques d'une exécution précédente (les compteurs repartent de zéro)."""
+    import metrics
+    metrics.clear_directory(os.environ["METRICS_DIR"])
+
+
+def when_ready(server):
+    """Avec preload_app, attend le chargement en arrière-plan avant la création des workers.
+
+    Un thread ne survit pas au fork: sans cette attente, les workers hériteraient d'un
+    chargement interrompu.
+    """
+    if not server.cfg.preload_app:
+        return
+    import app_unified
+    server.log.info("Attente du chargement du modèle et des artefacts...")
+    if app_unified.startup.wait(startup_timeout):
+        server.log.info("Application prête, création des workers")
+    else:
+        server.log.error("Chargement incomplet: %s", app_unified.startup.report())
+
+
+def post_fork(server, worker):
+    """Worker créé avant la fin du chargement (délai dépassé): il termine le chargement lui-même."""
+    if not server.cfg.preload_app:
+        return
+    import app_unified
+    if not app_unified.startup.ready:
+        worker.log.warning("Chargement incomplet au fork, reprise dans le worker %s", worker.pid)
+        app_unified.startup.restart()
@@ -0,0 +1,196 @@
+import json
+import logging
+import math
+import os
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Types d'index FAISS supportés
+INDEX_TYPES = ("flat", "hnsw", "ivf", "ivfpq", "ivfsq8")
+
+# Nombre minimal de vecteurs d'entraînement par centroïde recommandé par FAISS
+MIN_POINTS_PER_CENTROID = 39
+
+# Métriques: "ip" = produit scalaire sur vecteurs normalisés (cosinus), "l2" = ancien format
+METRICS = {"ip": faiss.METRIC_INNER_PRODUCT, "l2": faiss.METRIC_L2}
+
+
+def resolve_index_config(index_type, n_vectors, dimension, params=None, metric="ip"):
+    """Complète les paramètres d'un type d'index en fonction de la taille du corpus.
+
+    - hnsw: M, efConstruction, efSearch
+    - ivf*: nlist (≈ 4·√N, borné par la taille d'entraînement) et nprobe
+    - ivfpq: pq_m (sous-quantificateurs, doit diviser la dimension) et pq_nbits
+    Retourne un dict {"index_type", "metric", "dimension", "params"} sérialisable en JSON.
+    """
+    index_type = (index_type or "flat").lower()
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Type d'index inconnu: {index_type} (attendu: {', '.join(INDEX_TYPES)})")
+    if metric not in METRICS:
+        raise ValueError(f"Métrique inconnue: {metric} (attendu: {', '.join(METRICS)})")
+    params = {k: v for k, v in (params or {}).items() if v is not None}
+    resolved = {}
+
+    if index_type == "hnsw":
+        resolved["M"] = int(params.get("M", 32))
+        resolved["efConstruction"] = int(params.get("efConstruction", 200))
+        resolved["efSearch"] = int(params.get("efSearch", 64))
+
+    elif index_type.startswith("ivf"):
+        max_nlist = max(1, n_vectors // MIN_POINTS_PER_CENTROID)
+        nlist = int(params.get("nlist") or 4 * math.sqrt(max(n_vectors, 1)))
+        resolved["nlist"] = max(1, min(nlist, max_nlist))
+        resolved["nprobe"] = min(resolved["nlist"], int(params.get("nprobe") or max(1, resolved["nlist"] // 16)))
+
+        if index_type == "ivfpq":
+            pq_m = int(params.get("pq_m") or dimension // 8)
+            while dimension % pq_m:
+                pq_m -= 1
+            resolved["pq_m"] = pq_m
+            # Un sous-quantificateur à 2^nbits centroïdes doit être entraîné sur assez de points
+            nbits = int(params.get("pq_nbits", 8))
+            while nbits > 1 and n_vectors < (1 << nbits) * MIN_POINTS_PER_CENTROID // 4:
+                nbits -= 1
+            resolved["pq_nbits"] = nbits
+
+    return {"index_type": index_type, "metric": metric, "dimension": int(dimension), "params": resolved}
+
+
+def index_config_from_env(n_vectors, dimension):
+    """Lit INDEX_TYPE et les paramètres associés dans l'environnement."""
+    env = os.environ
+    return resolve_index_config(
+        env.get("INDEX_TYPE", "flat"), n_vectors, dimension,
+        {
+            "M": env.get("HNSW_M"),
+            "efConstruction": env.get("HNSW_EF_CONSTRUCTION"),
+            "efSearch": env.get("HNSW_EF_SEARCH"),
+            "nlist": env.get("IVF_NLIST"),
+            "nprobe": env.get("IVF_NPROBE"),
+            "pq_m": env.get("PQ_M"),
+            "pq_nbits": env.get("PQ_NBITS"),
+        }
+    )
+
+
+def normalize_embeddings(embeddings):
+    """Copie float32 contiguë des vecteurs, normalisés L2 (le produit scalaire devient le cosinus)."""
+    embeddings = np.array(embeddings, dtype="float32", order="C", copy=True)
+    faiss.normalize_L2(embeddings)
+    return embeddings
+
+
+def build_index(embeddings, config):
+    """Construit, entraîne si nécessaire et remplit l'index décrit par config.
+
+    Avec la métrique "ip" (par défaut), les vecteurs sont normalisés avant l'ajout:
+    les scores renvoyés par l'index sont alors des similarités cosinus dans [-1, 1].
+    """
+    metric_name = config.get("metric", "l2")
+    metric = METRICS[metric_name]
+    if metric_name == "ip":
+        embeddings = normalize_embeddings(embeddings)
+    else:
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+    dimension = embeddings.shape[1]
+    index_type = config["index_type"]
+    params = config["params"]
+
+    if index_type == "flat":
+        index = faiss.IndexFlat(dimension, metric)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["M"], metric)
+        index.hnsw.efConstruction = params["efConstruction"]
+    else:
+        quantizer = faiss.IndexFlat(dimension, metric)
+        if index_type == "ivf":
+            index = faiss.IndexIVFFlat(quantizer, dimension, params["nlist"], metric)
+        elif index_type == "ivfpq":
+            index = faiss.IndexIVFPQ(quantizer, dimension, params["nlist"], params["pq_m"],
+                                     params["pq_nbits"], metric)
+        else:
+            index = faiss.IndexIVFScalarQuantizer(quantizer, dimension, params["nlist"],
+                                                  faiss.ScalarQuantizer.QT_8bit, metric)
+        logger.info("Entraînement de l'index %s (nlist=%d) sur %d vecteurs...",
+                    index_type, params["nlist"], len(embeddings))
+        index.train(embeddings)
+
+    index.add(embeddings)
+    apply_search_params(index, config)
+    return index
+
+
+def similarity_scores(index, distances):
+    """Convertit les distances renvoyées par index.search en similarités cosinus.
+
+    - Index "ip" (vecteurs normalisés): la valeur est déjà le cosinus.
+    - Ancien index L2 sur vecteurs unitaires: cos = 1 - d²/2 (FAISS renvoie d²).
+    """
+    distances = np.asarray(distances, dtype="float32")
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        return distances
+    return 1.0 - distances / 2.0
+
+
+def migrate_to_cosine(index, config=None):
+    """Reconstruit un ancien index L2 en index produit scalaire sur vecteurs normalisés.
+
+    Les vecteurs sont relus dans l'index (reconstruct_n), puis l'index est reconstruit avec le
+    même type et les mêmes paramètres. Retourne (index, config); un index déjà "ip" est renvoyé tel quel.
+    """
+    config = dict(config or {"index_type": "flat", "params": {}})
+    if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+        config["metric"] = "ip"
+        return index, config
+
+    if str(config.get("index_type", "")).startswith("ivf"):
+        faiss.extract_index_ivf(index).make_direct_map()
+    vectors = index.reconstruct_n(0, index.ntotal)
+    config = resolve_index_config(config.get("index_type", "flat"), index.ntotal, index.d,
+                                  config.get("params"), metric="ip")
+    return build_index(vectors, config), config
+
+
+def apply_search_params(index, config, overrides=None):
+    """Applique les paramètres de recherche (efSearch, nprobe) à un index chargé."""
+    params = dict(config.get("params", {}))
+    params.update({k: v for k, v in (overrides or {}).items() if v is not None})
+    if config.get("index_type") == "hnsw" and "efSearch" in params:
+        faiss.downcast_index(index).hnsw.efSearch = int(params["efSearch"])
+    elif str(config.get("index_type", "")).startswith("ivf") and "nprobe" in params:
+        faiss.extract_index_ivf(index).nprobe = int(params["nprobe"])
+    return index
+
+
+def read_index_mmap(path, config=None):
+    """Ouvre un index FAISS par projection mémoire (lecture seule, pages partagées entre workers).
+
+    - ivf*: listes inversées projetées (IO_FLAG_MMAP)
+    - flat, hnsw: vecteurs projetés sans copie (IO_FLAG_MMAP_IFC)
+    Si la version de FAISS ne le permet pas, l'index est lu entièrement en mémoire.
+    """
+    if str((config or {}).get("index_type", "")).startswith("ivf"):
+        flags = faiss.IO_FLAG_MMAP
+    else:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    try:
+        return faiss.read_index(path, flags | faiss.IO_FLAG_READ_ONLY)
+    except RuntimeError:
+        logger.warning("Projection mémoire impossible pour %s, lecture complète", path)
+        return faiss.read_index(path)
+
+
+def save_index_config(config, path):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+
+
+def load_index_config(path):
+    """Charge la configuration de l'index; un index sans fichier de config est un ancien index flat L2."""
+    if not os.path.exists(path):
+        return {"index_type": "flat", "metric": "l2", "params": {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
@@ -1,17 +1,24 @@
 import os
 import json
-import pickle
 import faiss
 import numpy as np
 import logging
-import re
-from sentence_transformers import SentenceTransformer
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
-from azure.ai.inference import ChatCompletionsClient
-from azure.core.credentials import AzureKeyCredential
-from azure.ai.inference.models import SystemMessage, UserMessage
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, Response, request, jsonify, render_template, session, redirect, url_for, stream_with_context
 from dotenv import load_dotenv
 from auth import login_required, get_user, generate_secret_key, verify_credentials
+from keyword_index import KeywordIndex, corpus_fingerprint
+from embedding_backends import load_embedding_backend
+from ann_index import apply_search_params, load_index_config, migrate_to_cosine, read_index_mmap, similarity_scores
+import artifact_store
+import artifact_versions
+from caching import LRUCache, ResponseCache, normalize_query
+from startup import Startup
+from log_config import configure_logging
+import llm
+import metrics
 
 # Chargement des variables d'environnement
 load_dotenv()
@@ -23,108 +30,381 @@ app.config['SESSION_TYPE'] = 'filesystem'
 app.config['SESSION_PERMANENT'] = False
 app.config['PERMANENT_SESSION_LIFETIME'] = 86400  # 24 heures
 
-# Logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(name)s - %(message)s')
+# Logging: écrit par un thread dédié (file non bloquante), JSON, niveaux par logger (cf. log_config.py)
+configure_logging()
 logger = logging.getLogger(__name__)
 
+# Artefacts de recherche d'une version, remplacés d'un bloc lors d'un rechargement:
+# une requête lit la référence une seule fois et termine sur la même version
+SearchSnapshot = namedtuple("SearchSnapshot", "index chunks metadata keyword_index version")
+
 # Variables globales
-index = None
-chunks = None
-metadata = None
+snapshot = None
 embedding_model = None
+chat_client = None
+artifact_watcher = None
+artifact_watcher_lock = threading.Lock()
+
+# Dossier des artefacts (surchargeable, par exemple pour servir un corpus de benchmark)
+MODELS_DIR = os.environ.get("MODELS_DIR", "models")
+INDEX_FILE = "unified_index.bin"
+KEYWORD_INDEX_FILE = "unified_keywords.pkl"
+INDEX_CONFIG_FILE = "unified_index_config.json"
+# Intervalle de surveillance des nouvelles versions d'artefacts (secondes, 0: désactivé)
+ARTIFACT_WATCH_INTERVAL = float(os.environ.get("ARTIFACT_WATCH_INTERVAL", "30"))
+# Relecture des sommes SHA-256 des fichiers chargés (calculées à la publication; tailles toujours vérifiées)
+ARTIFACT_VERIFY_CHECKSUMS = os.environ.get("ARTIFACT_VERIFY_CHECKSUMS", "0") == "1"
+
+# Cache des vecteurs de requêtes (les mêmes questions FAQ reviennent toute la journée)
+query_embedding_cache = LRUCache(
+    maxsize=int(os.environ.get("QUERY_EMBEDDING_CACHE_SIZE", "1024")),
+    ttl=float(os.environ.get("QUERY_EMBEDDING_CACHE_TTL", "3600"))
+)
+
+# Cache des réponses LLM, vidé à chaque (re)chargement des artefacts
+response_cache = ResponseCache(
+    maxsize=int(os.environ.get("RESPONSE_CACHE_SIZE", "256")),
+    ttl=float(os.environ.get("RESPONSE_CACHE_TTL", "86400")),
+    similarity_threshold=float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0")) or None
+)
+
+# Recherche par lot (/search/batch): taille maximale d'un lot, top_k maximal et nombre
+# d'appels simultanés au LLM quand la génération est demandée
+SEARCH_BATCH_MAX_QUERIES = int(os.environ.get("SEARCH_BATCH_MAX_QUERIES", "500"))
+SEARCH_BATCH_MAX_TOP_K = 50
+SEARCH_BATCH_LLM_CONCURRENCY = int(os.environ.get("SEARCH_BATCH_LLM_CONCURRENCY", "4"))
+
+# Métriques: durée de chaque étape (en-tête Server-Timing et /metrics), requêtes, erreurs, tokens, caches
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+# Dossier partagé par les workers gunicorn: sans lui, /metrics ne reflète que le worker qui répond
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "5"))
+
+metrics_registry = metrics.Registry()
+requests_total = metrics_registry.counter(
+    "chatbot_requests_total", "Requêtes de recherche traitées", ("endpoint", "status"))
+errors_total = metrics_registry.counter(
+    "chatbot_errors_total", "Requêtes de recherche terminées en erreur", ("endpoint",))
+request_duration = metrics_registry.histogram(
+    "chatbot_request_duration_seconds", "Durée totale des requêtes de recherche", ("endpoint",))
+stage_duration = metrics_registry.histogram(
+    "chatbot_stage_duration_seconds", "Durée de chaque étape d'une requête de recherche", ("stage",))
+llm_tokens_total = metrics_registry.counter(
+    "chatbot_llm_tokens_total", "Tokens consommés par le LLM", ("kind",))
+metrics_files = (metrics.MetricsFiles(METRICS_DIR, metrics_registry, METRICS_FLUSH_INTERVAL)
+                 if METRICS_ENABLED and METRICS_DIR else None)
 
-def load_unified_system():
-    """Charge l'index FAISS unifié, les chunks et les métadonnées."""
+def cache_counts():
+    """Succès et échecs des caches, relevés à chaque collecte des métriques."""
+    embeddings = query_embedding_cache.stats()
+    responses = response_cache.stats()
+    return {
+        ("query_embedding", "hit"): embeddings["hits"],
+        ("query_embedding", "miss"): embeddings["misses"],
+        ("response", "hit"): responses["hits"],
+        # Une correspondance sémantique est d'abord un échec de la clé exacte
+        ("response", "semantic_hit"): responses["semantic_hits"],
+        ("response", "miss"): responses["misses"] - responses["semantic_hits"],
+    }
+
+metrics_registry.callback("chatbot_cache_requests_total", "Consultations des caches", cache_counts,
+                          ("cache", "result"))
+
+def load_keyword_index(chunks, metadata, path=os.path.join(MODELS_DIR, KEYWORD_INDEX_FILE), persist=True):
+    """Charge l'index inversé persisté à côté de l'index FAISS, ou le reconstruit s'il est absent/obsolète.
+
+    L'index persisté n'est réutilisé que si son empreinte correspond au corpus chargé.
+    persist=False (version publiée, figée par son manifeste): l'index reconstruit reste en mémoire.
+    """
+    if os.path.exists(path):
+        try:
+            kw_index = KeywordIndex.load(path)
+            if kw_index is not None and kw_index.fingerprint == corpus_fingerprint(chunks, metadata):
+                return kw_index
+            logger.warning("Index mots-clés obsolète, reconstruction...")
+        except Exception:
+            logger.exception("Impossible de lire %s, reconstruction...", path)
+
+    kw_index = KeywordIndex.build(chunks, metadata)
+    if not persist:
+        return kw_index
+    try:
+        kw_index.save(path)
+        logger.info("Index mots-clés sauvegardé dans %s", path)
+    except OSError:
+        logger.warning("Impossible de sauvegarder l'index mots-clés dans %s", path)
+    return kw_index
+
+def load_artifacts(directory=MODELS_DIR, persist=True):
+    """Ouvre les chunks et métadonnées au format compact (mmap), en convertissant au besoin les anciens fichiers.
+
+    persist=False (version publiée): jamais d'écriture; le format compact, couvert par le
+    manifeste, est ouvert tel quel s'il existe, sinon les anciens fichiers sont lus en mémoire.
+    """
+    if not persist:
+        if artifact_store.artifacts_exist(directory):
+            return artifact_store.open_artifacts(directory)
+        logger.warning("Format compact absent de %s: chargement complet en mémoire", directory)
+        return artifact_store.load_legacy_artifacts(directory)
+    if artifact_store.artifacts_outdated(directory):
+        logger.info("Conversion des chunks et métadonnées au format compact...")
+        chunks, metadata = artifact_store.load_legacy_artifacts(directory)
+        try:
+            artifact_store.write_artifacts(directory, chunks, metadata)
+        except OSError:
+            logger.warning("Impossible d'écrire le format compact dans %s, chargement complet", directory)
+            return chunks, metadata
+    return artifact_store.open_artifacts(directory)
+
+def get_artifact_version(path=os.path.join(MODELS_DIR, INDEX_FILE)):
+    """Identifie une version des artefacts (date de modification et taille de l'index)."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def load_embedding_model():
+    """Charge le modèle d'embedding une seule fois."""
     global embedding_model
-    
-    # Charger le modèle d'embedding une seule fois
     if embedding_model is None:
-        embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    
-    # Charger l'index et les données
-    index = faiss.read_index("models/unified_index.bin")
+        # Backend choisi par EMBEDDING_BACKEND (sentence-transformers, onnx, onnx-int8)
+        embedding_model = load_embedding_backend(model_name="all-MiniLM-L6-v2")
+    return embedding_model
+
+def served_files(directory):
+    """Fichiers d'une version ouverts par load_unified_system (les seuls vérifiés au chargement)."""
+    if artifact_store.artifacts_exist(directory):
+        return (INDEX_FILE, INDEX_CONFIG_FILE, KEYWORD_INDEX_FILE) + artifact_store.ARTIFACT_FILES
+    return (INDEX_FILE, INDEX_CONFIG_FILE, KEYWORD_INDEX_FILE) + artifact_store.LEGACY_FILES
+
+def load_unified_system(version=None):
+    """Charge l'index FAISS unifié, les chunks, les métadonnées et l'index mots-clés d'une version.
+
+    Sans version, charge la version courante (pointeur models/CURRENT), ou à défaut les
+    artefacts à plat dans models/. Retourne un SearchSnapshot.
+    Lève ArtifactIntegrityError si la version est incomplète, modifiée ou désalignée
+    (la version servie jusque-là reste alors en place).
+    """
+    version = version or artifact_versions.current_version(MODELS_DIR)
+    directory = artifact_versions.version_dir(MODELS_DIR, version) if version else MODELS_DIR
+    manifest = artifact_versions.verify_version(directory, checksums=ARTIFACT_VERIFY_CHECKSUMS,
+                                                files=served_files(directory))
+
+    # Charger l'index (projeté en mémoire) et les données
+    index_config = load_index_config(os.path.join(directory, INDEX_CONFIG_FILE))
+    index = read_index_mmap(os.path.join(directory, INDEX_FILE), index_config)
+    # Rétablir les paramètres de recherche enregistrés (efSearch, nprobe), surchargeables par l'environnement
+    if index.metric_type != faiss.METRIC_INNER_PRODUCT:
+        # Ancien index L2: conversion en mémoire pour obtenir de vrais scores cosinus
+        logger.warning("Index FAISS au format L2: conversion en produit scalaire en mémoire. "
+                       "Lancez 'python src/migrate_index.py' pour migrer le fichier.")
+        try:
+            index, index_config = migrate_to_cosine(index, index_config)
+        except RuntimeError:
+            logger.exception("Conversion impossible, les scores L2 seront convertis à la volée")
+    apply_search_params(index, index_config, {
+        "efSearch": os.environ.get("HNSW_EF_SEARCH"),
+        "nprobe": os.environ.get("IVF_NPROBE"),
+    })
+    logger.info("Index FAISS %s chargé (%d vecteurs)", index_config.get("index_type", "flat"), index.ntotal)
     
-    with open("models/unified_chunks.json", "r", encoding="utf-8") as f:
-        data = json.load(f)
-        chunks = data.get("chunks", [])
-        
-    with open("models/unified_metadata.pkl", "rb") as f:
-        metadata = pickle.load(f)
-        
-    return index, chunks, metadata
+    # Une version publiée est figée (sommes de contrôle du manifeste): rien n'y est réécrit,
+    # seule l'ancienne disposition à plat reçoit les index dérivés reconstruits
+    persist = version is None
+    chunks, metadata = load_artifacts(directory, persist=persist)
+    # Le chunk i doit correspondre au vecteur i: refuser une version désalignée
+    artifact_versions.verify_counts(manifest, vectors=index.ntotal, chunks=len(chunks), metadata=len(metadata))
+
+    keyword_index = load_keyword_index(chunks, metadata, os.path.join(directory, KEYWORD_INDEX_FILE), persist=persist)
+
+    version = version or get_artifact_version(os.path.join(directory, INDEX_FILE))
+    return SearchSnapshot(index, chunks, metadata, keyword_index, version)
+
+def install_snapshot(new_snapshot):
+    """Remplace la version servie (affectation atomique: les requêtes en cours finissent sur l'ancienne)."""
+    global snapshot
+    snapshot = new_snapshot
+    # Nouvelle version des artefacts: les réponses en cache ne sont plus valides
+    response_cache.clear()
+
+def reload_unified_system(version):
+    """Charge une nouvelle version en arrière-plan puis la substitue à la version servie."""
+    logger.info("Nouvelle version d'artefacts détectée: %s, chargement...", version)
+    new_snapshot = load_unified_system(version)
+    install_snapshot(new_snapshot)
+    logger.info("Version d'artefacts %s en service (%d vecteurs)", version, new_snapshot.index.ntotal)
+
+def start_artifact_watcher():
+    """Démarre la surveillance des nouvelles versions, une fois par processus servant des requêtes.
+
+    Démarrée à la première requête plutôt qu'au chargement: avec preload_app, le processus
+    maître gunicorn (qui ne sert rien) ne recharge pas inutilement les artefacts.
+    """
+    global artifact_watcher
+    if ARTIFACT_WATCH_INTERVAL <= 0 or snapshot is None:
+        return
+    if artifact_watcher is not None and artifact_watcher.pid == os.getpid():
+        return
+    with artifact_watcher_lock:
+        if artifact_watcher is None or artifact_watcher.pid != os.getpid():
+            artifact_watcher = artifact_versions.ArtifactWatcher(
+                MODELS_DIR, reload_unified_system, ARTIFACT_WATCH_INTERVAL, snapshot.version
+            ).start()
+
+def build_document(idx, chunks, metadata, score):
+    """Construit le dict renvoyé au client pour le chunk d'indice idx."""
+    meta = metadata[idx]
+    doc = {
+        "title": meta["title"],
+        "extract": chunks[idx] if idx < len(chunks) else "",
+        "score": float(score),
+        "chunk_index": int(idx)
+    }
+    if "page" in meta:
+        doc["page"] = meta["page"]
+    if "url" in meta:
+        doc["url"] = meta["url"]
+        doc["category"] = meta.get("url_category", meta.get("category", "Documentation"))
+    else:
+        doc["category"] = meta.get("category", "Documentation")
+    return doc
+
+def encode_query(query):
+    """Encode une requête en vecteur float32, via le cache LRU des requêtes.
+
+    Le modèle all-MiniLM-L6-v2 ignore la casse: la clé normalisée en minuscules
+    ne change donc pas le vecteur obtenu.
+    """
+    key = normalize_query(query)
+    query_vector = query_embedding_cache.get(key)
+    if query_vector is None:
+        # Vecteur normalisé: le produit scalaire avec l'index donne le cosinus
+        query_vector = np.array(embedding_model.encode([query]), dtype='float32')
+        faiss.normalize_L2(query_vector)
+        query_vector = query_vector[0]
+        query_embedding_cache.set(key, query_vector)
+    return query_vector
 
-def search_documents(query, index, chunks, metadata, top_k=5):
-    """Recherche hybride: vectorielle + mots-clés. Retourne des documents triés par score."""
+def encode_queries(queries):
+    """Encode un lot de requêtes en une matrice float32 (une ligne par requête, dans l'ordre).
+
+    Les requêtes absentes du cache (dédupliquées) sont encodées en un seul appel au modèle.
+    """
+    keys = [normalize_query(query) for query in queries]
+    vectors = {}
+    missing = {}
+    for key, query in zip(keys, queries):
+        if key in vectors or key in missing:
+            continue
+        query_vector = query_embedding_cache.get(key)
+        if query_vector is None:
+            missing[key] = query
+        else:
+            vectors[key] = query_vector
+    if missing:
+        encoded = np.array(embedding_model.encode(list(missing.values())), dtype='float32')
+        faiss.normalize_L2(encoded)
+        for key, query_vector in zip(missing, encoded):
+            vectors[key] = query_vector
+            query_embedding_cache.set(key, query_vector)
+    return np.array([vectors[key] for key in keys], dtype='float32')
+
+def response_cache_vector(query):
+    """Vecteur de la requête pour la correspondance sémantique du cache des réponses.
+
+    None si aucun seuil de similarité n'est configuré: le vecteur ne servirait pas et sa
+    relecture compterait un faux succès du cache des vecteurs.
+    """
+    if not response_cache.similarity_threshold:
+        return None
+    return encode_query(query)
+
+def search_current(query, top_k=5, timer=metrics.NULL_TIMER):
+    """Recherche sur la version servie. Retourne (documents, version des artefacts)."""
+    current = snapshot  # Lue une seule fois: un rechargement concurrent n'affecte pas cette requête
+    documents = search_documents(query, current.index, current.chunks, current.metadata, top_k,
+                                 keyword_index=current.keyword_index, timer=timer)
+    return documents, current.version
+
+def search_documents(query, index, chunks, metadata, top_k=5, keyword_index=None, timer=metrics.NULL_TIMER):
+    """Recherche hybride: vectorielle + mots-clés. Retourne des documents triés par score.
+
+    timer (metrics.StageTimer) reçoit la durée des étapes encode, faiss, keywords et combine.
+    """
     # Recherche vectorielle
-    query_vector = embedding_model.encode([query])[0].astype('float32')
-    distances, indices = index.search(np.array([query_vector]), top_k)
-
-    vector_results = []
-    for i, idx in enumerate(indices[0]):
-        if idx >= 0 and idx < len(metadata):
-            doc = {
-                "title": metadata[idx]["title"],
-                "extract": chunks[idx] if idx < len(chunks) else "",
-                "score": float(1 - distances[0][i])
-            }
-            if "url" in metadata[idx]:
-                doc["url"] = metadata[idx]["url"]
-                doc["category"] = metadata[idx].get("url_category", metadata[idx].get("category", "Documentation"))
-            else:
-                doc["category"] = metadata[idx].get("category", "Documentation")
-            vector_results.append(doc)
+    with timer.stage("encode"):
+        query_vector = encode_query(query)
+    with timer.stage("faiss"):
+        distances, indices = index.search(np.array([query_vector]), top_k)
+        scores = similarity_scores(index, distances)
+
+        vector_results = []
+        for i, idx in enumerate(indices[0]):
+            if idx >= 0 and idx < len(metadata):
+                vector_results.append(build_document(idx, chunks, metadata, scores[0][i]))
 
     # Recherche mots-clés
-    keyword_results = search_documents_keywords(query, chunks, metadata, top_k=max(top_k, 10))
+    with timer.stage("keywords"):
+        keyword_results = search_documents_keywords(query, chunks, metadata, top_k=max(top_k, 10),
+                                                    keyword_index=keyword_index)
 
     # Combinaison des résultats
-    combined = combine_results(vector_results, keyword_results)
+    with timer.stage("combine"):
+        combined = combine_results(vector_results, keyword_results)
     return combined[:top_k]
 
-def search_documents_keywords(query: str, chunks: list, metadata: list, top_k: int = 10):
-    """Recherche par mots-clés (> 3 caractères) dans titres et contenus.
+def search_current_batch(queries, top_k=5, timer=metrics.NULL_TIMER):
+    """Recherche par lot sur la version servie. Retourne (documents par requête, version des artefacts)."""
+    current = snapshot
+    results = search_documents_batch(queries, current.index, current.chunks, current.metadata, top_k,
+                                     keyword_index=current.keyword_index, timer=timer)
+    return results, current.version
 
-    - Score 1.0 si correspondance dans le titre
-    - Score 0.8 si correspondance dans le contenu
-    Retourne une liste de dicts similaires à la recherche vectorielle.
+def search_documents_batch(queries, index, chunks, metadata, top_k=5, keyword_index=None,
+                           timer=metrics.NULL_TIMER):
+    """search_documents pour un lot de requêtes: mêmes résultats, une liste de documents par requête.
+
+    Un seul appel au modèle d'encodage, un seul index.search sur la matrice des requêtes
+    et une seule lecture des postings de chaque terme pour la recherche mots-clés.
     """
-    tokens = [t.lower() for t in re.findall(r"\w+", query) if len(t) > 3]
-    if not tokens:
+    if not queries:
         return []
+    with timer.stage("encode"):
+        query_vectors = encode_queries(queries)
+    with timer.stage("faiss"):
+        distances, indices = index.search(query_vectors, top_k)
+        scores = similarity_scores(index, distances)
 
-    results = []
-    for idx, meta in enumerate(metadata):
-        title = meta.get("title", "")
-        content = chunks[idx] if idx < len(chunks) else ""
-        title_l = title.lower()
-        content_l = content.lower() if isinstance(content, str) else ""
+        vector_results = [
+            [build_document(idx, chunks, metadata, scores[row][i])
+             for i, idx in enumerate(indices[row]) if idx >= 0 and idx < len(metadata)]
+            for row in range(len(queries))
+        ]
 
-        match_in_title = any(tok in title_l for tok in tokens)
-        match_in_content = any(tok in content_l for tok in tokens)
+    with timer.stage("keywords"):
+        if keyword_index is None:
+            keyword_index = KeywordIndex.build(chunks, metadata)
+        keyword_results = [
+            [build_document(idx, chunks, metadata, score) for idx, score in matches if idx < len(metadata)]
+            for matches in keyword_index.search_batch(queries, top_k=max(top_k, 10))
+        ]
 
-        if not (match_in_title or match_in_content):
-            continue
+    with timer.stage("combine"):
+        return [combine_results(vector, keyword)[:top_k]
+                for vector, keyword in zip(vector_results, keyword_results)]
 
-        score = 0.0
-        if match_in_title:
-            score = max(score, 1.0)
-        if match_in_content:
-            score = max(score, 0.8)
+def search_documents_keywords(query: str, chunks: list, metadata: list, top_k: int = 10, keyword_index=None):
+    """Recherche par mots-clés (> 3 caractères) dans titres et contenus via l'index inversé.
 
-        doc = {
-            "title": title,
-            "extract": content,
-            "score": float(score)
-        }
-        if "url" in meta:
-            doc["url"] = meta["url"]
-            doc["category"] = meta.get("url_category", meta.get("category", "Documentation"))
-        else:
-            doc["category"] = meta.get("category", "Documentation")
-        results.append(doc)
+    - Score BM25 (titre pondéré par TITLE_BOOST), normalisé dans ]0, 1]
+    - Seuls les chunks contenant au moins un terme de la requête sont visités
+    Retourne une liste de dicts similaires à la recherche vectorielle.
+    """
+    if keyword_index is None:
+        # Repli (index non chargé): construction à la volée, coûteuse
+        keyword_index = KeywordIndex.build(chunks, metadata)
 
-    results.sort(key=lambda d: d.get("score", 0.0), reverse=True)
-    return results[:top_k]
+    return [build_document(idx, chunks, metadata, score)
+            for idx, score in keyword_index.search(query, top_k=top_k)
+            if idx < len(metadata)]
 
 def combine_results(vector_res: list, keyword_res: list):
     """Fusionne vectoriel et mots-clés, déduplique et applique un bonus.
@@ -162,63 +442,145 @@ def combine_results(vector_res: list, keyword_res: list):
     combined.sort(key=lambda d: d.get("score", 0.0), reverse=True)
     return combined
 
-def generate_response(query, documents):
+def get_chat_client():
+    """Retourne le gestionnaire du client Azure OpenAI, créé une seule fois par worker."""
+    global chat_client
+    if chat_client is None:
+        chat_client = llm.ChatClientManager.from_env()
+    return chat_client
+
+def generate_response(query, documents, artifact_version=None, timer=metrics.NULL_TIMER):
     """Génère une réponse structurée."""
-    # Préparer le contexte
-    context = "\n\n".join([
-        f"Document: {doc['title']}\n" +
-        (f"URL: {doc['url']}\n" if 'url' in doc else "") +
-        f"Catégorie: {doc['category']}\n" +
-        f"Extrait: {doc['extract']}"
-        for doc in documents
-    ])
-    
-    logger.debug("Contexte envoyé à Azure OpenAI:\n%s", context)
-    
-    # Configurer le client Azure OpenAI
-    client = ChatCompletionsClient(
-        endpoint=os.environ["AZURE_INFERENCE_SDK_ENDPOINT"],
-        credential=AzureKeyCredential(os.environ["AZURE_OPENAI_API_KEY"])
-    )
-    
-    # Préparer les messages
-    messages = [
-        SystemMessage(
-            content=(
-                "Tu es un assistant documentaire AFPA. Utilise UNIQUEMENT les informations des documents fournis pour répondre. "
-                "Ta tâche principale est de présenter les documents en relation avec la question de l'utilisateur, pas de répondre directement à la question. "
-                "**Structure IMPÉRATIVEMENT ta réponse en HTML.** "
-                "La réponse doit commencer par une introduction générale, par exemple : '<p>Voici les documents en relation avec votre question :</p>'. "
-                "Ensuite, pour chaque document pertinent trouvé, présente-le comme suit, en utilisant une liste non ordonnée `<ul>` et des éléments de liste `<li>` pour chaque document : "
-                "  '<li>' "
-                "    '<strong>Titre du document</strong><br />' "
-                "    '<em>Description :</em> Description concise et pertinente basée sur l'extrait fourni et la question de l'utilisateur.<br />' "
-                "    '<em>Source :</em> <a href=\"URL_DU_DOCUMENT\" target=\"_blank\">Nom de la source (titre du document)</a>' " # Guillemets échappés ici
-                "  '</li>' "
-                "N'oublie pas de remplacer 'Titre du document', 'Description...', 'URL_DU_DOCUMENT', et 'Nom de la source' par les vraies valeurs. L'URL doit être cliquable et s'ouvrir dans un nouvel onglet. "
-                "Assure-toi que le HTML est bien formé. "
-                "Termine par une brève conclusion si nécessaire, par exemple : "
-                "'<p>Si le document exact que vous cherchez n\\'est pas listé, il est possible qu\\'il ne soit pas disponible dans la base de données ou que votre question nécessite une reformulation.</p>'" # Apostrophes échappées
-            )
-        ),
-        UserMessage(
-            content=f"Question: {query}\n\nDocuments disponibles:\n{context}"
+    query_vector = response_cache_vector(query)
+    with timer.stage("llm"):
+        return llm.generate_response(
+            query, documents, get_chat_client(), os.environ["DEPLOYMENT_NAME"],
+            cache=response_cache,
+            query_vector=query_vector,
+            artifact_version=artifact_version,
+            on_usage=record_llm_usage
         )
-    ]
-    
-    logger.debug("Message système: %s", messages[0].content)
-    logger.info("Question envoyée: %s", query)
-    
-    # Générer la réponse
-    response = client.complete(
-        messages=messages,
-        model=os.environ["DEPLOYMENT_NAME"],
-        temperature=0.3,
-        max_tokens=1500
+
+def stream_generated_response(query, documents, artifact_version=None, timer=metrics.NULL_TIMER):
+    """Génère la réponse en streaming (fragments de texte)."""
+    fragments = llm.stream_response(
+        query, documents, get_chat_client(), os.environ["DEPLOYMENT_NAME"],
+        cache=response_cache,
+        query_vector=response_cache_vector(query),
+        artifact_version=artifact_version,
+        on_usage=record_llm_usage
     )
-    
-    logger.debug("Réponse reçue d'Azure OpenAI: %s", response.choices[0].message.content)
-    return response.choices[0].message.content
+    # Étape llm: du premier appel au LLM au dernier fragment reçu
+    with timer.stage("llm"):
+        yield from fragments
+
+def generate_batch_responses(items, artifact_version=None, timer=metrics.NULL_TIMER):
+    """Génère la réponse de chaque élément {"query", "sources"} d'un lot (clé "content").
+
+    Au plus SEARCH_BATCH_LLM_CONCURRENCY appels simultanés au LLM; un échec n'affecte que
+    son élément (clé "error").
+    """
+    def generate(item):
+        try:
+            item["content"] = generate_response(item["query"], item["sources"], artifact_version)
+        except Exception:
+            logger.exception("Génération impossible pour une requête du lot")
+            item["error"] = "Une erreur est survenue"
+
+    with timer.stage("llm"):
+        with ThreadPoolExecutor(max_workers=max(1, SEARCH_BATCH_LLM_CONCURRENCY)) as executor:
+            list(executor.map(generate, items))
+    return items
+
+def payload_query(payload):
+    """Question d'un corps JSON {"query": ...}; "" si le corps n'est pas un objet ou la question pas une chaîne."""
+    query = payload.get("query", "") if isinstance(payload, dict) else ""
+    return query if isinstance(query, str) else ""
+
+def parse_batch_request(payload):
+    """Valide le corps de /search/batch. Retourne (requêtes, top_k, génération) ou lève ValueError."""
+    if not isinstance(payload, dict):
+        raise ValueError("Corps JSON attendu")
+    queries = payload.get("queries")
+    if not isinstance(queries, list) or not queries:
+        raise ValueError("queries doit être une liste non vide")
+    if len(queries) > SEARCH_BATCH_MAX_QUERIES:
+        raise ValueError(f"Au plus {SEARCH_BATCH_MAX_QUERIES} requêtes par lot")
+    if not all(isinstance(query, str) and query.strip() for query in queries):
+        raise ValueError("Chaque requête doit être une chaîne non vide")
+    top_k = payload.get("top_k", 5)
+    if isinstance(top_k, bool) or not isinstance(top_k, int) or not 1 <= top_k <= SEARCH_BATCH_MAX_TOP_K:
+        raise ValueError(f"top_k doit être un entier entre 1 et {SEARCH_BATCH_MAX_TOP_K}")
+    return queries, top_k, bool(payload.get("generate", False))
+
+def new_timer():
+    """Chronomètre d'une requête (sans effet si les métriques sont désactivées)."""
+    return metrics.StageTimer() if METRICS_ENABLED else metrics.NULL_TIMER
+
+def record_request(endpoint, status, timer):
+    """Enregistre une requête terminée: statut, durée totale et durée de chaque étape."""
+    if not METRICS_ENABLED:
+        return
+    if metrics_files is not None:
+        metrics_files.start()
+    requests_total.inc(endpoint=endpoint, status=status)
+    if status >= 500:
+        errors_total.inc(endpoint=endpoint)
+    request_duration.observe(timer.elapsed(), endpoint=endpoint)
+    for stage, seconds in timer.stages.items():
+        stage_duration.observe(seconds, stage=stage)
+
+def record_llm_usage(usage):
+    """Compte les tokens d'une réponse du LLM (objet usage du SDK d'inférence)."""
+    if not METRICS_ENABLED:
+        return
+    for kind in ("prompt", "completion"):
+        tokens = getattr(usage, f"{kind}_tokens", None)
+        if tokens:
+            llm_tokens_total.inc(tokens, kind=kind)
+
+def sse_event(event, data):
+    """Formate un événement Server-Sent Events avec une charge utile JSON."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def install_unified_system():
+    """Charge les artefacts de recherche et les rend visibles aux routes."""
+    install_snapshot(load_unified_system())
+
+# Modèle et artefacts chargés en parallèle, en arrière-plan (cf. startup.py)
+startup = Startup({"model": load_embedding_model, "artifacts": install_unified_system})
+
+def service_unavailable():
+    """Réponse 503 tant que le modèle et les artefacts ne sont pas chargés."""
+    response = jsonify({"error": "Service en cours de démarrage, réessayez dans quelques instants",
+                        "startup": startup.report()})
+    response.status_code = 503
+    response.headers["Retry-After"] = "5"
+    return response
+
+@app.before_request
+def watch_artifacts():
+    start_artifact_watcher()
+
+@app.route('/healthz')
+def healthz():
+    """Sonde de vie: le processus répond, même pendant le chargement."""
+    return jsonify({"status": "ok"})
+
+@app.route('/readyz')
+def readyz():
+    """Sonde de disponibilité: 200 quand le modèle et les artefacts sont chargés, 503 sinon."""
+    report = startup.report()
+    return jsonify(report), (200 if startup.ready else 503)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Métriques au format Prometheus (tous les workers si METRICS_DIR est défini)."""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Métriques désactivées"}), 404
+    states = metrics_files.collect() if metrics_files is not None else [metrics_registry.collect()]
+    return Response(metrics.render(metrics.merge_states(states)),
+                    content_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.route('/')
 @login_required
@@ -234,28 +596,35 @@ def home():
 @app.route('/search', methods=['POST'])
 @login_required
 def search_endpoint():
+    timer = new_timer()
+    if not startup.ready:
+        record_request("/search", 503, timer)
+        return service_unavailable()
     try:
         logger.info("Début du traitement de la requête")
         # Récupérer la requête
-        query = request.json.get('query', '')
+        query = payload_query(request.get_json(silent=True))
         logger.info("Requête reçue: %s", query)
         
         if not query:
             logger.warning("Erreur: requête vide")
+            record_request("/search", 400, timer)
             return jsonify({"error": "Query is required"}), 400
         
         # Rechercher les documents pertinents (avec URLs déjà incluses)
         logger.info("Recherche des documents...")
-        documents = search_documents(query, index, chunks, metadata)
+        documents, version = search_current(query, timer=timer)
         logger.info("Documents trouvés: %d", len(documents))
-        for doc in documents:
-            logger.debug("- %s (score: %s)", doc['title'], doc['score'])
-            if 'url' in doc:
-                logger.debug("  URL: %s", doc['url'])
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Cache des requêtes: %s", query_embedding_cache.stats())
+            for doc in documents:
+                logger.debug("- %s (score: %s)", doc['title'], doc['score'])
+                if 'url' in doc:
+                    logger.debug("  URL: %s", doc['url'])
         
         # Générer la réponse
         logger.info("Génération de la réponse...")
-        response = generate_response(query, documents)
+        response = generate_response(query, documents, version, timer=timer)
         logger.info("Réponse générée")
         logger.debug("Longueur de la réponse: %d", len(response))
         
@@ -266,11 +635,89 @@ def search_endpoint():
             }
         }
         logger.info("Envoi de la réponse au client")
-        return jsonify(result)
+        http_response = jsonify(result)
+        if METRICS_ENABLED:
+            # Durée de chaque étape, visible dans les outils de développement du navigateur
+            http_response.headers["Server-Timing"] = timer.server_timing()
+        record_request("/search", 200, timer)
+        return http_response
         
     except Exception:
         logger.exception("Une erreur est survenue")
+        record_request("/search", 500, timer)
+        return jsonify({"error": "Une erreur est survenue"}), 500
+
+@app.route('/search/stream', methods=['POST'])
+@login_required
+def search_stream_endpoint():
+    """Variante SSE de /search: envoie les sources dès la fin de la recherche, puis les tokens.
+
+    Les en-têtes partent avant la recherche: pas d'en-tête Server-Timing, les durées des
+    étapes ne sont visibles que dans /metrics.
+    """
+    timer = new_timer()
+    if not startup.ready:
+        record_request("/search/stream", 503, timer)
+        return service_unavailable()
+    query = payload_query(request.get_json(silent=True))
+    if not query:
+        record_request("/search/stream", 400, timer)
+        return jsonify({"error": "Query is required"}), 400
+    logger.info("Requête reçue (streaming): %s", query)
+
+    def events():
+        try:
+            documents, version = search_current(query, timer=timer)
+            logger.info("Documents trouvés: %d", len(documents))
+            yield sse_event("sources", documents)
+
+            for text in stream_generated_response(query, documents, version, timer=timer):
+                yield sse_event("token", {"text": text})
+            yield sse_event("done", {})
+            record_request("/search/stream", 200, timer)
+        except Exception:
+            logger.exception("Une erreur est survenue pendant le streaming")
+            # Statut HTTP déjà envoyé (200): l'échec est compté comme une erreur serveur
+            record_request("/search/stream", 500, timer)
+            yield sse_event("error", {"error": "Une erreur est survenue"})
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/search/batch', methods=['POST'])
+@login_required
+def search_batch_endpoint():
+    """Recherche pour un lot de requêtes ({"queries": [...], "top_k": 5, "generate": false}).
+
+    Sans "generate", seules les sources sont retournées (pas d'appel au LLM).
+    """
+    timer = new_timer()
+    if not startup.ready:
+        record_request("/search/batch", 503, timer)
+        return service_unavailable()
+    try:
+        queries, top_k, generate = parse_batch_request(request.get_json(silent=True))
+    except ValueError as e:
+        record_request("/search/batch", 400, timer)
+        return jsonify({"error": str(e)}), 400
+    logger.info("Lot de %d requêtes reçu (génération: %s)", len(queries), generate)
+    try:
+        results, version = search_current_batch(queries, top_k, timer=timer)
+        items = [{"query": query, "sources": documents} for query, documents in zip(queries, results)]
+        if generate:
+            generate_batch_responses(items, version, timer=timer)
+    except Exception:
+        logger.exception("Une erreur est survenue pendant la recherche par lot")
+        record_request("/search/batch", 500, timer)
         return jsonify({"error": "Une erreur est survenue"}), 500
+    http_response = jsonify({"results": items})
+    if METRICS_ENABLED:
+        http_response.headers["Server-Timing"] = timer.server_timing()
+    record_request("/search/batch", 200, timer)
+    return http_response
 
 @app.route('/login', methods=['GET', 'POST'])
 def login():
@@ -292,10 +739,9 @@ def logout():
     session.pop('username', None)
     return redirect(url_for('login'))
 
-# Chargement initial des données
-logger.info("Chargement du système unifié...")
-index, chunks, metadata = load_unified_system()
-logger.info("Système unifié chargé")
+# Chargement initial des données, sans bloquer l'import (le serveur répond déjà à /healthz)
+logger.info("Chargement du système unifié en arrière-plan...")
+startup.start()
 
 if __name__ == "__main__":
     app.run(host='0.0.0.0', port=7860, debug=False) 
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""Format compact des chunks et métadonnées, chargé par projection mémoire (mmap).
+
+- Chunks: tous les textes UTF-8 concaténés dans un seul fichier (unified_chunks.bin) et un
+  tableau d'offsets int64 (unified_chunk_offsets.npy): le chunk i est blob[offsets[i]:offsets[i + 1]].
+- Métadonnées: stockage en colonnes. Chaque clé (title, url, category...) a une table de valeurs
+  distinctes (unified_metadata_tables.json) et la matrice unified_metadata_columns.npy (int32,
+  une ligne par chunk) donne l'indice de la valeur dans la table, -1 si la clé est absente.
+
+Les fichiers sont projetés en lecture seule: les workers gunicorn d'une même machine partagent
+les mêmes pages via le cache du système, et le démarrage ne désérialise plus le corpus.
+
+Conversion des anciens artefacts (unified_chunks.json / unified_metadata.pkl):
+    python src/artifact_store.py [models]
+"""
+import json
+import mmap
+import operator
+import os
+import pickle
+import sys
+from collections.abc import Sequence
+
+import numpy as np
+
+CHUNKS_BLOB_FILE = "unified_chunks.bin"
+CHUNK_OFFSETS_FILE = "unified_chunk_offsets.npy"
+METADATA_COLUMNS_FILE = "unified_metadata_columns.npy"
+METADATA_TABLES_FILE = "unified_metadata_tables.json"
+
+ARTIFACT_FILES = (CHUNKS_BLOB_FILE, CHUNK_OFFSETS_FILE, METADATA_COLUMNS_FILE, METADATA_TABLES_FILE)
+
+LEGACY_CHUNKS_FILE = "unified_chunks.json"
+LEGACY_METADATA_FILE = "unified_metadata.pkl"
+LEGACY_FILES = (LEGACY_CHUNKS_FILE, LEGACY_METADATA_FILE)
+
+# Incrémenter si le format change
+ARTIFACT_FORMAT_VERSION = 1
+
+
+def _map_file(path):
+    """Projette un fichier en lecture seule (un fichier vide donne b"", non projetable)."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return b""
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class ChunkStore(Sequence):
+    """Liste en lecture seule des chunks, décodés à la demande depuis le blob projeté."""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    @classmethod
+    def open(cls, directory):
+        return cls(_map_file(os.path.join(directory, CHUNKS_BLOB_FILE)),
+                   np.load(os.path.join(directory, CHUNK_OFFSETS_FILE), mmap_mode="r"))
+
+    @staticmethod
+    def write(chunks, directory):
+        offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+        with open(os.path.join(directory, CHUNKS_BLOB_FILE), "wb") as f:
+            for i, chunk in enumerate(chunks):
+                data = chunk.encode("utf-8")
+                f.write(data)
+                offsets[i + 1] = offsets[i] + len(data)
+        np.save(os.path.join(directory, CHUNK_OFFSETS_FILE), offsets)
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        idx = operator.index(idx)
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("indice de chunk hors limites")
+        start, end = self._offsets[idx], self._offsets[idx + 1]
+        return self._blob[start:end].decode("utf-8")
+
+
+class MetadataStore(Sequence):
+    """Liste en lecture seule des métadonnées des chunks, stockées en colonnes.
+
+    store[i] reconstruit le dict du chunk i (mêmes clés et valeurs que l'ancien pickle).
+    """
+
+    def __init__(self, keys, tables, columns):
+        self.keys = keys
+        self.tables = tables
+        self._columns = columns
+
+    @classmethod
+    def open(cls, directory):
+        with open(os.path.join(directory, METADATA_TABLES_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != ARTIFACT_FORMAT_VERSION:
+            raise ValueError(f"Version du format de métadonnées non supportée: {data.get('version')}")
+        columns = np.load(os.path.join(directory, METADATA_COLUMNS_FILE), mmap_mode="r")
+        return cls(data["keys"], data["tables"], columns)
+
+    @staticmethod
+    def write(metadata, directory):
+        keys = []
+        for meta in metadata:
+            for key in meta:
+                if key not in keys:
+                    keys.append(key)
+        value_ids = [{} for _ in keys]
+        tables = [[] for _ in keys]
+        columns = np.full((len(metadata), len(keys)), -1, dtype=np.int32)
+        for row, meta in enumerate(metadata):
+            for col, key in enumerate(keys):
+                if key not in meta:
+                    continue
+                value = meta[key]
+                # Le type fait partie de la clé: 1 et "1" (ou True) restent distincts
+                table_key = (type(value).__name__, value)
+                value_id = value_ids[col].get(table_key)
+                if value_id is None:
+                    value_id = value_ids[col][table_key] = len(tables[col])
+                    tables[col].append(value)
+                columns[row, col] = value_id
+        with open(os.path.join(directory, METADATA_TABLES_FILE), "w", encoding="utf-8") as f:
+            json.dump({"version": ARTIFACT_FORMAT_VERSION, "keys": keys, "tables": tables},
+                      f, ensure_ascii=False)
+        np.save(os.path.join(directory, METADATA_COLUMNS_FILE), columns)
+
+    def __len__(self):
+        return len(self._columns)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+        row = self._columns[operator.index(idx)]
+        return {key: self.tables[col][value_id]
+                for col, (key, value_id) in enumerate(zip(self.keys, row.tolist()))
+                if value_id >= 0}
+
+    def column(self, key, default=None):
+        """Valeurs d'une clé pour tous les chunks, sans construire les dicts."""
+        if key not in self.keys:
+            return [default] * len(self)
+        col = self.keys.index(key)
+        table = self.tables[col]
+        return [table[value_id] if value_id >= 0 else default
+                for value_id in self._columns[:, col].tolist()]
+
+
+def write_artifacts(directory, chunks, metadata):
+    """Écrit les chunks et métadonnées au format compact dans directory."""
+    if len(chunks) != len(metadata):
+        raise ValueError(f"{len(chunks)} chunks pour {len(metadata)} métadonnées")
+    os.makedirs(directory, exist_ok=True)
+    ChunkStore.write(chunks, directory)
+    MetadataStore.write(metadata, directory)
+
+
+def artifacts_exist(directory):
+    return all(os.path.exists(os.path.join(directory, name)) for name in ARTIFACT_FILES)
+
+
+def artifacts_outdated(directory):
+    """Vrai si le format compact est absent ou plus ancien que les artefacts JSON/pickle."""
+    if not artifacts_exist(directory):
+        return True
+    compact_mtime = min(os.path.getmtime(os.path.join(directory, name))
+                        for name in (CHUNKS_BLOB_FILE, METADATA_COLUMNS_FILE))
+    return any(os.path.exists(path) and os.path.getmtime(path) > compact_mtime
+               for path in (os.path.join(directory, name) for name in LEGACY_FILES))
+
+
+def open_artifacts(directory):
+    """Ouvre (mmap) les chunks et métadonnées au format compact. Retourne (chunks, metadata)."""
+    chunks = ChunkStore.open(directory)
+    metadata = MetadataStore.open(directory)
+    if len(chunks) != len(metadata):
+        raise ValueError(f"Artefacts incohérents: {len(chunks)} chunks pour {len(metadata)} métadonnées")
+    return chunks, metadata
+
+
+def read_artifacts(directory):
+    """Lit chunks et métadonnées en mémoire (listes): format compact, sinon anciens fichiers."""
+    if artifacts_exist(directory):
+        chunks, metadata = open_artifacts(directory)
+        return list(chunks), list(metadata)
+    return load_legacy_artifacts(directory)
+
+
+def load_legacy_artifacts(directory):
+    """Lit les anciens artefacts (unified_chunks.json, unified_metadata.pkl)."""
+    with open(os.path.join(directory, LEGACY_CHUNKS_FILE), "r", encoding="utf-8") as f:
+        chunks = json.load(f).get("chunks", [])
+    with open(os.path.join(directory, LEGACY_METADATA_FILE), "rb") as f:
+        metadata = pickle.load(f)
+    return chunks, metadata
+
+
+if __name__ == "__main__":
+    models_dir = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+    legacy_chunks, legacy_metadata = load_legacy_artifacts(models_dir)
+    write_artifacts(models_dir, legacy_chunks, legacy_metadata)
+    print(f"{len(legacy_chunks)} chunks convertis au format compact dans {models_dir}")
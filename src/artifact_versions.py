@@ -0,0 +1,271 @@
+"""Versions des artefacts de recherche et pointeur atomique vers la version courante.
+
+    models/
+      CURRENT                      # nom de la version servie (une ligne)
+      versions/
+        20261018T120000123456Z/    # index FAISS, chunks, métadonnées, index mots-clés...
+        20261018T130500654321Z/
+
+Le script d'indexation écrit chaque reconstruction dans un dossier temporaire
+(versions/.tmp-<version>), synchronise les fichiers sur disque (fsync), y ajoute un manifeste
+(nombre de vecteurs/chunks/métadonnées, SHA-256 de chaque fichier) et le renomme en
+versions/<version> (atomique). Il publie ensuite la version en remplaçant CURRENT par
+os.replace (atomique): un lecteur voit l'ancienne ou la nouvelle version, jamais un mélange,
+et un arrêt brutal ne laisse au pire qu'un dossier temporaire ignoré. Les SHA-256 sont calculés
+une fois, à la publication; avant de servir une version, l'application vérifie (verify_version)
+la taille des seuls fichiers qu'elle ouvre. Les anciennes versions sont supprimées au-delà de
+ARTIFACT_VERSIONS_KEEP; un processus qui les projette encore en mémoire garde ses fichiers
+ouverts jusqu'à la fin de ses requêtes.
+
+Sans fichier CURRENT (ancienne installation), les artefacts sont lus directement dans models/.
+ArtifactWatcher surveille CURRENT et signale toute nouvelle version à l'application.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+STAGING_PREFIX = ".tmp-"
+MANIFEST_FILE = "artifact_manifest.json"
+MANIFEST_VERSION = 1
+# Âge au-delà duquel un dossier temporaire est considéré comme abandonné
+STALE_STAGING_SECONDS = 3600
+KEEP_VERSIONS = int(os.environ.get("ARTIFACT_VERSIONS_KEEP", "3"))
+
+
+class ArtifactIntegrityError(ValueError):
+    """Version d'artefacts incomplète ou incohérente (fichier modifié, comptes différents)."""
+
+
+def current_version(models_dir):
+    """Nom de la version courante, ou None (pas de pointeur: disposition à plat)."""
+    try:
+        with open(os.path.join(models_dir, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(models_dir, version):
+    return os.path.join(models_dir, VERSIONS_DIR, version)
+
+
+def current_dir(models_dir):
+    """Dossier des artefacts servis: la version courante, sinon models/ lui-même."""
+    version = current_version(models_dir)
+    return version_dir(models_dir, version) if version else models_dir
+
+
+def list_versions(models_dir):
+    """Versions présentes, de la plus ancienne à la plus récente."""
+    root = os.path.join(models_dir, VERSIONS_DIR)
+    if not os.path.isdir(root):
+        return []
+    return sorted(name for name in os.listdir(root)
+                  if not name.startswith(".") and os.path.isdir(os.path.join(root, name)))
+
+
+def staging_dir(models_dir, version):
+    return os.path.join(models_dir, VERSIONS_DIR, STAGING_PREFIX + version)
+
+
+def create_version(models_dir):
+    """Crée le dossier temporaire d'une nouvelle version. Retourne (version, dossier temporaire)."""
+    while True:
+        version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        path = staging_dir(models_dir, version)
+        try:
+            os.makedirs(path)
+            return version, path
+        except FileExistsError:
+            time.sleep(0.001)
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def fsync_file(path):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def commit_version(models_dir, version, counts):
+    """Termine une version: fsync, manifeste (comptes et SHA-256), renommage atomique.
+
+    counts: {"vectors": ..., "chunks": ..., "metadata": ...}. Retourne le dossier final.
+    """
+    staging = staging_dir(models_dir, version)
+    files = {}
+    for name in sorted(os.listdir(staging)):
+        path = os.path.join(staging, name)
+        fsync_file(path)
+        files[name] = {"size": os.path.getsize(path), "sha256": file_sha256(path)}
+    manifest_path = os.path.join(staging, MANIFEST_FILE)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"version": MANIFEST_VERSION, "name": version, "counts": dict(counts), "files": files},
+                  f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    fsync_dir(staging)
+
+    final = version_dir(models_dir, version)
+    os.rename(staging, final)
+    fsync_dir(os.path.dirname(final))
+    return final
+
+
+def read_manifest(directory):
+    """Manifeste d'une version, ou None (disposition à plat sans manifeste)."""
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def verify_version(directory, checksums=True, files=None):
+    """Vérifie qu'une version est complète et intacte. Retourne son manifeste (None s'il n'y en a pas).
+
+    files: noms des fichiers à vérifier (défaut: tous ceux du manifeste); les noms absents du
+    manifeste sont ignorés. Lève ArtifactIntegrityError si un fichier manque, a changé de
+    taille ou (checksums=True, lecture complète du fichier) de contenu.
+    """
+    try:
+        manifest = read_manifest(directory)
+    except ValueError as e:
+        raise ArtifactIntegrityError(f"Manifeste illisible dans {directory}: {e}") from e
+    if manifest is None:
+        return None
+    listed = manifest.get("files", {})
+    for name in listed if files is None else [name for name in files if name in listed]:
+        expected = listed[name]
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            raise ArtifactIntegrityError(f"Fichier manquant: {path}")
+        if os.path.getsize(path) != expected["size"]:
+            raise ArtifactIntegrityError(f"Taille inattendue: {path}")
+        if checksums and file_sha256(path) != expected["sha256"]:
+            raise ArtifactIntegrityError(f"Somme de contrôle invalide: {path}")
+    return manifest
+
+
+def verify_counts(manifest, **counts):
+    """Vérifie que les comptes chargés sont égaux entre eux et à ceux du manifeste."""
+    if len(set(counts.values())) > 1:
+        raise ArtifactIntegrityError("Artefacts désalignés: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+    expected = (manifest or {}).get("counts", {})
+    for key, value in counts.items():
+        if key in expected and expected[key] != value:
+            raise ArtifactIntegrityError(f"{key}: {value} chargés, {expected[key]} attendus d'après le manifeste")
+
+
+def fsync_dir(path):
+    """Rend durable une création/un renommage dans un dossier (sans effet hors POSIX)."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def publish(models_dir, version):
+    """Fait de version la version courante, de façon atomique."""
+    if not os.path.isdir(version_dir(models_dir, version)):
+        raise FileNotFoundError(f"Version d'artefacts absente: {version}")
+    pointer = os.path.join(models_dir, CURRENT_FILE)
+    tmp = f"{pointer}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, pointer)
+    fsync_dir(models_dir)
+    logger.info("Version d'artefacts publiée: %s", version)
+
+
+def prune(models_dir, keep=KEEP_VERSIONS):
+    """Supprime les anciennes versions, en gardant les keep plus récentes et la courante."""
+    current = current_version(models_dir)
+    versions = list_versions(models_dir)
+    removed = []
+    # Dossiers temporaires laissés par une construction interrompue (pas ceux d'une écriture en cours)
+    root = os.path.join(models_dir, VERSIONS_DIR)
+    for name in os.listdir(root) if os.path.isdir(root) else []:
+        path = os.path.join(root, name)
+        if name.startswith(STAGING_PREFIX) and time.time() - os.path.getmtime(path) > STALE_STAGING_SECONDS:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+    for version in versions[:max(0, len(versions) - keep)]:
+        if version == current:
+            continue
+        shutil.rmtree(version_dir(models_dir, version), ignore_errors=True)
+        removed.append(version)
+    if removed:
+        logger.info("Anciennes versions d'artefacts supprimées: %s", ", ".join(removed))
+    return removed
+
+
+class ArtifactWatcher:
+    """Surveille le pointeur CURRENT et appelle on_change(version) à chaque nouvelle version.
+
+    Le contrôle a lieu toutes les interval secondes dans un thread d'arrière-plan; on_change
+    s'exécute dans ce thread (le chargement ne bloque donc aucune requête). Si on_change
+    échoue, la version est ignorée jusqu'à ce que CURRENT désigne une autre version.
+    """
+
+    def __init__(self, models_dir, on_change, interval=30.0, version=None):
+        self.models_dir = models_dir
+        self.on_change = on_change
+        self.interval = interval
+        self.version = version
+        self.failed = None
+        self.pid = os.getpid()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check(self):
+        """Contrôle immédiat. Retourne True si une nouvelle version a été chargée."""
+        version = current_version(self.models_dir)
+        if version is None or version in (self.version, self.failed):
+            return False
+        try:
+            self.on_change(version)
+        except Exception:
+            logger.exception("Échec du chargement de la version d'artefacts %s, ignorée jusqu'à la "
+                             "prochaine publication", version)
+            self.failed = version
+            return False
+        self.version = version
+        self.failed = None
+        return True
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="artifact-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def stop(self):
+        self._stop.set()
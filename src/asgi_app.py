@@ -0,0 +1,265 @@
+"""Mode de service asynchrone (ASGI) de l'application.
+
+Les routes /search, /search/stream et /search/batch sont servies nativement en asyncio: la recherche
+(encodage, FAISS, mots-clés) s'exécute dans un pool de threads et l'appel au LLM utilise
+le client asynchrone du SDK d'inférence, si bien qu'une requête en attente d'Azure
+n'occupe plus de thread. Toutes les autres routes (login, pages HTML...) sont
+déléguées à l'application Flask via un adaptateur WSGI -> ASGI.
+
+Lancement:
+    uvicorn asgi_app:application --app-dir src --host 0.0.0.0 --port 7860 --workers 2
+"""
+import asyncio
+import json
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from urllib.parse import quote
+
+from asgiref.wsgi import WsgiToAsgi
+
+import app_unified
+import llm
+
+logger = logging.getLogger(__name__)
+
+# Threads dédiés à la recherche (CPU: encodage de la requête + FAISS + mots-clés)
+RETRIEVAL_THREADS = int(os.environ.get("RETRIEVAL_THREADS", str(min(8, (os.cpu_count() or 1) + 2))))
+retrieval_executor = ThreadPoolExecutor(max_workers=RETRIEVAL_THREADS, thread_name_prefix="retrieval")
+
+async_chat_client = None
+wsgi_application = WsgiToAsgi(app_unified.app)
+
+
+def get_async_chat_client():
+    global async_chat_client
+    if async_chat_client is None:
+        async_chat_client = llm.AsyncChatClientManager.from_env()
+    return async_chat_client
+
+
+def session_username(scope):
+    """Lit l'utilisateur connecté depuis le cookie de session signé par Flask."""
+    flask_app = app_unified.app
+    cookie_name = flask_app.config["SESSION_COOKIE_NAME"]
+    for name, value in scope.get("headers", []):
+        if name != b"cookie":
+            continue
+        for part in value.decode("latin-1").split(";"):
+            key, _, cookie = part.strip().partition("=")
+            if key != cookie_name:
+                continue
+            serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+            try:
+                return serializer.loads(
+                    cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds())
+                ).get("username")
+            except Exception:
+                return None
+    return None
+
+
+async def read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body or b"{}")
+    except ValueError:
+        return {}
+
+
+async def send_json(send, status, payload, headers=()):
+    data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(data)).encode()),
+                    *headers],
+    })
+    await send({"type": "http.response.body", "body": data})
+
+
+async def send_login_redirect(send, scope):
+    location = "/login?next=" + quote(scope.get("path", "/"), safe="")
+    await send({
+        "type": "http.response.start",
+        "status": 302,
+        "headers": [(b"location", location.encode("latin-1")), (b"content-length", b"0")],
+    })
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def retrieve(query, timer):
+    """Exécute la recherche hybride dans le pool de threads. Retourne (documents, version des artefacts)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(retrieval_executor, partial(app_unified.search_current, query, timer=timer))
+
+
+async def query_vector_for(query):
+    """Vecteur pour le cache sémantique des réponses, None sans seuil de similarité (pas de passage par le pool)."""
+    if not app_unified.response_cache.similarity_threshold:
+        return None
+    # Déjà en cache après la recherche: pas de réencodage
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(retrieval_executor, app_unified.encode_query, query)
+
+
+async def search_endpoint(scope, receive, send, timer):
+    query = app_unified.payload_query(await read_json(receive))
+    if not query:
+        app_unified.record_request("/search", 400, timer)
+        await send_json(send, 400, {"error": "Query is required"})
+        return
+    try:
+        documents, version = await retrieve(query, timer)
+        query_vector = await query_vector_for(query)
+        with timer.stage("llm"):
+            response = await llm.agenerate_response(
+                query, documents, get_async_chat_client(), os.environ["DEPLOYMENT_NAME"],
+                cache=app_unified.response_cache,
+                query_vector=query_vector,
+                artifact_version=version,
+                on_usage=app_unified.record_llm_usage
+            )
+    except Exception:
+        logger.exception("Une erreur est survenue")
+        app_unified.record_request("/search", 500, timer)
+        await send_json(send, 500, {"error": "Une erreur est survenue"})
+        return
+    headers = [(b"server-timing", timer.server_timing().encode("latin-1"))] if app_unified.METRICS_ENABLED else []
+    app_unified.record_request("/search", 200, timer)
+    await send_json(send, 200, {"response": {"content": response, "sources": documents}}, headers=headers)
+
+
+async def search_stream_endpoint(scope, receive, send, timer):
+    query = app_unified.payload_query(await read_json(receive))
+    if not query:
+        app_unified.record_request("/search/stream", 400, timer)
+        await send_json(send, 400, {"error": "Query is required"})
+        return
+
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [
+            (b"content-type", b"text/event-stream; charset=utf-8"),
+            (b"cache-control", b"no-cache"),
+            (b"x-accel-buffering", b"no"),
+        ],
+    })
+
+    async def emit(event, data):
+        await send({"type": "http.response.body",
+                    "body": app_unified.sse_event(event, data).encode("utf-8"),
+                    "more_body": True})
+
+    try:
+        documents, version = await retrieve(query, timer)
+        await emit("sources", documents)
+        query_vector = await query_vector_for(query)
+        with timer.stage("llm"):
+            async for text in llm.astream_response(
+                query, documents, get_async_chat_client(), os.environ["DEPLOYMENT_NAME"],
+                cache=app_unified.response_cache,
+                query_vector=query_vector,
+                artifact_version=version,
+                on_usage=app_unified.record_llm_usage
+            ):
+                await emit("token", {"text": text})
+        await emit("done", {})
+        app_unified.record_request("/search/stream", 200, timer)
+    except Exception:
+        logger.exception("Une erreur est survenue pendant le streaming")
+        app_unified.record_request("/search/stream", 500, timer)
+        await emit("error", {"error": "Une erreur est survenue"})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def search_batch_endpoint(scope, receive, send, timer):
+    try:
+        queries, top_k, generate = app_unified.parse_batch_request(await read_json(receive))
+    except ValueError as e:
+        app_unified.record_request("/search/batch", 400, timer)
+        await send_json(send, 400, {"error": str(e)})
+        return
+    loop = asyncio.get_running_loop()
+    try:
+        results, version = await loop.run_in_executor(
+            retrieval_executor, partial(app_unified.search_current_batch, queries, top_k, timer=timer))
+        items = [{"query": query, "sources": documents} for query, documents in zip(queries, results)]
+        if generate:
+            if app_unified.response_cache.similarity_threshold:
+                query_vectors = await loop.run_in_executor(retrieval_executor, app_unified.encode_queries, queries)
+            else:
+                query_vectors = [None] * len(items)
+            semaphore = asyncio.Semaphore(max(1, app_unified.SEARCH_BATCH_LLM_CONCURRENCY))
+
+            async def generate_item(item, query_vector):
+                async with semaphore:
+                    try:
+                        item["content"] = await llm.agenerate_response(
+                            item["query"], item["sources"], get_async_chat_client(), os.environ["DEPLOYMENT_NAME"],
+                            cache=app_unified.response_cache,
+                            query_vector=query_vector,
+                            artifact_version=version,
+                            on_usage=app_unified.record_llm_usage
+                        )
+                    except Exception:
+                        logger.exception("Génération impossible pour une requête du lot")
+                        item["error"] = "Une erreur est survenue"
+
+            with timer.stage("llm"):
+                await asyncio.gather(*(generate_item(item, vector) for item, vector in zip(items, query_vectors)))
+    except Exception:
+        logger.exception("Une erreur est survenue pendant la recherche par lot")
+        app_unified.record_request("/search/batch", 500, timer)
+        await send_json(send, 500, {"error": "Une erreur est survenue"})
+        return
+    headers = [(b"server-timing", timer.server_timing().encode("latin-1"))] if app_unified.METRICS_ENABLED else []
+    app_unified.record_request("/search/batch", 200, timer)
+    await send_json(send, 200, {"results": items}, headers=headers)
+
+
+ASYNC_ROUTES = {
+    ("POST", "/search"): search_endpoint,
+    ("POST", "/search/stream"): search_stream_endpoint,
+    ("POST", "/search/batch"): search_batch_endpoint,
+}
+
+
+async def application(scope, receive, send):
+    """Point d'entrée ASGI."""
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if async_chat_client is not None:
+                    await async_chat_client.close()
+                retrieval_executor.shutdown(wait=False)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] == "http":
+        app_unified.start_artifact_watcher()
+    handler = ASYNC_ROUTES.get((scope.get("method"), scope.get("path"))) if scope["type"] == "http" else None
+    if handler is None:
+        await wsgi_application(scope, receive, send)
+        return
+    if not session_username(scope):
+        await send_login_redirect(send, scope)
+        return
+    timer = app_unified.new_timer()
+    if not app_unified.startup.ready:
+        app_unified.record_request(scope["path"], 503, timer)
+        await send_json(send, 503, {"error": "Service en cours de démarrage, réessayez dans quelques instants",
+                                    "startup": app_unified.startup.report()},
+                        headers=[(b"retry-after", b"5")])
+        return
+    await handler(scope, receive, send, timer)
@@ -1,46 +1,146 @@
 import os
 import json
+import copy
 import hashlib
 import secrets
+import tempfile
+import threading
+from contextlib import contextmanager
 from functools import wraps
 from flask import session, redirect, url_for, request
 
+try:
+    import fcntl  # Verrou entre processus (workers gunicorn), absent sous Windows
+except ImportError:
+    fcntl = None
+
 # Chemin vers le fichier des utilisateurs
 USERS_FILE = os.path.join(os.path.dirname(__file__), 'data', 'users.json')
 
 # Fonction pour créer le répertoire data s'il n'existe pas
 def ensure_data_dir():
-    data_dir = os.path.join(os.path.dirname(__file__), 'data')
-    if not os.path.exists(data_dir):
-        os.makedirs(data_dir)
+    os.makedirs(os.path.dirname(USERS_FILE), exist_ok=True)
 
-# Fonction pour charger les utilisateurs depuis le fichier JSON
-def load_users():
-    ensure_data_dir()
-    if not os.path.exists(USERS_FILE):
-        # Créer un fichier utilisateur par défaut avec un admin
-        default_admin = {
-            "admin": {
-                "password": hash_password("admin123"),
-                "role": "admin",
-                "name": "Administrateur"
-            }
+def default_users():
+    return {
+        "admin": {
+            "password": hash_password("admin123"),
+            "role": "admin",
+            "name": "Administrateur"
         }
-        save_users(default_admin)
-        return default_admin
-    
-    try:
-        with open(USERS_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except (json.JSONDecodeError, FileNotFoundError):
-        # En cas d'erreur, retourner un dictionnaire vide
-        return {}
+    }
+
+class UserStore:
+    """Utilisateurs gardés en mémoire, relus seulement quand le fichier change.
+
+    Chaque lecture compare la signature du fichier (mtime, inode, taille) à celle de la
+    dernière lecture: un simple stat, sans ouverture ni analyse JSON. Les écritures relisent
+    le fichier, appliquent la modification et le remplacent de façon atomique (fichier
+    temporaire + os.replace), sous un verrou de thread et un verrou de fichier partagé par
+    les workers: un lecteur voit toujours un fichier complet et aucune mise à jour concurrente
+    n'est perdue.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._users = {}
+        self._signature = None
+        self._lock = threading.RLock()
+
+    def _stat_signature(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def users(self):
+        """Utilisateurs à jour (dictionnaire partagé: ne pas le modifier)."""
+        signature = self._stat_signature()
+        if signature is not None and signature == self._signature:
+            return self._users
+        with self._lock:
+            return self._reload()
+
+    def _reload(self):
+        signature = self._stat_signature()
+        if signature is None:
+            # Créer un fichier utilisateur par défaut avec un admin
+            ensure_data_dir()
+            with self._file_lock():
+                if self._stat_signature() is None:
+                    self._write(default_users())
+            signature = self._stat_signature()
+        if signature != self._signature:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    users = json.load(f)
+            except (json.JSONDecodeError, FileNotFoundError):
+                # En cas d'erreur, retourner un dictionnaire vide
+                users = {}
+            self._users, self._signature = users, signature
+        return self._users
+
+    def _write(self, users):
+        directory = os.path.dirname(self.path)
+        fd, tmp = tempfile.mkstemp(prefix=".users-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(users, f, indent=4, ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        self._users, self._signature = users, self._stat_signature()
+
+    def save(self, users):
+        ensure_data_dir()
+        with self._lock, self._file_lock():
+            self._write(copy.deepcopy(users))
+
+    def modify(self, change):
+        """Applique change(users) -> (succès, message) sur une copie à jour; écrit si succès."""
+        ensure_data_dir()
+        with self._lock, self._file_lock():
+            users = copy.deepcopy(self._reload())
+            result = change(users)
+            if result[0]:
+                self._write(users)
+            return result
+
+# Un dépôt par chemin (USERS_FILE peut être redirigé, par exemple dans les tests)
+_stores = {}
+_stores_lock = threading.Lock()
+
+def get_user_store():
+    store = _stores.get(USERS_FILE)
+    if store is None:
+        with _stores_lock:
+            store = _stores.setdefault(USERS_FILE, UserStore(USERS_FILE))
+    return store
+
+# Fonction pour charger les utilisateurs depuis le fichier JSON (copie modifiable)
+def load_users():
+    return copy.deepcopy(get_user_store().users())
 
 # Fonction pour sauvegarder les utilisateurs dans le fichier JSON
 def save_users(users):
-    ensure_data_dir()
-    with open(USERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(users, f, indent=4, ensure_ascii=False)
+    get_user_store().save(users)
 
 # Fonction pour hacher un mot de passe
 def hash_password(password):
@@ -48,62 +148,64 @@ def hash_password(password):
 
 # Fonction pour vérifier les identifiants d'un utilisateur
 def verify_credentials(username, password):
-    users = load_users()
+    users = get_user_store().users()
     if username in users and users[username]["password"] == hash_password(password):
         return True
     return False
 
 # Fonction pour ajouter un nouvel utilisateur
 def add_user(username, password, role="user", name=""):
-    users = load_users()
-    if username in users:
-        return False, "Cet identifiant existe déjà"
-    
-    users[username] = {
-        "password": hash_password(password),
-        "role": role,
-        "name": name
-    }
-    
-    save_users(users)
-    return True, "Utilisateur ajouté avec succès"
+    def change(users):
+        if username in users:
+            return False, "Cet identifiant existe déjà"
+
+        users[username] = {
+            "password": hash_password(password),
+            "role": role,
+            "name": name
+        }
+        return True, "Utilisateur ajouté avec succès"
+
+    return get_user_store().modify(change)
 
 # Fonction pour supprimer un utilisateur
 def delete_user(username):
-    users = load_users()
-    if username not in users:
-        return False, "Utilisateur introuvable"
-    
-    del users[username]
-    save_users(users)
-    return True, "Utilisateur supprimé avec succès"
+    def change(users):
+        if username not in users:
+            return False, "Utilisateur introuvable"
+
+        del users[username]
+        return True, "Utilisateur supprimé avec succès"
+
+    return get_user_store().modify(change)
 
 # Fonction pour modifier un utilisateur
 def update_user(username, new_password=None, role=None, name=None):
-    users = load_users()
-    if username not in users:
-        return False, "Utilisateur introuvable"
-    
-    if new_password:
-        users[username]["password"] = hash_password(new_password)
-    
-    if role:
-        users[username]["role"] = role
-    
-    if name:
-        users[username]["name"] = name
-    
-    save_users(users)
-    return True, "Utilisateur mis à jour avec succès"
+    def change(users):
+        if username not in users:
+            return False, "Utilisateur introuvable"
+
+        if new_password:
+            users[username]["password"] = hash_password(new_password)
+
+        if role:
+            users[username]["role"] = role
+
+        if name:
+            users[username]["name"] = name
+
+        return True, "Utilisateur mis à jour avec succès"
+
+    return get_user_store().modify(change)
 
 # Fonction pour obtenir les informations d'un utilisateur
 def get_user(username):
-    users = load_users()
-    return users.get(username, None)
+    user = get_user_store().users().get(username, None)
+    return dict(user) if user is not None else None
 
 # Fonction pour obtenir la liste de tous les utilisateurs
 def get_all_users():
-    users = load_users()
+    users = get_user_store().users()
     # Retourner une copie sans les mots de passe
     sanitized_users = {}
     for username, user_data in users.items():
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(query):
+    """Clé de cache d'une question: espaces normalisés, minuscules."""
+    return " ".join(str(query).split()).lower()
+
+
+class LRUCache:
+    """Cache LRU borné et thread-safe, avec expiration (TTL) optionnelle.
+
+    - maxsize: nombre maximal d'entrées (les moins récemment utilisées sont évincées)
+    - ttl: durée de vie d'une entrée en secondes (None ou 0 = pas d'expiration)
+    """
+
+    def __init__(self, maxsize=1024, ttl=None, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, stored_at):
+        return bool(self.ttl) and self._clock() - stored_at > self.ttl
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or self._expired(entry[1]):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, self._clock())
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def items(self):
+        """Instantané des entrées non expirées, sans modifier l'ordre LRU ni les compteurs."""
+        with self._lock:
+            return [(key, value) for key, (value, stored_at) in self._data.items()
+                    if not self._expired(stored_at)]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
+
+
+class ResponseCache:
+    """Cache des réponses générées par le LLM.
+
+    La clé exacte est (question normalisée, ids ordonnés des chunks, version du prompt,
+    déploiement, version des artefacts). Si similarity_threshold est défini, une question
+    proche (cosinus des vecteurs de requête >= seuil) ayant récupéré exactement les mêmes
+    chunks avec le même prompt/déploiement réutilise la réponse en cache.
+    """
+
+    def __init__(self, maxsize=256, ttl=None, similarity_threshold=None, clock=time.monotonic):
+        self._cache = LRUCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self.similarity_threshold = similarity_threshold
+        self.semantic_hits = 0
+
+    def get(self, query, context, query_vector=None):
+        """Retourne la réponse en cache pour (query, context), ou None."""
+        entry = self._cache.get((normalize_query(query), context))
+        if entry is not None:
+            return entry[0]
+        if not self.similarity_threshold or query_vector is None:
+            return None
+
+        # Correspondance sémantique, restreinte aux entrées de même contexte
+        query_vector = _unit(query_vector)
+        best, best_score = None, self.similarity_threshold
+        for (_, entry_context), (response, vector) in self._cache.items():
+            if entry_context != context or vector is None:
+                continue
+            score = float(np.dot(query_vector, vector))
+            if score >= best_score:
+                best, best_score = response, score
+        if best is not None:
+            self.semantic_hits += 1
+        return best
+
+    def set(self, query, context, response, query_vector=None):
+        vector = _unit(query_vector) if query_vector is not None else None
+        self._cache.set((normalize_query(query), context), (response, vector))
+
+    def clear(self):
+        """Invalide toutes les réponses (à appeler après reconstruction de l'index)."""
+        self._cache.clear()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def stats(self):
+        stats = self._cache.stats()
+        stats["semantic_hits"] = self.semantic_hits
+        return stats
+
+
+def _unit(vector):
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
@@ -1,18 +1,32 @@
 import os
 import json
-import pickle
+import hashlib
+from functools import partial
+import shutil
 import faiss
 import numpy as np
 import logging
-from sentence_transformers import SentenceTransformer
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from tqdm import tqdm
+import requests
+from requests.adapters import HTTPAdapter
+from azure.core.pipeline.transport import RequestsTransport
 from azure.storage.blob import ContainerClient
-import fitz  # PyMuPDF pour PDF
-from pptx import Presentation  # Pour PPTX
-import io # Pour manipuler les streams en mémoire
 from dotenv import load_dotenv
 from ingestion import extract_text
+from keyword_index import KeywordIndex
+from ann_index import build_index, index_config_from_env, save_index_config
+from artifact_store import write_artifacts, read_artifacts
+import artifact_versions
+from index_manifest import IndexManifest, IncrementalCorpus, file_version
+from embedding import (
+    BUFFER_SIZE, EmbeddingBatcher, MAX_BATCH_SIZE, MAX_BATCH_TOKENS, MultiProcessEncoder, tokenizer_token_counts
+)
+from embedding_backends import DEFAULT_MODEL, load_embedding_backend
+from extraction_pipeline import (
+    DownloadedFile, ExtractionPipeline, SUPPORTED_EXTENSIONS, download_to_tempfile, extract_document_chunks,
+    parse_document
+)
 
 # Chemins des dossiers
 logger = logging.getLogger(__name__)
@@ -20,9 +34,12 @@ logger = logging.getLogger(__name__)
 # Charger les variables d'environnement
 load_dotenv()
 
-def load_local_documents_and_urls():
+def load_local_documents_and_urls(extract_content=True):
     """Charge les documents locaux depuis data/documents et les URLs depuis documents/Url_nom_FINA.json.
 
+    Avec extract_content=False, les fichiers sont seulement recensés (content=None): l'extraction
+    est alors faite plus tard, uniquement pour les fichiers nouveaux ou modifiés.
+
     Retourne:
       - documents: dict {doc_id: {"content": str, "metadata": {...}}}
       - url_dict: dict {filename: {"url": str, "category": str}}
@@ -42,8 +59,8 @@ def load_local_documents_and_urls():
         for file in files:
             file_path = os.path.join(root, file)
             try:
-                text = extract_text(file_path)
-                if not text or not isinstance(text, str) or not text.strip():
+                text = extract_text(file_path) if extract_content else None
+                if extract_content and (not text or not isinstance(text, str) or not text.strip()):
                     logger.warning("Texte vide ou non extractible pour: %s", file_path)
                     continue
                 doc_id = os.path.splitext(file)[0]
@@ -82,69 +99,70 @@ PROCESSED_DIR = os.path.join(DATA_DIR, "processed")  # Dossier contenant les doc
 MODELS_DIR = os.path.join(BASE_DIR, "models")
 URL_METADATA_FILE = os.path.join(DATA_DIR, "vectors", "metadata.json")
 
-# Fichiers de sortie
-UNIFIED_INDEX_FILE = os.path.join(MODELS_DIR, "unified_index.bin")
-UNIFIED_CHUNKS_FILE = os.path.join(MODELS_DIR, "unified_chunks.json")
-UNIFIED_METADATA_FILE = os.path.join(MODELS_DIR, "unified_metadata.pkl")
+# Fichiers de sortie, écrits dans un nouveau dossier models/versions/<version> à chaque
+# reconstruction puis publiés par le pointeur models/CURRENT (cf. artifact_versions)
+UNIFIED_INDEX_FILE = "unified_index.bin"
+UNIFIED_KEYWORDS_FILE = "unified_keywords.pkl"
+UNIFIED_INDEX_CONFIG_FILE = "unified_index_config.json"
+UNIFIED_EMBEDDINGS_FILE = "unified_embeddings.npy"
+UNIFIED_MANIFEST_FILE = "unified_manifest.json"
 
 # Paramètres
 CHUNK_SIZE = 1000
 CHUNK_OVERLAP = 200
-EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_MODEL = DEFAULT_MODEL
+# Backend d'encodage: sentence-transformers, onnx ou onnx-int8 (cf. embedding_backends)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "sentence-transformers")
+
+# Pipeline d'extraction: téléchargements concurrents, processus d'extraction, documents en vol
+DOWNLOAD_WORKERS = int(os.environ.get("DOWNLOAD_WORKERS", "8"))
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PIPELINE_MAX_PENDING = int(os.environ.get("PIPELINE_MAX_PENDING", "0")) or None
+
+# Lots d'embeddings: budget en tokens (taille du lot x plus long texte), taille maximale,
+# nombre de chunks accumulés (tous fichiers confondus) avant d'encoder
+EMBEDDING_BATCH_TOKENS = int(os.environ.get("EMBEDDING_BATCH_TOKENS", str(MAX_BATCH_TOKENS)))
+EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", str(MAX_BATCH_SIZE)))
+EMBEDDING_BUFFER_SIZE = int(os.environ.get("EMBEDDING_BUFFER_SIZE", str(BUFFER_SIZE)))
+
+# Encodage multi-processus (désactivé par défaut): nombre de processus, threads par processus
+# (0: cœurs / processus), attache de chaque processus à ses propres cœurs
+EMBEDDING_WORKERS = int(os.environ.get("EMBEDDING_WORKERS", "0"))
+EMBEDDING_THREADS_PER_WORKER = int(os.environ.get("EMBEDDING_THREADS_PER_WORKER", "0")) or None
+EMBEDDING_PIN_CPUS = os.environ.get("EMBEDDING_PIN_CPUS", "0") == "1"
 
 # --- Fonctions d'extraction de texte (copiées/adaptées depuis ingestion.py) ---
 
-def extract_text_from_pdf_stream(blob_name, blob_stream):
-    """Extrait le texte d'un flux de données PDF."""
-    try:
-        # Lire tout le contenu du stream Azure en mémoire d'abord
-        pdf_data = blob_stream.readall()
-        # Ensuite, passer ces bytes à fitz.open
-        doc = fitz.open(stream=pdf_data, filetype="pdf")
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text.strip()
-    except Exception as e:
-        logger.error("Erreur lors de l'extraction du PDF (stream) %s: %s", blob_name, str(e))
-        return None
-
-def extract_text_from_pptx_stream(blob_name, blob_stream):
-    """Extrait le texte d'un flux de données PPTX."""
-    try:
-        # Presentation a besoin d'un objet fichier-like, BytesIO fait l'affaire
-        prs = Presentation(io.BytesIO(blob_stream.readall()))
-        text = "\n".join(shape.text for slide in prs.slides for shape in slide.shapes if hasattr(shape, "text") and shape.text)
-        return text.strip()
-    except Exception as e:
-        logger.error("Erreur lors de l'extraction du PPTX (stream) %s: %s", blob_name, str(e))
-        return None
+def get_container_client(azure_sas_url, pool_size=DOWNLOAD_WORKERS):
+    """ContainerClient dont le pool de connexions HTTP couvre tous les téléchargements concurrents.
+
+    Les BlobClient obtenus par get_blob_client partagent ce pool (même pipeline de transport).
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return ContainerClient.from_container_url(
+        azure_sas_url, transport=RequestsTransport(session=session, session_owner=False)
+    )
+
+def download_entry(entry):
+    """Fichier à extraire: blob Azure téléchargé par blocs dans un fichier temporaire, ou fichier local."""
+    if entry["type"] == "local":
+        return DownloadedFile(entry["path"], False)
+    logger.info("Téléchargement du blob: %s", entry["name"])
+    return download_to_tempfile(entry["blob_client"].download_blob().chunks(),
+                                suffix=os.path.splitext(entry["name"])[1])
 
 def extract_text_from_blob(blob_name, blob_client):
     """
     Télécharge un blob et extrait son contenu textuel en fonction de son extension.
     """
-    content_text = None
-    file_extension = blob_name.split('.')[-1].lower()
-    
-    logger.info("Téléchargement du blob: %s (type: %s)", blob_name, file_extension)
-    blob_stream = blob_client.download_blob() # Renvoie un StorageStreamDownloader
-
-    if file_extension == 'pdf':
-        content_text = extract_text_from_pdf_stream(blob_name, blob_stream)
-    elif file_extension == 'pptx':
-        content_text = extract_text_from_pptx_stream(blob_name, blob_stream)
-    elif file_extension == 'txt': # Garder la logique pour les .txt directs
-        try:
-            content_text = blob_stream.readall().decode('utf-8')
-        except Exception as e:
-            logger.error("Erreur lors de la lecture du blob texte %s: %s", blob_name, str(e))
-            content_text = None
-    else:
-        logger.warning("Type de blob non supporté pour extraction directe: %s", blob_name)
-        # On pourrait ajouter ici d'autres extracteurs si nécessaire
-
+    downloaded = download_entry({"type": "azure", "name": blob_name, "blob_client": blob_client})
+    try:
+        content_text = parse_document(blob_name, downloaded.path)
+    finally:
+        os.remove(downloaded.path)
     if content_text:
         logger.info("Texte extrait de %s", blob_name)
     else:
@@ -152,14 +170,30 @@ def extract_text_from_blob(blob_name, blob_client):
         
     return content_text
 
+def iter_document_chunks(entries):
+    """Télécharge, extrait et découpe les entrées en parallèle.
+
+    Produit (entry, ParsedDocument, erreur) dans l'ordre des entrées; chaque document est lu
+    page par page et découpé au fil de l'eau dans les processus d'extraction.
+    """
+    pipeline = ExtractionPipeline(
+        download_entry, partial(extract_document_chunks, chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP),
+        download_workers=DOWNLOAD_WORKERS,
+        parse_workers=PARSE_WORKERS,
+        max_pending=PIPELINE_MAX_PENDING
+    )
+    logger.info("Extraction de %d documents (%d téléchargements, %d processus d'extraction en parallèle)",
+                len(entries), pipeline.download_workers, pipeline.parse_workers)
+    return pipeline.run(entries)
+
 # --- Fin des fonctions d'extraction ---
 
 def load_documents(azure_sas_url=None):
     """Recense les éléments à traiter sans charger leur contenu.
 
     Retourne une liste d'entrées:
-    - Local: {"type": "local", "path": file_path, "name": file, "category": category}
-    - Azure: {"type": "azure", "blob_client": blob_client, "name": blob.name, "category": category}
+    - Local: {"type": "local", "path": file_path, "name": file, "category": category, "version": mtime-taille}
+    - Azure: {"type": "azure", "blob_client": blob_client, "name": blob.name, "category": category, "version": etag}
     """
     files_to_process = []
     logger.info("Recensement des documents à traiter...")
@@ -168,12 +202,12 @@ def load_documents(azure_sas_url=None):
     if azure_sas_url:
         logger.info("Connexion à Azure Blob Storage avec l'URL SAS...")
         try:
-            container_client = ContainerClient.from_container_url(azure_sas_url)
+            container_client = get_container_client(azure_sas_url)
             azure_found = 0
             logger.info("Exploration du conteneur Azure...")
             for blob in container_client.list_blobs():
                 ext = os.path.splitext(blob.name)[1].lower()
-                if ext not in [".pdf", ".pptx", ".txt"]:
+                if ext not in SUPPORTED_EXTENSIONS:
                     continue
                 category_parts = blob.name.split('/')[:-1]
                 category = "/".join(category_parts) if category_parts else "general_azure"
@@ -181,7 +215,8 @@ def load_documents(azure_sas_url=None):
                     "type": "azure",
                     "blob_client": container_client.get_blob_client(blob.name),
                     "name": blob.name,
-                    "category": category
+                    "category": category,
+                    "version": blob.etag
                 })
                 azure_found += 1
             logger.info("Blobs éligibles trouvés: %d", azure_found)
@@ -205,7 +240,8 @@ def load_documents(azure_sas_url=None):
                     "type": "local",
                     "path": file_path,
                     "name": file,
-                    "category": category
+                    "category": category,
+                    "version": file_version(file_path)
                 })
                 local_found += 1
         logger.info("Fichiers locaux éligibles trouvés: %d", local_found)
@@ -305,58 +341,190 @@ def associate_urls_to_metadata(metadata, url_dict):
 
 def create_embeddings(chunks):
     """Crée des embeddings pour les chunks"""
-    logger.info("Chargement du modèle d'embeddings %s...", EMBEDDING_MODEL)
-    model = SentenceTransformer(EMBEDDING_MODEL)
+    model = load_embedding_backend(EMBEDDING_BACKEND, EMBEDDING_MODEL)
     
     logger.info("Création des embeddings...")
-    embeddings = []
-    
-    # Traiter les chunks par lots
-    batch_size = 32
-    for i in tqdm(range(0, len(chunks), batch_size), desc="Création des embeddings"):
-        batch = chunks[i:i+batch_size]
-        batch_embeddings = model.encode(batch)
-        embeddings.extend(batch_embeddings)
-    
-    embeddings = np.array(embeddings).astype('float32')
+    # Lots triés par longueur en tokens, de taille adaptée (cf. EmbeddingBatcher)
+    batcher = EmbeddingBatcher(lambda batch: model.encode(batch, batch_size=len(batch)),
+                               tokenizer_token_counts(model), EMBEDDING_BATCH_TOKENS, EMBEDDING_BATCH_SIZE)
+    embeddings = batcher.submit(chunks).result()
     logger.info("%d embeddings créés de dimension %d", len(embeddings), embeddings.shape[1])
     
     return embeddings
 
-def build_faiss_index(embeddings):
-    """Construit l'index FAISS"""
+def build_faiss_index(embeddings, index_config=None):
+    """Construit l'index FAISS (type configurable via INDEX_TYPE: flat, hnsw, ivf, ivfpq, ivfsq8)"""
     logger.info("Construction de l'index FAISS...")
     
-    # Créer l'index
-    dimension = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dimension)
-    
-    # Ajouter les vecteurs à l'index
-    index.add(embeddings)
+    if index_config is None:
+        index_config = index_config_from_env(len(embeddings), embeddings.shape[1])
+    logger.info("Type d'index: %s, paramètres: %s", index_config["index_type"], index_config["params"])
+
+    # Créer l'index, l'entraîner si nécessaire et y ajouter les vecteurs
+    index = build_index(embeddings, index_config)
     
     logger.info("Index FAISS créé avec %d vecteurs", index.ntotal)
     return index
 
-def save_unified_data(index, chunks, metadata):
-    """Sauvegarde les données unifiées"""
+def load_incremental_corpus(settings):
+    """Prépare la mise à jour incrémentale à partir du manifeste et des artefacts précédents.
+
+    FULL_REBUILD=1 force une reconstruction complète (tout est réextrait et réencodé).
+    """
+    # Version publiée (ou ancienne disposition à plat dans models/)
+    directory = artifact_versions.current_dir(MODELS_DIR)
+    manifest = IndexManifest.load(os.path.join(directory, UNIFIED_MANIFEST_FILE), settings)
+    if os.environ.get("FULL_REBUILD", "0") == "1" or not len(manifest):
+        return IncrementalCorpus(IndexManifest(settings))
+    try:
+        chunks, metadata = read_artifacts(directory)
+        embeddings = np.load(os.path.join(directory, UNIFIED_EMBEDDINGS_FILE))
+    except (OSError, ValueError):
+        logger.warning("Artefacts précédents illisibles: reconstruction complète")
+        return IncrementalCorpus(IndexManifest(settings))
+    corpus = IncrementalCorpus.from_artifacts(manifest, chunks, metadata, embeddings)
+    if not len(corpus.manifest):
+        logger.warning("Artefacts précédents incohérents avec le manifeste: reconstruction complète")
+    else:
+        logger.info("Manifeste chargé: %d sources déjà indexées", len(manifest))
+    return corpus
+
+def derived_settings(index_config, url_dict):
+    """Configuration résolue de l'index et empreinte des URLs, telles qu'enregistrées dans le manifeste."""
+    urls = json.dumps(url_dict or {}, sort_keys=True, ensure_ascii=False, default=str)
+    # Aller-retour JSON: comparable à la valeur relue depuis le manifeste (tuples -> listes)
+    return json.loads(json.dumps({
+        "index": index_config,
+        "urls_sha256": hashlib.sha256(urls.encode("utf-8")).hexdigest(),
+    }, default=str))
+
+def save_unified_data(index, chunks, metadata, index_config=None, embeddings=None, manifest=None):
+    """Sauvegarde les données unifiées dans une nouvelle version, puis la publie.
+
+    Les fichiers sont écrits dans un dossier temporaire, synchronisés sur disque et décrits
+    par un manifeste (comptes, SHA-256) avant le renommage atomique du dossier: un arrêt
+    brutal ne laisse jamais de version partielle. L'application détecte la nouvelle version
+    (pointeur models/CURRENT) et la charge sans redémarrer.
+    """
     logger.info("Sauvegarde des données unifiées...")
+    if not index.ntotal == len(chunks) == len(metadata):
+        raise ValueError(f"Données désalignées: {index.ntotal} vecteurs, {len(chunks)} chunks, "
+                         f"{len(metadata)} métadonnées")
     
-    # Créer le dossier models s'il n'existe pas
-    os.makedirs(MODELS_DIR, exist_ok=True)
-    
+    version, directory = artifact_versions.create_version(MODELS_DIR)
+    try:
+        write_version_files(directory, index, chunks, metadata, index_config, embeddings, manifest)
+        artifact_versions.commit_version(MODELS_DIR, version, {
+            "vectors": index.ntotal, "chunks": len(chunks), "metadata": len(metadata)
+        })
+    except BaseException:
+        # Version incomplète: jamais renommée ni publiée
+        shutil.rmtree(directory, ignore_errors=True)
+        raise
+
+    # Version complète: bascule atomique du pointeur, puis nettoyage des anciennes versions
+    artifact_versions.publish(MODELS_DIR, version)
+    artifact_versions.prune(MODELS_DIR)
+    return version
+
+def write_version_files(directory, index, chunks, metadata, index_config=None, embeddings=None, manifest=None):
+    """Écrit les artefacts d'une version dans directory."""
     # Sauvegarder l'index FAISS
-    faiss.write_index(index, UNIFIED_INDEX_FILE)
-    logger.info("Index FAISS sauvegardé dans %s", UNIFIED_INDEX_FILE)
-    
-    # Sauvegarder les chunks
-    with open(UNIFIED_CHUNKS_FILE, 'w', encoding='utf-8') as f:
-        json.dump({"chunks": chunks}, f, ensure_ascii=False, indent=2)
-    logger.info("Chunks sauvegardés dans %s", UNIFIED_CHUNKS_FILE)
+    faiss.write_index(index, os.path.join(directory, UNIFIED_INDEX_FILE))
+    logger.info("Index FAISS sauvegardé dans %s", directory)
+
+    # Sauvegarder le type et les paramètres de l'index (relus par l'application)
+    if index_config is not None:
+        save_index_config(index_config, os.path.join(directory, UNIFIED_INDEX_CONFIG_FILE))
+        logger.info("Configuration de l'index sauvegardée")
     
-    # Sauvegarder les métadonnées
-    with open(UNIFIED_METADATA_FILE, 'wb') as f:
-        pickle.dump(metadata, f)
-    logger.info("Métadonnées sauvegardées dans %s", UNIFIED_METADATA_FILE)
+    # Chunks et métadonnées au format compact, projeté en mémoire par l'application et relu
+    # par la mise à jour incrémentale (les anciens unified_chunks.json/unified_metadata.pkl
+    # ne sont plus écrits)
+    write_artifacts(directory, chunks, metadata)
+    logger.info("Chunks et métadonnées sauvegardés au format compact")
+
+    # Sauvegarder l'index inversé pour la recherche par mots-clés
+    KeywordIndex.build(chunks, metadata).save(os.path.join(directory, UNIFIED_KEYWORDS_FILE))
+    logger.info("Index mots-clés sauvegardé")
+
+    # Vecteurs bruts et manifeste des sources, pour la prochaine mise à jour incrémentale
+    if embeddings is not None and manifest is not None:
+        np.save(os.path.join(directory, UNIFIED_EMBEDDINGS_FILE), embeddings)
+        manifest.save(os.path.join(directory, UNIFIED_MANIFEST_FILE))
+        logger.info("Manifeste des sources sauvegardé")
+
+def source_key(entry):
+    return f"{entry['type']}:{entry['name'] if entry['type'] == 'azure' else entry['path']}"
+
+def index_sources(corpus, files_to_process, embed):
+    """Ajoute au corpus les sources nouvelles ou modifiées. Retourne (fichiers traités, erreurs)."""
+    processed_files = 0
+    error_count = 0
+
+    # 4. Traitement incrémental des fichiers/blobs: seuls les nouveaux ou modifiés sont extraits et encodés
+    entries_to_extract = []
+    for entry in files_to_process:
+        if corpus.unchanged(source_key(entry), entry.get("version")):
+            logger.debug("Inchangé: %s", entry.get("path") or entry.get("name"))
+            processed_files += 1
+        else:
+            entries_to_extract.append(entry)
+
+    # Téléchargement, extraction et découpage en parallèle, consommés ici un par un (embeddings)
+    for entry, parsed, extraction_error in iter_document_chunks(entries_to_extract):
+        file_label = entry.get("path") or entry.get("name")
+        try:
+            if extraction_error is not None:
+                raise extraction_error
+
+            if not parsed.chunks:
+                logger.warning("Contenu vide ignoré: %s", file_label)
+                continue
+
+            # Métadonnées document
+            if entry["type"] == "local":
+                doc_id = os.path.splitext(os.path.basename(entry["name"]))[0]
+                source = entry["name"]
+                path = entry["path"]
+            else:
+                doc_id = os.path.splitext(os.path.basename(entry["name"]))[0]
+                source = entry["name"]
+                container_name = getattr(entry["blob_client"], "container_name", "")
+                path = f"azure_blob://{container_name}/{entry['name']}" if container_name else f"azure_blob://{entry['name']}"
+
+            category = entry.get("category", "general")
+
+            # Créer métadonnées des chunks (page ou diapositive de début, pour les citations)
+            file_metadata = []
+            for i, page in enumerate(parsed.pages):
+                meta = {
+                    "title": doc_id,
+                    "source": source,
+                    "path": path,
+                    "category": category,
+                    "chunk_id": i,
+                    "doc_id": f"{entry['type']}_{doc_id}"
+                }
+                if page is not None:
+                    meta["page"] = page
+                file_metadata.append(meta)
+
+            # Embeddings pour les chunks de ce fichier (en lot), repris si le texte n'a pas changé
+            file_chunks = parsed.chunks
+            corpus.add(source_key(entry), entry.get("version"), parsed.sha256, file_chunks, file_metadata, embed)
+            processed_files += 1
+
+            logger.info("Fichier traité: %s | chunks: %d", file_label, len(file_chunks))
+
+        except Exception:
+            error_count += 1
+            logger.exception("Erreur lors du traitement du fichier %s", file_label)
+            # Une source déjà indexée n'est pas retirée pour une erreur passagère
+            if corpus.keep(source_key(entry)):
+                logger.warning("Version précédente conservée pour %s", file_label)
+            continue
+    return processed_files, error_count
 
 def main():
     """Fonction principale"""
@@ -406,7 +574,7 @@ def main():
     else:
         # Mode local
         logger.info("DATA_SOURCE=local: Chargement des documents et URLs locales")
-        documents_local, url_dict = load_local_documents_and_urls()
+        documents_local, url_dict = load_local_documents_and_urls(extract_content=False)
         if not documents_local:
             logger.error("Aucun document local trouvé à traiter.")
             return
@@ -417,113 +585,88 @@ def main():
                 "type": "local",
                 "path": doc["metadata"].get("path", doc["metadata"].get("source", "")),
                 "name": doc["metadata"].get("source", doc_id + ".txt"),
-                "category": doc["metadata"].get("category", "general_local")
+                "category": doc["metadata"].get("category", "general_local"),
+                "version": file_version(doc["metadata"]["path"])
             })
 
-    # 3. Préparer les composants partagés
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=CHUNK_SIZE,
-        chunk_overlap=CHUNK_OVERLAP,
-        length_function=len,
-        separators=["\n\n", "\n", " ", ""]
+    # 3. Préparer les composants partagés (le découpage est fait par le pipeline d'extraction)
+    model = None
+
+    def get_model():
+        # Modèle chargé seulement si au moins une source doit être (ré)encodée
+        nonlocal model
+        if model is None:
+            model = load_embedding_backend(EMBEDDING_BACKEND, EMBEDDING_MODEL)
+        return model
+
+    encoder = None
+    if EMBEDDING_WORKERS > 1:
+        # Les mêmes lots sont encodés en parallèle, chaque processus avec sa copie du modèle
+        encoder = MultiProcessEncoder(partial(load_embedding_backend, EMBEDDING_BACKEND, EMBEDDING_MODEL), EMBEDDING_WORKERS,
+                                      EMBEDDING_THREADS_PER_WORKER, EMBEDDING_PIN_CPUS)
+
+    # Chunks de plusieurs fichiers encodés ensemble, par lots triés par longueur en tokens
+    embed = EmbeddingBatcher(
+        encoder or (lambda batch: get_model().encode(batch, batch_size=len(batch))),
+        # Avec un pool, les tokens sont comptés par les processus (pas de modèle dans ce processus)
+        encoder.count_tokens if encoder else (lambda texts: tokenizer_token_counts(get_model())(texts)),
+        max_batch_tokens=EMBEDDING_BATCH_TOKENS,
+        max_batch_size=EMBEDDING_BATCH_SIZE,
+        buffer_size=EMBEDDING_BUFFER_SIZE
     )
-    logger.info("Chargement du modèle d'embeddings %s...", EMBEDDING_MODEL)
-    model = SentenceTransformer(EMBEDDING_MODEL)
-
-    index = None
-    all_chunks = []
-    all_metadata = []
-
-    processed_files = 0
-    error_count = 0
 
-    # 4. Traitement incrémental des fichiers/blobs
-    for entry in files_to_process:
-        file_label = entry.get("path") or entry.get("name")
-        try:
-            # Extraire le contenu texte
-            if entry["type"] == "local":
-                with open(entry["path"], 'r', encoding='utf-8') as f:
-                    content = f.read()
-            else:  # azure
-                content = extract_text_from_blob(entry["name"], entry["blob_client"])
-
-            if not content or not content.strip():
-                logger.warning("Contenu vide ignoré: %s", file_label)
-                continue
-
-            # Métadonnées document
-            if entry["type"] == "local":
-                doc_id = os.path.splitext(os.path.basename(entry["name"]))[0]
-                source = entry["name"]
-                path = entry["path"]
-            else:
-                doc_id = os.path.splitext(os.path.basename(entry["name"]))[0]
-                source = entry["name"]
-                container_name = getattr(entry["blob_client"], "container_name", "")
-                path = f"azure_blob://{container_name}/{entry['name']}" if container_name else f"azure_blob://{entry['name']}"
-
-            category = entry.get("category", "general")
-
-            # Chunking
-            doc_chunks = text_splitter.split_text(content)
-            if not doc_chunks:
-                logger.warning("Aucun chunk généré pour: %s", file_label)
-                continue
-
-            # Créer métadonnées des chunks
-            file_metadata = []
-            for i, chunk in enumerate(doc_chunks):
-                if not chunk.strip():
-                    continue
-                meta = {
-                    "title": doc_id,
-                    "source": source,
-                    "path": path,
-                    "category": category,
-                    "chunk_id": i,
-                    "doc_id": f"{entry['type']}_{doc_id}"
-                }
-                file_metadata.append(meta)
-
-            # Embeddings pour les chunks de ce fichier (en lot)
-            file_chunks = [c for c in doc_chunks if c.strip()]
-            file_embeddings = model.encode(file_chunks)
-            file_embeddings = np.array(file_embeddings).astype('float32')
-
-            # Initialiser ou alimenter l'index FAISS
-            if index is None:
-                dimension = file_embeddings.shape[1]
-                index = faiss.IndexFlatL2(dimension)
-            index.add(file_embeddings)
-
-            # Accumuler pour sauvegarde finale
-            all_chunks.extend(file_chunks)
-            all_metadata.extend(file_metadata)
-            processed_files += 1
-
-            logger.info("Fichier traité: %s | chunks: %d", file_label, len(file_chunks))
-
-        except Exception:
-            error_count += 1
-            logger.exception("Erreur lors du traitement du fichier %s", file_label)
-            continue
+    # Pool d'encodage fermé quelle que soit l'issue (y compris sans changement ou sur erreur)
+    try:
+        corpus = load_incremental_corpus({
+            "embedding_model": EMBEDDING_MODEL, "chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP,
+            # Les vecteurs ONNX int8 diffèrent légèrement: changer de backend réencode tout
+            "embedding_backend": EMBEDDING_BACKEND,
+            # Découpage page par page (numéros de page dans les métadonnées)
+            "chunker": "pages"
+        })
+        processed_files, error_count = index_sources(corpus, files_to_process, embed)
+        logger.info("Sources inchangées: %d, ajoutées: %d, modifiées: %d",
+                    corpus.stats["unchanged"], corpus.stats["added"], corpus.stats["changed"])
+        all_chunks, all_metadata, embeddings, manifest = corpus.result()
+    finally:
+        if encoder is not None:
+            encoder.close()
+
+    # Paramètres des artefacts dérivés des vecteurs: s'ils changent, l'index et les
+    # métadonnées sont reconstruits à partir des vecteurs repris, sans réencodage
+    index_config = index_config_from_env(len(embeddings), embeddings.shape[1]) if len(embeddings) else None
+    manifest.derived = derived_settings(index_config, url_dict)
+    if len(corpus.manifest) and not corpus.modified:
+        if corpus.manifest.derived == manifest.derived:
+            logger.info("Aucun changement depuis la dernière indexation: artefacts conservés.")
+            return
+        logger.info("Configuration de l'index ou URLs modifiées: reconstruction de l'index et des métadonnées")
 
-    if not all_chunks or index is None:
-        logger.error("Aucun chunk ou index non initialisé. Arrêt.")
+    logger.info("Sources supprimées: %d", corpus.stats["removed"])
+    if not all_chunks:
+        logger.error("Aucun chunk généré. Arrêt.")
         return
 
-    # 5. Associer les URLs aux métadonnées (post-traitement)
+    # 5. Construire l'index FAISS du type configuré (vecteurs repris + nouveaux)
+    index = build_faiss_index(embeddings, index_config)
+
+    # 6. Associer les URLs aux métadonnées (post-traitement, y compris pour les chunks repris)
+    for meta in all_metadata:
+        meta.pop("url", None)
+        meta.pop("url_category", None)
     all_metadata = associate_urls_to_metadata(all_metadata, url_dict)
 
-    # 6. Sauvegarder les données unifiées
-    save_unified_data(index, all_chunks, all_metadata)
+    # 7. Sauvegarder les données unifiées
+    save_unified_data(index, all_chunks, all_metadata, index_config, embeddings, manifest)
 
     logger.info("Base de données vectorielle unifiée créée avec succès!")
     logger.info("Statistiques finales:")
     logger.info("  - Fichiers traités: %d", processed_files)
     logger.info("  - Erreurs: %d", error_count)
     logger.info("  - Chunks créés: %d", len(all_chunks))
+    logger.info("  - Chunks encodés: %d (%.1f chunks/s, %d lots)",
+                embed.stats["chunks"], embed.chunks_per_second, embed.stats["batches"])
+    logger.info("  - Type d'index: %s", index_config["index_type"])
     logger.info("  - Dimension des embeddings: %d", index.d)
     logger.info("  - Taille de l'index FAISS: %d vecteurs", index.ntotal)
 
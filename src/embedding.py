@@ -0,0 +1,257 @@
+"""Calcul des embeddings des chunks lors de la construction de la base vectorielle.
+
+EmbeddingBatcher regroupe les chunks de plusieurs fichiers avant de les encoder: les
+textes en attente sont triés par longueur (en tokens) et découpés en lots dont le coût
+avec padding (taille du lot x plus long texte du lot) reste sous un budget de tokens.
+Les textes courts forment donc de grands lots, les longs de petits lots, et presque
+aucun calcul n'est perdu en padding.
+
+MultiProcessEncoder répartit ces lots entre plusieurs processus (un modèle chacun, nombre
+de threads fixé par processus): les lots sont identiques à ceux du mode mono-processus,
+seul leur encodage est parallélisé.
+"""
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Budget d'un lot: taille du lot x longueur (tokens) du plus long texte du lot
+MAX_BATCH_TOKENS = 16384
+MAX_BATCH_SIZE = 256
+# Nombre de chunks accumulés (tous fichiers confondus) avant d'encoder
+BUFFER_SIZE = 2048
+
+
+def estimate_token_counts(texts):
+    """Estimation du nombre de tokens quand aucun tokenizer n'est disponible (~4 caractères par token)."""
+    return [len(text) // 4 + 2 for text in texts]
+
+
+def tokenizer_token_counts(model):
+    """Compte les tokens avec le tokenizer du modèle (backend d'embeddings ou SentenceTransformer)."""
+    if hasattr(model, "count_tokens"):
+        return model.count_tokens
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is None:
+        return estimate_token_counts
+    max_length = getattr(model, "max_seq_length", None) or 512
+
+    def count(texts):
+        encoded = tokenizer(list(texts), add_special_tokens=True, truncation=True, max_length=max_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+    return count
+
+
+def plan_batches(lengths, max_batch_tokens=MAX_BATCH_TOKENS, max_batch_size=MAX_BATCH_SIZE):
+    """Regroupe des textes par longueur croissante. Retourne une liste de lots (listes d'indices)."""
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    batches, batch = [], []
+    for i in order:
+        # Trié par longueur croissante: le texte courant est le plus long du lot
+        if batch and ((len(batch) + 1) * max(lengths[i], 1) > max_batch_tokens or len(batch) >= max_batch_size):
+            batches.append(batch)
+            batch = []
+        batch.append(i)
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+class PendingEmbeddings:
+    """Vecteurs d'un groupe de textes soumis au batcher, disponibles après encodage."""
+
+    def __init__(self, batcher, size):
+        self._batcher = batcher
+        self._size = size
+        self._vectors = None
+        self._error = None
+
+    def __len__(self):
+        return self._size
+
+    def result(self):
+        if self._vectors is None and self._error is None:
+            self._batcher.flush()
+        if self._error is not None:
+            raise RuntimeError("Échec de l'encodage des embeddings") from self._error
+        return self._vectors
+
+
+class EmbeddingBatcher:
+    """Encode des chunks par lots triés par longueur, en regroupant plusieurs fichiers.
+
+    - encode(texts) -> vecteurs, appelé une fois par lot
+    - count_tokens(texts) -> longueurs en tokens (défaut: estimation par caractères)
+    submit(texts) retourne un PendingEmbeddings; l'encodage a lieu quand buffer_size chunks
+    sont en attente, ou au premier result() / flush().
+    """
+
+    def __init__(self, encode, count_tokens=None, max_batch_tokens=MAX_BATCH_TOKENS,
+                 max_batch_size=MAX_BATCH_SIZE, buffer_size=BUFFER_SIZE):
+        self.encode = encode
+        self.count_tokens = count_tokens or estimate_token_counts
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.buffer_size = buffer_size
+        self._texts = []
+        self._pending = []  # [(PendingEmbeddings, début, fin)] dans self._texts
+        self.stats = {"chunks": 0, "batches": 0, "seconds": 0.0, "padded_tokens": 0, "tokens": 0}
+
+    def submit(self, texts):
+        texts = list(texts)
+        pending = PendingEmbeddings(self, len(texts))
+        self._pending.append((pending, len(self._texts), len(self._texts) + len(texts)))
+        self._texts.extend(texts)
+        if len(self._texts) >= self.buffer_size:
+            self.flush()
+        return pending
+
+    __call__ = submit
+
+    def flush(self):
+        """Encode tous les textes en attente."""
+        if not self._pending:
+            return
+        texts, pending = self._texts, self._pending
+        self._texts, self._pending = [], []
+
+        start = time.perf_counter()
+        try:
+            vectors = self._encode_sorted(texts) if texts else None
+        except BaseException as e:
+            for handle, _, _ in pending:
+                handle._error = e
+            raise
+        elapsed = time.perf_counter() - start
+
+        for handle, begin, end in pending:
+            handle._vectors = vectors[begin:end] if vectors is not None else np.zeros((0, 0), dtype="float32")
+        self.stats["chunks"] += len(texts)
+        self.stats["seconds"] += elapsed
+        if texts:
+            logger.info("Embeddings: %d chunks en %.1f s (%.1f chunks/s, total %d chunks à %.1f chunks/s)",
+                        len(texts), elapsed, len(texts) / elapsed if elapsed else 0.0,
+                        self.stats["chunks"], self.chunks_per_second)
+
+    def _encode_sorted(self, texts):
+        lengths = self.count_tokens(texts)
+        batches = plan_batches(lengths, self.max_batch_tokens, self.max_batch_size)
+        batch_texts = [[texts[i] for i in batch] for batch in batches]
+        # Un encodeur multi-processus encode plusieurs lots en parallèle (résultats dans l'ordre)
+        encoded = self.encode.map(batch_texts) if hasattr(self.encode, "map") else map(self.encode, batch_texts)
+        vectors = None
+        for batch, batch_vectors in zip(batches, encoded):
+            batch_vectors = np.asarray(batch_vectors, dtype="float32")
+            if vectors is None:
+                vectors = np.empty((len(texts), batch_vectors.shape[1]), dtype="float32")
+            vectors[batch] = batch_vectors
+            self.stats["batches"] += 1
+            self.stats["tokens"] += sum(lengths[i] for i in batch)
+            self.stats["padded_tokens"] += len(batch) * max(lengths[i] for i in batch)
+        return vectors
+
+    @property
+    def chunks_per_second(self):
+        return self.stats["chunks"] / self.stats["seconds"] if self.stats["seconds"] else 0.0
+
+
+def pin_threads(threads, cpus=None):
+    """Limite les threads de calcul du processus courant et, si fourni, l'attache à des cœurs."""
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ[var] = str(threads)
+    try:
+        import torch
+        torch.set_num_threads(threads)
+    except ImportError:
+        pass
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+
+# Modèle chargé dans chaque processus d'encodage
+_worker_model = None
+
+
+def _init_worker(load_model, threads, cpu_sets, counter):
+    global _worker_model
+    with counter.get_lock():
+        rank = counter.value
+        counter.value += 1
+    pin_threads(threads, cpu_sets[rank % len(cpu_sets)] if cpu_sets else None)
+    _worker_model = load_model()
+
+
+def _encode_in_worker(texts):
+    return np.asarray(_worker_model.encode(texts, batch_size=len(texts)), dtype="float32")
+
+
+def _count_tokens_in_worker(texts):
+    return tokenizer_token_counts(_worker_model)(texts)
+
+
+class MultiProcessEncoder:
+    """Encode des lots dans un pool de processus, chacun avec sa copie du modèle.
+
+    - load_model() -> modèle exposant encode(texts, batch_size); fonction picklable
+      (ex. functools.partial(load_embedding_backend, backend, nom))
+    - threads_per_worker: threads de calcul par processus (défaut: cœurs / workers)
+    - pin_cpus: attache chaque processus à un sous-ensemble distinct de cœurs
+    Le pool est démarré au premier lot (contexte "spawn": pas de fork d'un processus
+    ayant déjà initialisé torch) et arrêté par close(). count_tokens utilise le tokenizer
+    des processus: le processus principal n'a pas à charger le modèle.
+    """
+
+    def __init__(self, load_model, workers, threads_per_worker=None, pin_cpus=False):
+        self.load_model = load_model
+        self.workers = max(1, workers)
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        self.threads_per_worker = threads_per_worker or max(1, len(cpus) // self.workers)
+        self.cpu_sets = None
+        if pin_cpus and len(cpus) >= self.workers:
+            step = len(cpus) // self.workers
+            self.cpu_sets = [set(cpus[i * step:(i + 1) * step]) for i in range(self.workers)]
+        self._executor = None
+
+    def _pool(self):
+        if self._executor is None:
+            logger.info("Démarrage de %d processus d'encodage (%d threads chacun)",
+                        self.workers, self.threads_per_worker)
+            context = multiprocessing.get_context("spawn")
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=context,
+                initializer=_init_worker,
+                initargs=(self.load_model, self.threads_per_worker, self.cpu_sets, context.Value("i", 0))
+            )
+        return self._executor
+
+    def __call__(self, texts):
+        return self._pool().submit(_encode_in_worker, list(texts)).result()
+
+    def count_tokens(self, texts):
+        """Longueur en tokens de chaque texte, calculée par tranches dans les processus."""
+        texts = list(texts)
+        step = max(1, -(-len(texts) // self.workers))
+        slices = [texts[start:start + step] for start in range(0, len(texts), step)]
+        return [count for counts in self._pool().map(_count_tokens_in_worker, slices) for count in counts]
+
+    def map(self, batches):
+        """Encode des lots en parallèle; résultats dans l'ordre des lots."""
+        return self._pool().map(_encode_in_worker, batches)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
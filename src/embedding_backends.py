@@ -0,0 +1,186 @@
+"""Backends d'encodage des textes en vecteurs, communs à l'application et au script d'indexation.
+
+- sentence-transformers: le modèle PyTorch d'origine (défaut)
+- onnx: le même modèle exporté en ONNX et exécuté par ONNX Runtime (sans torch)
+- onnx-int8: la version quantifiée en int8 (poids dynamiques), plus rapide sur CPU
+
+Le backend est choisi par la variable d'environnement EMBEDDING_BACKEND. Les vecteurs
+sont normalisés (pooling moyen puis L2, comme le modèle all-MiniLM-L6-v2 d'origine).
+
+Export du modèle ONNX (nécessite sentence-transformers, torch et onnxruntime):
+    python src/embedding_backends.py [models/onnx] [nom du modèle]
+"""
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+BACKENDS = ("sentence-transformers", "onnx", "onnx-int8")
+
+ONNX_DIR = os.path.join("models", "onnx")
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+ONNX_TOKENIZER_FILE = "tokenizer.json"
+ONNX_CONFIG_FILE = "embedding_config.json"
+
+
+class EmbeddingBackend:
+    """Interface d'un backend: encode(texts, batch_size) -> vecteurs float32 normalisés."""
+
+    name = None
+
+    def encode(self, texts, batch_size=32):
+        raise NotImplementedError
+
+    def count_tokens(self, texts):
+        """Longueur en tokens de chaque texte (tronquée à la longueur maximale du modèle)."""
+        raise NotImplementedError
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    name = "sentence-transformers"
+
+    def __init__(self, model_name=DEFAULT_MODEL):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.max_seq_length = getattr(self.model, "max_seq_length", None) or 512
+
+    def encode(self, texts, batch_size=32):
+        return np.asarray(self.model.encode(list(texts), batch_size=batch_size), dtype="float32")
+
+    def count_tokens(self, texts):
+        if getattr(self.model, "tokenizer", None) is None:
+            # Pas de tokenizer: estimation (~4 caractères par token)
+            return [len(text) // 4 + 2 for text in texts]
+        encoded = self.model.tokenizer(list(texts), add_special_tokens=True, truncation=True,
+                                       max_length=self.max_seq_length)
+        return [len(ids) for ids in encoded["input_ids"]]
+
+
+class OnnxBackend(EmbeddingBackend):
+    """Modèle ONNX (sortie last_hidden_state) suivi d'un pooling moyen et d'une normalisation L2.
+
+    - session: onnxruntime.InferenceSession (ou objet exposant get_inputs() et run())
+    - tokenizer: tokenizers.Tokenizer, troncature déjà configurée
+    """
+
+    name = "onnx"
+
+    def __init__(self, session, tokenizer, normalize=True):
+        self.session = session
+        self.tokenizer = tokenizer
+        self.normalize = normalize
+        self.input_names = {node.name for node in session.get_inputs()}
+
+    @classmethod
+    def from_directory(cls, path=ONNX_DIR, quantized=False, threads=None):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(path, ONNX_CONFIG_FILE), "r", encoding="utf-8") as f:
+            config = json.load(f)
+        tokenizer = Tokenizer.from_file(os.path.join(path, ONNX_TOKENIZER_FILE))
+        tokenizer.no_padding()
+        tokenizer.enable_truncation(max_length=config["max_seq_length"])
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        model_file = os.path.join(path, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        session = onnxruntime.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        backend = cls(session, tokenizer, config.get("normalize", True))
+        backend.name = "onnx-int8" if quantized else "onnx"
+        return backend
+
+    def _feeds(self, encodings):
+        length = max(len(encoding.ids) for encoding in encodings)
+        feeds = {
+            "input_ids": np.zeros((len(encodings), length), dtype="int64"),
+            "attention_mask": np.zeros((len(encodings), length), dtype="int64"),
+            "token_type_ids": np.zeros((len(encodings), length), dtype="int64"),
+        }
+        for row, encoding in enumerate(encodings):
+            size = len(encoding.ids)
+            feeds["input_ids"][row, :size] = encoding.ids
+            feeds["attention_mask"][row, :size] = encoding.attention_mask
+            feeds["token_type_ids"][row, :size] = encoding.type_ids
+        return {name: value for name, value in feeds.items() if name in self.input_names}
+
+    def encode(self, texts, batch_size=32):
+        texts = list(texts)
+        results = []
+        for start in range(0, len(texts), batch_size):
+            feeds = self._feeds(self.tokenizer.encode_batch(texts[start:start + batch_size]))
+            hidden = self.session.run(None, feeds)[0]
+            # Pooling moyen sur les seuls tokens réels (le padding est masqué)
+            mask = feeds["attention_mask"][:, :, None].astype("float32")
+            vectors = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            if self.normalize:
+                vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+            results.append(vectors.astype("float32"))
+        return np.concatenate(results) if results else np.zeros((0, 0), dtype="float32")
+
+    def count_tokens(self, texts):
+        return [len(encoding.ids) for encoding in self.tokenizer.encode_batch(list(texts))]
+
+
+def load_embedding_backend(backend=None, model_name=DEFAULT_MODEL, onnx_dir=None):
+    """Charge le backend configuré (argument, sinon EMBEDDING_BACKEND, sinon sentence-transformers)."""
+    backend = backend or os.environ.get("EMBEDDING_BACKEND", "sentence-transformers")
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend d'embeddings inconnu: {backend} (attendu: {', '.join(BACKENDS)})")
+    logger.info("Chargement du modèle d'embeddings %s (backend %s)...", model_name, backend)
+    if backend == "sentence-transformers":
+        return SentenceTransformerBackend(model_name)
+    threads = int(os.environ.get("EMBEDDING_ONNX_THREADS", "0")) or None
+    return OnnxBackend.from_directory(onnx_dir or os.environ.get("EMBEDDING_ONNX_DIR", ONNX_DIR),
+                                      quantized=backend == "onnx-int8", threads=threads)
+
+
+def export_onnx(output_dir=ONNX_DIR, model_name=DEFAULT_MODEL):
+    """Exporte un SentenceTransformer en ONNX (fp32 et int8) avec son tokenizer."""
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = SentenceTransformer(model_name, device="cpu")
+    transformer = model[0].auto_model.eval()
+    model.tokenizer.save_pretrained(output_dir)
+
+    sample = model.tokenizer(["exemple"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            transformer, tuple(sample[name] for name in input_names), model_path,
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=14
+        )
+    quantize_dynamic(model_path, os.path.join(output_dir, ONNX_INT8_MODEL_FILE), weight_type=QuantType.QInt8)
+
+    config = {
+        "model_name": model_name,
+        "max_seq_length": model.max_seq_length,
+        "normalize": any(type(module).__name__ == "Normalize" for module in model),
+    }
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    return config
+
+
+if __name__ == "__main__":
+    output = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ONNX_DIR)
+    name = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_MODEL
+    exported = export_onnx(output, name)
+    print(f"Modèle {name} exporté en ONNX (fp32 et int8) dans {output} "
+          f"(longueur max {exported['max_seq_length']} tokens)")
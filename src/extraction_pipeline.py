@@ -0,0 +1,279 @@
+"""Pipeline borné téléchargement -> extraction pour la construction de la base vectorielle.
+
+- Étape 1: téléchargements concurrents dans un pool de threads (latence réseau)
+- Étape 2: extraction du texte (PDF, PPTX, TXT) et découpage dans un pool de processus (CPU)
+- Étape 3: un seul consommateur (embeddings, index) lit les résultats dans l'ordre des entrées
+
+Au plus max_pending documents sont en vol (téléchargés ou en cours d'extraction et non
+encore consommés): un consommateur lent freine les téléchargements et la mémoire reste
+bornée, quelle que soit la taille du conteneur.
+
+fetch(entry) est injectable: un client Azure Blob (ou Azurite) en production, une lecture
+de fichiers locale dans les tests. Les documents sont lus page par page (générateurs) et
+découpés au fil de l'eau, si bien qu'un manuel de 500 pages n'est jamais chargé en entier.
+"""
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import tempfile
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".pptx", ".txt")
+
+# Taille des blocs lus dans les fichiers texte et des blocs de téléchargement
+READ_BLOCK_SIZE = 1 << 16
+
+# Fichier (éventuellement temporaire) contenant un document téléchargé
+DownloadedFile = namedtuple("DownloadedFile", "path temporary")
+
+# Document extrait et découpé: chunks, numéro de page de chaque chunk (None si inconnu), SHA-256 du texte
+ParsedDocument = namedtuple("ParsedDocument", "chunks pages sha256")
+
+
+def iter_pdf_pages(source):
+    """Produit (numéro de page, texte) page par page; source = chemin ou contenu brut."""
+    import fitz  # PyMuPDF pour PDF
+    doc = fitz.open(source) if isinstance(source, str) else fitz.open(stream=source, filetype="pdf")
+    with doc:
+        for number, page in enumerate(doc, start=1):
+            yield number, page.get_text()
+
+
+def iter_pptx_slides(source):
+    """Produit (numéro de diapositive, texte) diapositive par diapositive."""
+    from pptx import Presentation  # Pour PPTX
+    prs = Presentation(source if isinstance(source, str) else io.BytesIO(source))
+    for number, slide in enumerate(prs.slides, start=1):
+        yield number, "\n".join(shape.text for shape in slide.shapes if hasattr(shape, "text") and shape.text)
+
+
+def iter_txt_blocks(source):
+    """Produit (None, bloc de texte) par blocs de READ_BLOCK_SIZE caractères."""
+    if not isinstance(source, str):
+        yield None, source.decode("utf-8")
+        return
+    with open(source, "r", encoding="utf-8") as f:
+        while True:
+            block = f.read(READ_BLOCK_SIZE)
+            if not block:
+                return
+            yield None, block
+
+
+def iter_document_segments(name, source):
+    """Segments (page, texte) d'un document selon son extension; rien si le type n'est pas supporté."""
+    ext = os.path.splitext(name)[1].lower()
+    if ext == ".pdf":
+        return iter_pdf_pages(source)
+    if ext == ".pptx":
+        return iter_pptx_slides(source)
+    if ext == ".txt":
+        return iter_txt_blocks(source)
+    logger.warning("Type de document non supporté pour extraction directe: %s", name)
+    return iter(())
+
+
+def segment_separator(name):
+    """Séparateur entre deux segments: saut de ligne entre pages ou diapositives, rien entre
+    deux blocs d'un fichier texte (un bloc peut couper un mot)."""
+    return "" if name.lower().endswith(".txt") else "\n"
+
+
+def parse_document(name, source):
+    """Extrait tout le texte d'un document (chemin ou contenu brut). None si non supporté."""
+    if os.path.splitext(name)[1].lower() not in SUPPORTED_EXTENSIONS:
+        logger.warning("Type de document non supporté pour extraction directe: %s", name)
+        return None
+    return segment_separator(name).join(text for _, text in iter_document_segments(name, source)).strip()
+
+
+def chunk_segments(segments, chunk_size, chunk_overlap, flush_size=None, separator="\n"):
+    """Découpe des segments (page, texte) au fil de l'eau. Produit (chunk, page).
+
+    Le texte n'est jamais concaténé en entier: dès que le tampon dépasse flush_size
+    caractères, ses chunks complets sont produits et seul le dernier (incomplet) est
+    conservé. La page d'un chunk est celle où il commence. separator est inséré entre
+    deux segments (cf. segment_separator).
+    """
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        length_function=len,
+        separators=["\n\n", "\n", " ", ""],
+        add_start_index=True
+    )
+    flush_size = flush_size or 4 * chunk_size
+    buffer = ""
+    page_starts = []  # [(offset dans le tampon, page)]
+
+    def page_at(offset):
+        page = None
+        for start, number in page_starts:
+            if start > offset:
+                break
+            page = number
+        return page
+
+    for page, text in segments:
+        if buffer:
+            buffer += separator
+        page_starts.append((len(buffer), page))
+        buffer += text
+        if len(buffer) < flush_size:
+            continue
+        docs = splitter.create_documents([buffer])
+        if len(docs) < 2:
+            continue
+        for doc in docs[:-1]:
+            yield doc.page_content, page_at(doc.metadata["start_index"])
+        cut = docs[-1].metadata["start_index"]
+        first_page = page_at(cut)
+        buffer = buffer[cut:]
+        page_starts = [(0, first_page)] + [(start - cut, number) for start, number in page_starts if start > cut]
+
+    if buffer.strip():
+        for doc in splitter.create_documents([buffer]):
+            yield doc.page_content, page_at(doc.metadata["start_index"])
+
+
+def extract_document_chunks(name, source, chunk_size, chunk_overlap):
+    """Extrait et découpe un document page par page (étape exécutée dans les processus d'extraction).
+
+    source: DownloadedFile (un fichier temporaire est supprimé après lecture), chemin ou contenu brut.
+    """
+    temporary = isinstance(source, DownloadedFile) and source.temporary
+    path = source.path if isinstance(source, DownloadedFile) else source
+    try:
+        digest = hashlib.sha256()
+
+        def hashed(segments):
+            # Empreinte du texte calculée au fil de l'eau (même valeur d'une exécution à l'autre)
+            for page, text in segments:
+                digest.update(text.encode("utf-8"))
+                yield page, text
+
+        chunks, pages = [], []
+        for chunk, page in chunk_segments(hashed(iter_document_segments(name, path)), chunk_size, chunk_overlap,
+                                          separator=segment_separator(name)):
+            if chunk.strip():
+                chunks.append(chunk)
+                pages.append(page)
+        return ParsedDocument(chunks, pages, digest.hexdigest())
+    finally:
+        if temporary:
+            os.remove(path)
+
+
+def download_to_tempfile(stream, suffix=""):
+    """Écrit un flux de téléchargement (itérable de blocs d'octets) dans un fichier temporaire."""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        for block in stream:
+            f.write(block)
+    return DownloadedFile(f.name, True)
+
+
+def remove_temporary(data):
+    """Supprime le fichier temporaire d'un DownloadedFile (extraction annulée ou échouée)."""
+    if isinstance(data, DownloadedFile) and data.temporary:
+        try:
+            os.remove(data.path)
+        except FileNotFoundError:
+            pass
+
+
+def read_local_file(entry):
+    """fetch() pour les fichiers locaux (et substitut du stockage Azure dans les tests)."""
+    with open(entry["path"], "rb") as f:
+        return f.read()
+
+
+class ExtractionPipeline:
+    """Téléchargement concurrent et extraction parallèle, résultats produits dans l'ordre.
+
+    - fetch(entry) -> données (octets, chemin, DownloadedFile), appelé dans download_workers threads
+    - parse(name, données) -> résultat, appelé dans parse_workers processus (0: dans le thread de téléchargement)
+    - max_pending: nombre maximal de documents en vol
+
+    Un fichier temporaire (DownloadedFile) est supprimé par l'extraction, ou par le pipeline si
+    l'extraction échoue, est annulée ou si le consommateur ferme le générateur avant la fin.
+    """
+
+    def __init__(self, fetch, parse=parse_document, download_workers=8, parse_workers=None, max_pending=None):
+        self.fetch = fetch
+        self.parse = parse
+        self.download_workers = max(1, download_workers)
+        self.parse_workers = (os.cpu_count() or 1) if parse_workers is None else parse_workers
+        self.max_pending = max(1, max_pending or 2 * self.download_workers)
+
+    def run(self, entries):
+        """Produit (entry, texte, erreur) pour chaque entrée, dans l'ordre d'origine."""
+        downloads = ThreadPoolExecutor(max_workers=self.download_workers, thread_name_prefix="download")
+        # Contexte "spawn": les processus d'extraction sont créés à la demande, alors que les threads
+        # de téléchargement tournent déjà (un fork pendant qu'un thread tient un verrou peut bloquer)
+        parsers = (ProcessPoolExecutor(max_workers=self.parse_workers, mp_context=multiprocessing.get_context("spawn"))
+                   if self.parse_workers > 0 else None)
+        pending = deque()
+        # Fichiers temporaires téléchargés dont l'extraction n'est pas terminée
+        downloaded = set()
+        entries = iter(entries)
+        try:
+            for entry in entries:
+                pending.append((entry, self._submit(entry, downloads, parsers, downloaded)))
+                if len(pending) >= self.max_pending:
+                    break
+            while pending:
+                entry, future = pending.popleft()
+                try:
+                    text, error = future.result(), None
+                except Exception as e:
+                    text, error = None, e
+                yield entry, text, error
+                # Document consommé: une place se libère pour le téléchargement suivant
+                next_entry = next(entries, None)
+                if next_entry is not None:
+                    pending.append((next_entry, self._submit(next_entry, downloads, parsers, downloaded)))
+        finally:
+            downloads.shutdown(wait=True, cancel_futures=True)
+            if parsers is not None:
+                parsers.shutdown(wait=True, cancel_futures=True)
+            # Générateur fermé avant la fin: rien ne doit rester dans le dossier temporaire
+            for data in list(downloaded):
+                remove_temporary(data)
+
+    def _submit(self, entry, downloads, parsers, downloaded):
+        """Chaîne téléchargement puis extraction; retourne un Future du texte."""
+        result = Future()
+        data = None
+
+        def on_parsed(parse):
+            downloaded.discard(data)
+            try:
+                result.set_result(parse.result())
+            except BaseException as e:
+                # Extraction annulée (shutdown) ou processus perdu: le fichier n'a pas été supprimé
+                remove_temporary(data)
+                result.set_exception(e)
+
+        def on_downloaded(download):
+            nonlocal data
+            try:
+                data = download.result()
+                if parsers is None:
+                    result.set_result(self.parse(entry["name"], data))
+                else:
+                    if isinstance(data, DownloadedFile) and data.temporary:
+                        downloaded.add(data)
+                    parsers.submit(self.parse, entry["name"], data).add_done_callback(on_parsed)
+            except BaseException as e:
+                downloaded.discard(data)
+                remove_temporary(data)
+                result.set_exception(e)
+
+        downloads.submit(self.fetch, entry).add_done_callback(on_downloaded)
+        return result
@@ -0,0 +1,164 @@
+"""Manifeste des sources indexées, pour des mises à jour incrémentales de la base vectorielle.
+
+Pour chaque source (fichier local ou blob Azure), le manifeste retient sa version
+(etag du blob, ou date de modification et taille du fichier), l'empreinte SHA-256 de son
+texte extrait et la plage [start, end[ de ses chunks dans les artefacts. Lors d'une
+reconstruction, une source de même version est reprise telle quelle (ni téléchargement,
+ni extraction, ni embedding); une source modifiée mais de même texte reprend ses chunks
+et vecteurs; seules les sources nouvelles ou réellement modifiées sont réencodées, et
+les sources disparues sont retirées.
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+
+# Incrémenter si le format du manifeste change
+MANIFEST_VERSION = 1
+
+
+def content_hash(text):
+    """Empreinte SHA-256 du texte extrait d'une source."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def file_version(path):
+    """Version d'un fichier local: date de modification (ns) et taille."""
+    stat = os.stat(path)
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+
+class IndexManifest:
+    """Sources indexées: {clé: {"version", "sha256", "start", "end"}}.
+
+    settings décrit ce qui, s'il change, invalide tous les vecteurs (modèle d'embedding,
+    paramètres de découpage): un manifeste aux settings différents est ignoré.
+    derived décrit ce qui ne change que les artefacts construits à partir des vecteurs
+    (configuration de l'index FAISS, URLs associées): s'il diffère, l'index et les
+    métadonnées sont reconstruits sans réencoder.
+    """
+
+    def __init__(self, settings, sources=None, derived=None):
+        self.settings = dict(settings)
+        self.sources = dict(sources or {})
+        self.derived = dict(derived or {})
+
+    @classmethod
+    def load(cls, path, settings):
+        """Charge le manifeste; retourne un manifeste vide s'il est absent ou incompatible."""
+        if not os.path.exists(path):
+            return cls(settings)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(settings)
+        if data.get("version") != MANIFEST_VERSION or data.get("settings") != dict(settings):
+            return cls(settings)
+        return cls(settings, data.get("sources"), data.get("derived"))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "settings": self.settings, "sources": self.sources,
+                       "derived": self.derived}, f, ensure_ascii=False, indent=2)
+
+    def get(self, key):
+        return self.sources.get(key)
+
+    def __len__(self):
+        return len(self.sources)
+
+
+class IncrementalCorpus:
+    """Assemble le nouveau corpus à partir des artefacts précédents et des sources réencodées.
+
+    Les chunks, métadonnées et vecteurs sont ajoutés source par source; le manifeste
+    produit par result() décrit exactement les plages du nouveau corpus.
+    """
+
+    def __init__(self, manifest, previous_chunks=(), previous_metadata=(), previous_embeddings=None):
+        self.manifest = manifest
+        self._previous = (previous_chunks, previous_metadata, previous_embeddings)
+        self.chunks = []
+        self.metadata = []
+        self._embeddings = []
+        self._sources = {}
+        self.stats = {"unchanged": 0, "added": 0, "changed": 0, "removed": 0}
+        self._versions_changed = False
+
+    @classmethod
+    def from_artifacts(cls, manifest, chunks, metadata, embeddings):
+        """Reprend les artefacts précédents si leurs tailles concordent avec le manifeste."""
+        n_chunks = max((entry["end"] for entry in manifest.sources.values()), default=0)
+        if embeddings is None or not (len(chunks) == len(metadata) == len(embeddings) == n_chunks):
+            return cls(IndexManifest(manifest.settings))
+        return cls(manifest, chunks, metadata, embeddings)
+
+    def unchanged(self, key, version):
+        """Reprend la source si sa version n'a pas changé. Retourne True si elle a été reprise."""
+        entry = self.manifest.get(key)
+        if entry is None or version is None or entry.get("version") != version:
+            return False
+        self._reuse(key, entry, version)
+        self.stats["unchanged"] += 1
+        return True
+
+    def keep(self, key):
+        """Conserve la source telle qu'indexée précédemment (ex: échec de téléchargement).
+
+        Sa version n'est pas mise à jour: elle sera retentée à la prochaine exécution.
+        """
+        entry = self.manifest.get(key)
+        if entry is None:
+            return False
+        self._reuse(key, entry, entry.get("version"))
+        self.stats["unchanged"] += 1
+        return True
+
+    def add(self, key, version, sha256, chunks, metadata, embed):
+        """Ajoute une source nouvelle ou modifiée (sha256: empreinte de son texte, cf. content_hash).
+
+        Si le texte est identique à celui du manifeste, les chunks et vecteurs précédents
+        sont repris; sinon embed(chunks) est appelé pour encoder les nouveaux chunks. embed peut
+        renvoyer les vecteurs ou un résultat différé (méthode result(), cf. EmbeddingBatcher).
+        """
+        entry = self.manifest.get(key)
+        if entry is not None and entry.get("sha256") == sha256:
+            self._reuse(key, entry, version)
+            self.stats["unchanged"] += 1
+            return False
+        start = len(self.chunks)
+        self.chunks.extend(chunks)
+        self.metadata.extend(metadata)
+        self._embeddings.append(embed(chunks))
+        self._sources[key] = {"version": version, "sha256": sha256, "start": start, "end": len(self.chunks)}
+        self.stats["changed" if entry is not None else "added"] += 1
+        return True
+
+    def _reuse(self, key, entry, version):
+        chunks, metadata, embeddings = self._previous
+        start, end = entry["start"], entry["end"]
+        new_start = len(self.chunks)
+        self._versions_changed |= version != entry.get("version")
+        self.chunks.extend(chunks[i] for i in range(start, end))
+        self.metadata.extend(dict(metadata[i]) for i in range(start, end))
+        self._embeddings.append(np.asarray(embeddings[start:end], dtype="float32"))
+        self._sources[key] = {"version": version, "sha256": entry["sha256"],
+                              "start": new_start, "end": len(self.chunks)}
+
+    @property
+    def modified(self):
+        """Vrai si les artefacts doivent être réécrits (ajouts, modifications, suppressions ou versions)."""
+        self.stats["removed"] = len(set(self.manifest.sources) - set(self._sources))
+        return bool(self.stats["added"] or self.stats["changed"] or self.stats["removed"]
+                    or self._versions_changed)
+
+    def result(self):
+        """Retourne (chunks, metadata, embeddings, manifest) du nouveau corpus."""
+        self.stats["removed"] = len(set(self.manifest.sources) - set(self._sources))
+        embeddings = [np.asarray(e.result() if hasattr(e, "result") else e, dtype="float32")
+                      for e in self._embeddings if len(e)]
+        dimension = embeddings[0].shape[1] if embeddings else 0
+        matrix = np.vstack(embeddings) if embeddings else np.zeros((0, dimension), dtype="float32")
+        return self.chunks, self.metadata, matrix, IndexManifest(self.manifest.settings, self._sources)
@@ -6,6 +6,12 @@ import pandas as pd  # Lecture d'Excel et CSV
 import cv2  # Manipulation d'images pour OCR
 from pptx import Presentation  # Lecture de PPTX
 import re  # Pour le nettoyage de texte
+import signal  # Délai maximal d'extraction par fichier
+import time
+import multiprocessing
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 
 # 📂 Chemins des dossiers
@@ -14,6 +20,10 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 DOC_DIR = os.path.join(DATA_DIR, "documents")
 PROCESSED_DIR = os.path.join(DATA_DIR, "processed")
 
+# Extraction parallèle: nombre de processus (1 = séquentiel) et délai maximal par fichier (0 = illimité)
+INGESTION_WORKERS = int(os.environ.get("INGESTION_WORKERS", "1"))
+INGESTION_FILE_TIMEOUT = float(os.environ.get("INGESTION_FILE_TIMEOUT", "0"))
+
 # Création des dossiers nécessaires
 for directory in [DATA_DIR, DOC_DIR, PROCESSED_DIR]:
     if not os.path.exists(directory):
@@ -27,15 +37,16 @@ print(f"📂 Dossier documents traités : {PROCESSED_DIR}")
 print("🚀 Script ingestion.py (TEST) bien exécuté !")
 
 # 📄 **Extraction texte PDF**
+def iter_pdf_pages(file_path):
+    """Produit (numéro de page, texte) page par page, sans charger tout le document"""
+    with fitz.open(file_path) as doc:
+        for number, page in enumerate(doc, start=1):
+            yield number, page.get_text()
+
 def extract_text_from_pdf(file_path):
     """Extrait le texte d'un fichier PDF"""
     try:
-        doc = fitz.open(file_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
-        return text.strip()
+        return "".join(text for _, text in iter_pdf_pages(file_path)).strip()
     except Exception as e:
         print(f"❌ Erreur lors de l'extraction du PDF {file_path}: {str(e)}")
         return None
@@ -194,6 +205,114 @@ def extract_text(file_path):
     else:
         return f"[ERREUR] Format non supporté : {ext}"
 
+class ExtractionTimeout(BaseException):
+    """Délai d'extraction dépassé (BaseException: les extracteurs interceptent Exception)."""
+
+def _raise_extraction_timeout(signum, frame):
+    raise ExtractionTimeout()
+
+def extract_text_with_timeout(file_path, timeout=None):
+    """Extrait le texte d'un fichier en au plus timeout secondes.
+
+    Retourne (texte, durée, délai_dépassé). Le délai repose sur SIGALRM (Linux/macOS, et donc
+    Docker); sous Windows il n'est contrôlé que par le processus principal.
+    """
+    start = time.perf_counter()
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_extraction_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return extract_text(file_path), time.perf_counter() - start, False
+    except ExtractionTimeout:
+        return f"[ERREUR] Délai d'extraction dépassé ({timeout:g} s)", time.perf_counter() - start, True
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+def _new_extraction_pool(workers):
+    # Contexte "spawn": un fork hériterait des verrous et de l'état des bibliothèques d'OCR
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def _terminate_pool(executor):
+    """Abandonne un pool dont un worker est bloqué: ses processus sont tués sans attendre."""
+    processes = list((executor._processes or {}).values())
+    executor.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        process.join()
+
+def extract_texts(file_paths, workers=1, timeout=None):
+    """Extrait le texte des fichiers, dans l'ordre de file_paths quel que soit le parallélisme.
+
+    Avec workers > 1, les extractions (OCR, PDF: limitées par le CPU) s'exécutent dans un pool
+    de processus. Produit (file_path, texte, durée, délai_dépassé) au fil de l'eau.
+
+    Au plus workers extractions sont soumises à la fois: chacune démarre dès sa soumission, d'où
+    part son échéance. Une extraction qui la dépasse (SIGALRM indisponible ou ignoré) bloque son
+    worker: les processus du pool sont tués, le pool recréé et les autres extractions relancées.
+    """
+    if workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield (file_path,) + extract_text_with_timeout(file_path, timeout)
+        return
+
+    # Marge au-delà du délai du worker: filet de sécurité si SIGALRM est indisponible
+    margin = timeout * 2 + 5 if timeout else None
+    waiting = deque(enumerate(file_paths))
+    running = {}  # future -> (indice, fichier, échéance)
+    results = {}
+    next_index = 0
+    executor = _new_extraction_pool(workers)
+    try:
+        while next_index < len(file_paths):
+            while waiting and len(running) < workers:
+                index, file_path = waiting.popleft()
+                try:
+                    future = executor.submit(extract_text_with_timeout, file_path, timeout)
+                except BrokenProcessPool:
+                    # Worker mort (crash natif d'un extracteur): nouveau pool
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = _new_extraction_pool(workers)
+                    future = executor.submit(extract_text_with_timeout, file_path, timeout)
+                running[future] = (index, file_path, time.monotonic() + margin if margin else None)
+
+            deadline = min((d for _, _, d in running.values() if d is not None), default=None)
+            done, _ = wait(running, timeout=None if deadline is None else max(0.0, deadline - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            for future in done:
+                index, file_path, _ = running.pop(future)
+                try:
+                    results[index] = (file_path,) + future.result()
+                except Exception as e:
+                    results[index] = (file_path, f"[ERREUR] Extraction interrompue : {e}", 0.0, False)
+
+            now = time.monotonic()
+            expired = [future for future, (_, _, d) in running.items() if d is not None and d <= now]
+            if expired:
+                for future in expired:
+                    index, file_path, _ = running.pop(future)
+                    results[index] = (file_path, f"[ERREUR] Délai d'extraction dépassé ({timeout:g} s)",
+                                      timeout, True)
+                # Les extractions saines du pool abandonné sont relancées en tête de file
+                waiting.extendleft(sorted(((index, file_path) for index, file_path, _ in running.values()),
+                                          reverse=True))
+                running.clear()
+                _terminate_pool(executor)
+                executor = _new_extraction_pool(workers)
+
+            while next_index in results:
+                yield results.pop(next_index)
+                next_index += 1
+    finally:
+        if running:
+            # Consommateur arrêté avant la fin: inutile d'attendre les extractions en cours
+            _terminate_pool(executor)
+        else:
+            executor.shutdown(wait=True, cancel_futures=True)
+
 # Fonction pour sauvegarder le texte extrait
 def save_extracted_text(text, source_path, url_mappings=None):
     """Sauvegarde le texte extrait dans un fichier .txt avec les URLs correspondantes"""
@@ -258,9 +377,19 @@ def save_extracted_text(text, source_path, url_mappings=None):
         return False
 
 # **📂 Parcours tous les fichiers du dossier data/doc/** et sous-dossiers
-def process_documents(url_mappings=None):
-    """Traite tous les documents dans le dossier doc de manière récursive"""
+def process_documents(url_mappings=None, workers=None, timeout=None):
+    """Traite tous les documents dans le dossier doc de manière récursive
+
+    - workers: nombre de processus d'extraction (défaut: INGESTION_WORKERS, 1 = séquentiel)
+    - timeout: délai maximal d'extraction par fichier en secondes (défaut: INGESTION_FILE_TIMEOUT)
+    Les fichiers sont sauvegardés dans l'ordre du parcours: le dossier processed/ est identique
+    quel que soit le nombre de processus.
+    """
+    workers = INGESTION_WORKERS if workers is None else workers
+    timeout = (INGESTION_FILE_TIMEOUT if timeout is None else timeout) or None
     print("\n🚀 Démarrage du traitement des documents...")
+    if workers > 1:
+        print(f"⚙️ Extraction parallèle : {workers} processus")
     
     # Si aucun mapping d'URL n'est fourni, essayer de les charger
     if url_mappings is None:
@@ -277,44 +406,55 @@ def process_documents(url_mappings=None):
         'total': 0,
         'processed': 0,
         'success': 0,
+        'timeouts': 0,
+        'workers': workers,
+        'extraction_time': 0.0,
         'formats': {}
     }
+    start = time.perf_counter()
     
     # Parcourir récursivement tous les fichiers
+    file_paths = []
     for root, dirs, files in os.walk(DOC_DIR):
         # Créer la structure de dossiers dans processed
         rel_path = os.path.relpath(root, DOC_DIR)
         if rel_path != '.':
             os.makedirs(os.path.join(PROCESSED_DIR, rel_path), exist_ok=True)
+        file_paths.extend(os.path.join(root, file_name) for file_name in files)
+
+    for file_path, text, elapsed, timed_out in extract_texts(file_paths, workers, timeout):
+        file_name = os.path.basename(file_path)
+        rel_path = os.path.relpath(os.path.dirname(file_path), DOC_DIR)
+        print(f"\n📄 Traitement de : {os.path.relpath(file_path, DOC_DIR)} "
+              f"[{stats['total'] + 1}/{len(file_paths)}]")
+        stats['total'] += 1
+        stats['extraction_time'] += elapsed
+        stats['timeouts'] += int(timed_out)
         
-        for file_name in files:
-            file_path = os.path.join(root, file_name)
-            print(f"\n📄 Traitement de : {os.path.relpath(file_path, DOC_DIR)}")
-            stats['total'] += 1
-            
-            # Obtenir l'extension
-            ext = os.path.splitext(file_name)[1].lower()
-            stats['formats'][ext] = stats['formats'].get(ext, 0) + 1
+        # Obtenir l'extension
+        ext = os.path.splitext(file_name)[1].lower()
+        stats['formats'][ext] = stats['formats'].get(ext, 0) + 1
+        
+        # Texte extrait (séquentiellement ou par le pool de processus)
+        if text and not text.startswith('[ERREUR]'):
+            stats['processed'] += 1
+            # Créer le même chemin relatif dans processed
+            processed_dir = os.path.join(PROCESSED_DIR, rel_path)
+            os.makedirs(processed_dir, exist_ok=True)
+            processed_path = os.path.join(processed_dir, os.path.splitext(file_name)[0] + '.txt')
             
-            # Extraire le texte
-            text = extract_text(file_path)
-            if text and not text.startswith('[ERREUR]'):
-                stats['processed'] += 1
-                # Créer le même chemin relatif dans processed
-                processed_dir = os.path.join(PROCESSED_DIR, rel_path)
-                os.makedirs(processed_dir, exist_ok=True)
-                processed_path = os.path.join(processed_dir, os.path.splitext(file_name)[0] + '.txt')
-                
-                try:
-                    # Sauvegarder avec les URLs
-                    if save_extracted_text(text, os.path.relpath(file_path, DOC_DIR), url_mappings):
-                        stats['success'] += 1
-                        print(f"✅ Texte extrait et sauvegardé dans : {os.path.relpath(processed_path, PROCESSED_DIR)}")
-                except Exception as e:
-                    print(f"❌ Échec de la sauvegarde : {str(e)}")
-            else:
-                print(f"❌ Échec de l'extraction : {text}")
-    
+            try:
+                # Sauvegarder avec les URLs
+                if save_extracted_text(text, os.path.relpath(file_path, DOC_DIR), url_mappings):
+                    stats['success'] += 1
+                    print(f"✅ Texte extrait et sauvegardé dans : {os.path.relpath(processed_path, PROCESSED_DIR)}")
+            except Exception as e:
+                print(f"❌ Échec de la sauvegarde : {str(e)}")
+        else:
+            print(f"❌ Échec de l'extraction : {text}")
+
+    stats['duration'] = time.perf_counter() - start
+
     # Calculer le taux de succès
     success_rate = (stats['success'] / stats['total'] * 100) if stats['total'] > 0 else 0
     
@@ -324,6 +464,9 @@ def process_documents(url_mappings=None):
     print(f"  - Documents traités: {stats['processed']}")
     print(f"  - Documents extraits avec succès: {stats['success']}")
     print(f"  - Taux de succès: {success_rate:.1f}%")
+    print(f"  - Délais dépassés: {stats['timeouts']}")
+    print(f"  - Durée totale: {stats['duration']:.1f} s (extraction cumulée: {stats['extraction_time']:.1f} s, "
+          f"{stats['workers']} processus)")
     print("\n📝 Formats traités:")
     for fmt, count in stats['formats'].items():
         print(f"  - {fmt}: {count} fichiers")
@@ -0,0 +1,225 @@
+import hashlib
+import math
+import pickle
+import re
+import unicodedata
+
+import numpy as np
+
+# Paramètres BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Poids du champ titre par rapport au contenu (BM25F simplifié)
+TITLE_BOOST = 2.0
+# Comme l'ancienne recherche: seuls les mots de plus de 3 caractères comptent
+MIN_TOKEN_LENGTH = 4
+
+# Incrémenter si la normalisation ou le format change (invalide les index persistés)
+KEYWORD_INDEX_VERSION = 3
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# Ligatures fréquentes dans les PDF AFPA (PyMuPDF restitue "ti" sous la forme "Ɵ")
+_LIGATURES = str.maketrans({"œ": "oe", "æ": "ae", "ɵ": "ti"})
+
+
+def normalize_text(text):
+    """Met le texte en minuscules et supprime les accents (é -> e, ç -> c, œ -> oe)."""
+    if not isinstance(text, str):
+        return ""
+    text = text.lower().translate(_LIGATURES)
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def stem(token):
+    """Racinisation légère du français: retire la marque du pluriel."""
+    if len(token) > 4:
+        if token.endswith("s") and not token.endswith("ss"):
+            return token[:-1]
+        if token.endswith(("eaux", "eux")):
+            return token[:-1]
+    return token
+
+
+def tokenize(text):
+    """Découpe un texte normalisé en tokens indexables (> 3 caractères, racinisés)."""
+    return [stem(tok) for tok in _TOKEN_RE.findall(normalize_text(text)) if len(tok) >= MIN_TOKEN_LENGTH]
+
+
+def corpus_fingerprint(chunks, metadata):
+    """Empreinte SHA-256 des textes indexés (contenu et titre de chaque chunk).
+
+    Enregistrée avec l'index persisté: un corpus modifié à nombre de chunks constant
+    est ainsi détecté au chargement.
+    """
+    digest = hashlib.sha256()
+    for idx in range(len(metadata)):
+        for text in (chunks[idx] if idx < len(chunks) else "", metadata[idx].get("title", "")):
+            data = text.encode("utf-8") if isinstance(text, str) else b""
+            digest.update(len(data).to_bytes(8, "little"))
+            digest.update(data)
+    return digest.hexdigest()
+
+
+class NormalizedCorpus:
+    """Représentation normalisée et tokenisée du corpus, calculée une seule fois.
+
+    Chaque champ (contenu, titre) est stocké sous la forme d'un buffer contigu
+    d'identifiants de tokens (int32) et d'un tableau d'offsets: les tokens du
+    chunk i sont buffer[offsets[i]:offsets[i + 1]].
+    """
+
+    def __init__(self, vocab, content_tokens, content_offsets, title_tokens, title_offsets):
+        self.vocab = vocab
+        self.token_ids = {tok: i for i, tok in enumerate(vocab)}
+        self.content_tokens = content_tokens
+        self.content_offsets = content_offsets
+        self.title_tokens = title_tokens
+        self.title_offsets = title_offsets
+
+    def __len__(self):
+        return len(self.content_offsets) - 1
+
+    @classmethod
+    def build(cls, chunks, metadata):
+        """Normalise et tokenise chunks et titres (seul passage sur le texte brut)."""
+        token_ids = {}
+
+        def encode_field(texts):
+            buffer = []
+            offsets = [0]
+            for text in texts:
+                for tok in tokenize(text):
+                    buffer.append(token_ids.setdefault(tok, len(token_ids)))
+                offsets.append(len(buffer))
+            return np.asarray(buffer, dtype=np.int32), np.asarray(offsets, dtype=np.int64)
+
+        content_tokens, content_offsets = encode_field(
+            chunks[idx] if idx < len(chunks) else "" for idx in range(len(metadata)))
+        title_tokens, title_offsets = encode_field(meta.get("title", "") for meta in metadata)
+
+        vocab = [None] * len(token_ids)
+        for tok, i in token_ids.items():
+            vocab[i] = tok
+        return cls(vocab, content_tokens, content_offsets, title_tokens, title_offsets)
+
+    def lookup(self, tokens):
+        """Convertit des tokens en identifiants, en ignorant ceux absents du vocabulaire."""
+        ids = (self.token_ids.get(tok) for tok in tokens)
+        return sorted({i for i in ids if i is not None})
+
+
+class _FieldPostings:
+    """Listes de postings d'un champ au format CSR: token -> (chunks, fréquences)."""
+
+    def __init__(self, tokens, offsets, vocab_size):
+        n_docs = len(offsets) - 1
+        self.lengths = np.diff(offsets).astype(np.float32)
+        self.avg_length = float(self.lengths.mean()) if n_docs else 0.0
+
+        # Couples (token, chunk) dédupliqués avec leur fréquence, triés par token
+        doc_of_token = np.repeat(np.arange(n_docs, dtype=np.int64), np.diff(offsets))
+        keys, tf = np.unique(tokens.astype(np.int64) * max(n_docs, 1) + doc_of_token, return_counts=True)
+        token_of_key = keys // max(n_docs, 1)
+        self.docs = (keys % max(n_docs, 1)).astype(np.int32)
+        self.tf = tf.astype(np.float32)
+        self.offsets = np.searchsorted(token_of_key, np.arange(vocab_size + 1)).astype(np.int64)
+
+    def score(self, token_id, n_docs, weight):
+        """Retourne (chunks, scores BM25) pour un token; vues sur les buffers, sans copie du corpus."""
+        start, end = self.offsets[token_id], self.offsets[token_id + 1]
+        if start == end or not self.avg_length:
+            return None
+        docs = self.docs[start:end]
+        tf = self.tf[start:end]
+        df = end - start
+        idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[docs] / self.avg_length)
+        return docs, weight * idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+
+class KeywordIndex:
+    """Index inversé BM25 sur le contenu et le titre des chunks.
+
+    Construit une seule fois au chargement (ou lors de la création de la base) à partir
+    du NormalizedCorpus: une requête ne touche que les postings de ses propres termes.
+    """
+
+    def __init__(self, corpus, fingerprint=None):
+        self.corpus = corpus
+        self.fingerprint = fingerprint
+        self.n_docs = len(corpus)
+        vocab_size = len(corpus.vocab)
+        self.content = _FieldPostings(corpus.content_tokens, corpus.content_offsets, vocab_size)
+        self.title = _FieldPostings(corpus.title_tokens, corpus.title_offsets, vocab_size)
+
+    @classmethod
+    def build(cls, chunks, metadata):
+        """Construit l'index à partir des chunks et des métadonnées alignés."""
+        return cls(NormalizedCorpus.build(chunks, metadata), corpus_fingerprint(chunks, metadata))
+
+    def search(self, query, top_k=10):
+        """Retourne [(indice, score)] triés, avec un score BM25 ramené dans ]0, 1]."""
+        return self.search_batch([query], top_k)[0]
+
+    def search_batch(self, queries, top_k=10):
+        """Comme search pour chaque requête, en lisant une seule fois les postings de chaque terme.
+
+        Les termes communs à plusieurs requêtes (fréquents dans un lot de questions sur le
+        même domaine) ne sont scorés qu'une fois. Retourne une liste de résultats par requête.
+        """
+        if not self.n_docs:
+            return [[] for _ in queries]
+        query_tokens = [self.corpus.lookup(tokenize(query)) for query in queries]
+
+        # Scores BM25 de chaque terme distinct du lot, sur le contenu et le titre
+        term_parts = {}
+        for token_id in sorted({token_id for token_ids in query_tokens for token_id in token_ids}):
+            parts = []
+            for field, weight in ((self.content, 1.0), (self.title, TITLE_BOOST)):
+                scored = field.score(token_id, self.n_docs, weight)
+                if scored is not None:
+                    parts.append(scored)
+            term_parts[token_id] = parts
+
+        return [self._rank([part for token_id in token_ids for part in term_parts[token_id]], top_k)
+                for token_ids in query_tokens]
+
+    @staticmethod
+    def _rank(parts, top_k):
+        if not parts:
+            return []
+
+        # Agrégation sur les seuls chunks candidats (taille proportionnelle aux postings)
+        docs, inverse = np.unique(np.concatenate([d for d, _ in parts]), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate([s for _, s in parts]))
+
+        # Normalisation par le meilleur score pour rester comparable au score vectoriel
+        # lors de la fusion dans combine_results
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        best = scores[order[0]]
+        return [(int(docs[i]), float(scores[i] / best)) for i in order]
+
+    def save(self, path):
+        corpus = self.corpus
+        with open(path, "wb") as f:
+            pickle.dump({
+                "version": KEYWORD_INDEX_VERSION,
+                "fingerprint": self.fingerprint,
+                "vocab": corpus.vocab,
+                "content_tokens": corpus.content_tokens,
+                "content_offsets": corpus.content_offsets,
+                "title_tokens": corpus.title_tokens,
+                "title_offsets": corpus.title_offsets,
+            }, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @classmethod
+    def load(cls, path):
+        """Charge un index persisté; retourne None s'il est d'une version obsolète."""
+        with open(path, "rb") as f:
+            data = pickle.load(f)
+        if not isinstance(data, dict) or data.get("version") != KEYWORD_INDEX_VERSION:
+            return None
+        return cls(NormalizedCorpus(data["vocab"], data["content_tokens"], data["content_offsets"],
+                                    data["title_tokens"], data["title_offsets"]), data["fingerprint"])
@@ -0,0 +1,405 @@
+import asyncio
+import logging
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from azure.ai.inference import ChatCompletionsClient
+from azure.ai.inference.aio import ChatCompletionsClient as AsyncChatCompletionsClient
+from azure.ai.inference.models import SystemMessage, UserMessage
+from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
+
+logger = logging.getLogger(__name__)
+
+# Incrémenter à chaque modification de SYSTEM_PROMPT (invalide le cache des réponses)
+PROMPT_VERSION = "1"
+
+SYSTEM_PROMPT = (
+    "Tu es un assistant documentaire AFPA. Utilise UNIQUEMENT les informations des documents fournis pour répondre. "
+    "Ta tâche principale est de présenter les documents en relation avec la question de l'utilisateur, pas de répondre directement à la question. "
+    "**Structure IMPÉRATIVEMENT ta réponse en HTML.** "
+    "La réponse doit commencer par une introduction générale, par exemple : '<p>Voici les documents en relation avec votre question :</p>'. "
+    "Ensuite, pour chaque document pertinent trouvé, présente-le comme suit, en utilisant une liste non ordonnée `<ul>` et des éléments de liste `<li>` pour chaque document : "
+    "  '<li>' "
+    "    '<strong>Titre du document</strong><br />' "
+    "    '<em>Description :</em> Description concise et pertinente basée sur l'extrait fourni et la question de l'utilisateur.<br />' "
+    "    '<em>Source :</em> <a href=\"URL_DU_DOCUMENT\" target=\"_blank\">Nom de la source (titre du document)</a>' " # Guillemets échappés ici
+    "  '</li>' "
+    "N'oublie pas de remplacer 'Titre du document', 'Description...', 'URL_DU_DOCUMENT', et 'Nom de la source' par les vraies valeurs. L'URL doit être cliquable et s'ouvrir dans un nouvel onglet. "
+    "Assure-toi que le HTML est bien formé. "
+    "Termine par une brève conclusion si nécessaire, par exemple : "
+    "'<p>Si le document exact que vous cherchez n\\'est pas listé, il est possible qu\\'il ne soit pas disponible dans la base de données ou que votre question nécessite une reformulation.</p>'" # Apostrophes échappées
+)
+
+# Paramètres de génération
+TEMPERATURE = 0.3
+MAX_TOKENS = 1500
+
+
+class LLMBusyError(RuntimeError):
+    """Levée quand la limite d'appels simultanés au LLM est atteinte trop longtemps."""
+
+
+class ChatClientManager:
+    """Fournit un ChatCompletionsClient unique par processus (worker).
+
+    Le client réutilise une session HTTP avec pool de connexions keep-alive (plus de
+    poignée de main TLS à chaque requête); les délais, les tentatives avec backoff
+    exponentiel et le nombre d'appels simultanés sont configurables.
+    """
+
+    def __init__(self, endpoint, api_key, connection_timeout=10, read_timeout=120,
+                 retry_total=3, retry_backoff_factor=0.8, retry_backoff_max=30,
+                 pool_maxsize=16, max_concurrency=16, acquire_timeout=None):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.connection_timeout = connection_timeout
+        self.read_timeout = read_timeout
+        self.retry_total = retry_total
+        self.retry_backoff_factor = retry_backoff_factor
+        self.retry_backoff_max = retry_backoff_max
+        self.pool_maxsize = pool_maxsize
+        self.acquire_timeout = read_timeout if acquire_timeout is None else acquire_timeout
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    @classmethod
+    def from_env(cls):
+        """Construit le gestionnaire à partir des variables d'environnement."""
+        env = os.environ
+        return cls(
+            endpoint=env["AZURE_INFERENCE_SDK_ENDPOINT"],
+            api_key=env["AZURE_OPENAI_API_KEY"],
+            connection_timeout=float(env.get("LLM_CONNECTION_TIMEOUT", "10")),
+            read_timeout=float(env.get("LLM_READ_TIMEOUT", "120")),
+            retry_total=int(env.get("LLM_RETRY_TOTAL", "3")),
+            retry_backoff_factor=float(env.get("LLM_RETRY_BACKOFF_FACTOR", "0.8")),
+            retry_backoff_max=float(env.get("LLM_RETRY_BACKOFF_MAX", "30")),
+            pool_maxsize=int(env.get("LLM_POOL_MAXSIZE", "16")),
+            max_concurrency=int(env.get("LLM_MAX_CONCURRENCY", "16")),
+        )
+
+    def _create_client(self):
+        session = requests.Session()
+        # Les tentatives sont gérées par la RetryPolicy d'azure-core, pas par urllib3
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        transport = RequestsTransport(
+            session=session,
+            session_owner=False,
+            connection_timeout=self.connection_timeout,
+            read_timeout=self.read_timeout
+        )
+        return ChatCompletionsClient(
+            endpoint=self.endpoint,
+            credential=AzureKeyCredential(self.api_key),
+            transport=transport,
+            retry_total=self.retry_total,
+            retry_backoff_factor=self.retry_backoff_factor,
+            retry_backoff_max=self.retry_backoff_max
+        )
+
+    def get_client(self):
+        """Retourne le client du processus courant (recréé après un fork)."""
+        pid = os.getpid()
+        if self._client is None or self._pid != pid:
+            with self._lock:
+                if self._client is None or self._pid != pid:
+                    logger.info("Création du client Azure OpenAI (pid %d)", pid)
+                    self._client = self._create_client()
+                    self._pid = pid
+        return self._client
+
+    def complete(self, **kwargs):
+        """Appelle client.complete en respectant la limite d'appels simultanés."""
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            raise LLMBusyError("Trop d'appels simultanés au LLM")
+        try:
+            return self.get_client().complete(**kwargs)
+        finally:
+            self._semaphore.release()
+
+    def stream(self, **kwargs):
+        """Variante en streaming: l'emplacement de concurrence est tenu jusqu'au dernier token."""
+        if not self._semaphore.acquire(timeout=self.acquire_timeout):
+            raise LLMBusyError("Trop d'appels simultanés au LLM")
+        try:
+            response = self.get_client().complete(stream=True, **kwargs)
+            try:
+                yield from response
+            finally:
+                response.close()
+        finally:
+            self._semaphore.release()
+
+
+class AsyncChatClientManager:
+    """Équivalent asynchrone de ChatClientManager pour le mode de service ASGI.
+
+    Un client azure.ai.inference.aio (transport aiohttp, connexions keep-alive) est créé
+    par boucle d'événements; la limite d'appels simultanés est un asyncio.Semaphore.
+    """
+
+    def __init__(self, endpoint, api_key, connection_timeout=10, read_timeout=120,
+                 retry_total=3, retry_backoff_factor=0.8, retry_backoff_max=30,
+                 max_concurrency=256, acquire_timeout=None):
+        self.endpoint = endpoint
+        self.api_key = api_key
+        self.connection_timeout = connection_timeout
+        self.read_timeout = read_timeout
+        self.retry_total = retry_total
+        self.retry_backoff_factor = retry_backoff_factor
+        self.retry_backoff_max = retry_backoff_max
+        self.max_concurrency = max_concurrency
+        self.acquire_timeout = read_timeout if acquire_timeout is None else acquire_timeout
+        self._loop = None
+        self._client = None
+        self._semaphore = None
+
+    @classmethod
+    def from_env(cls):
+        env = os.environ
+        return cls(
+            endpoint=env["AZURE_INFERENCE_SDK_ENDPOINT"],
+            api_key=env["AZURE_OPENAI_API_KEY"],
+            connection_timeout=float(env.get("LLM_CONNECTION_TIMEOUT", "10")),
+            read_timeout=float(env.get("LLM_READ_TIMEOUT", "120")),
+            retry_total=int(env.get("LLM_RETRY_TOTAL", "3")),
+            retry_backoff_factor=float(env.get("LLM_RETRY_BACKOFF_FACTOR", "0.8")),
+            retry_backoff_max=float(env.get("LLM_RETRY_BACKOFF_MAX", "30")),
+            max_concurrency=int(env.get("LLM_ASYNC_MAX_CONCURRENCY", "256")),
+        )
+
+    async def get_client(self):
+        """Retourne le client associé à la boucle d'événements courante.
+
+        Quand la boucle change, le client de l'ancienne boucle est fermé (sa session HTTP et
+        ses connexions) avant d'en créer un nouveau.
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            stale, self._client = self._client, None
+            try:
+                await stale.close()
+            except Exception:
+                logger.warning("Fermeture impossible du client asynchrone de l'ancienne boucle", exc_info=True)
+        if self._client is None:
+            logger.info("Création du client asynchrone Azure OpenAI (pid %d)", os.getpid())
+            self._client = AsyncChatCompletionsClient(
+                endpoint=self.endpoint,
+                credential=AzureKeyCredential(self.api_key),
+                connection_timeout=self.connection_timeout,
+                read_timeout=self.read_timeout,
+                retry_total=self.retry_total,
+                retry_backoff_factor=self.retry_backoff_factor,
+                retry_backoff_max=self.retry_backoff_max
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._loop = loop
+        return self._client
+
+    async def _acquire(self):
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            raise LLMBusyError("Trop d'appels simultanés au LLM") from None
+
+    async def complete(self, **kwargs):
+        client = await self.get_client()
+        await self._acquire()
+        try:
+            return await client.complete(**kwargs)
+        finally:
+            self._semaphore.release()
+
+    async def stream(self, **kwargs):
+        client = await self.get_client()
+        await self._acquire()
+        try:
+            response = await client.complete(stream=True, **kwargs)
+            try:
+                async for update in response:
+                    yield update
+            finally:
+                await response.aclose()
+        finally:
+            self._semaphore.release()
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+
+def build_context(documents):
+    """Assemble les documents retrouvés en contexte textuel pour le LLM."""
+    return "\n\n".join([
+        f"Document: {doc['title']}\n" +
+        (f"URL: {doc['url']}\n" if 'url' in doc else "") +
+        f"Catégorie: {doc['category']}\n" +
+        f"Extrait: {doc['extract']}"
+        for doc in documents
+    ])
+
+
+def build_messages(query, documents):
+    """Prépare les messages système et utilisateur."""
+    context = build_context(documents)
+    logger.debug("Contexte envoyé à Azure OpenAI:\n%s", context)
+    return [
+        SystemMessage(content=SYSTEM_PROMPT),
+        UserMessage(content=f"Question: {query}\n\nDocuments disponibles:\n{context}")
+    ]
+
+
+def response_context(documents, deployment, artifact_version=None):
+    """Contexte de cache d'une réponse: chunks retrouvés (dans l'ordre), prompt et déploiement."""
+    chunk_ids = [doc.get("chunk_index", -1) for doc in documents]
+    return (tuple(int(i) for i in chunk_ids), PROMPT_VERSION, deployment, artifact_version)
+
+
+def _get_cached(cache, query, context, query_vector):
+    if cache is None:
+        return None
+    cached = cache.get(query, context, query_vector=query_vector)
+    if cached is not None:
+        logger.info("Réponse servie depuis le cache")
+    return cached
+
+
+def _report_usage(on_usage, usage):
+    if on_usage is not None and usage is not None:
+        on_usage(usage)
+
+
+def _store(cache, query, context, content, query_vector):
+    if cache is not None and content:
+        cache.set(query, context, content, query_vector=query_vector)
+
+
+def generate_response(query, documents, client, deployment, cache=None, query_vector=None,
+                      artifact_version=None, on_usage=None):
+    """Génère une réponse structurée en HTML, en passant par le cache des réponses si fourni.
+
+    on_usage(usage) reçoit la consommation de tokens rapportée par le LLM (pas d'appel
+    pour une réponse servie depuis le cache).
+    """
+    context = response_context(documents, deployment, artifact_version)
+    cached = _get_cached(cache, query, context, query_vector)
+    if cached is not None:
+        return cached
+
+    messages = build_messages(query, documents)
+    logger.debug("Message système: %s", messages[0].content)
+    logger.info("Question envoyée: %s", query)
+
+    response = client.complete(
+        messages=messages,
+        model=deployment,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS
+    )
+    content = response.choices[0].message.content
+    logger.debug("Réponse reçue d'Azure OpenAI: %s", content)
+    _report_usage(on_usage, getattr(response, "usage", None))
+
+    _store(cache, query, context, content, query_vector)
+    return content
+
+
+async def agenerate_response(query, documents, client, deployment, cache=None, query_vector=None,
+                             artifact_version=None, on_usage=None):
+    """Variante asynchrone de generate_response (client AsyncChatClientManager)."""
+    context = response_context(documents, deployment, artifact_version)
+    cached = _get_cached(cache, query, context, query_vector)
+    if cached is not None:
+        return cached
+
+    messages = build_messages(query, documents)
+    logger.info("Question envoyée: %s", query)
+
+    response = await client.complete(
+        messages=messages,
+        model=deployment,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS
+    )
+    content = response.choices[0].message.content
+    logger.debug("Réponse reçue d'Azure OpenAI: %s", content)
+    _report_usage(on_usage, getattr(response, "usage", None))
+
+    _store(cache, query, context, content, query_vector)
+    return content
+
+
+def stream_response(query, documents, client, deployment, cache=None, query_vector=None,
+                    artifact_version=None, on_usage=None):
+    """Génère la réponse token par token (mode streaming du SDK d'inférence).
+
+    Une réponse présente dans le cache est renvoyée en un seul fragment; une réponse
+    complète est mise en cache à la fin du flux.
+    """
+    context = response_context(documents, deployment, artifact_version)
+    cached = _get_cached(cache, query, context, query_vector)
+    if cached is not None:
+        yield cached
+        return
+
+    messages = build_messages(query, documents)
+    logger.info("Question envoyée (streaming): %s", query)
+
+    if hasattr(client, "stream"):
+        updates = client.stream(messages=messages, model=deployment,
+                                temperature=TEMPERATURE, max_tokens=MAX_TOKENS)
+    else:
+        updates = client.complete(messages=messages, model=deployment, stream=True,
+                                  temperature=TEMPERATURE, max_tokens=MAX_TOKENS)
+
+    parts = []
+    for update in updates:
+        _report_usage(on_usage, getattr(update, "usage", None))
+        delta = _delta_content(update)
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    content = "".join(parts)
+    logger.debug("Réponse reçue d'Azure OpenAI (streaming): %s", content)
+    _store(cache, query, context, content, query_vector)
+
+
+async def astream_response(query, documents, client, deployment, cache=None, query_vector=None,
+                           artifact_version=None, on_usage=None):
+    """Variante asynchrone de stream_response (client AsyncChatClientManager)."""
+    context = response_context(documents, deployment, artifact_version)
+    cached = _get_cached(cache, query, context, query_vector)
+    if cached is not None:
+        yield cached
+        return
+
+    messages = build_messages(query, documents)
+    logger.info("Question envoyée (streaming): %s", query)
+
+    parts = []
+    async for update in client.stream(messages=messages, model=deployment,
+                                      temperature=TEMPERATURE, max_tokens=MAX_TOKENS):
+        _report_usage(on_usage, getattr(update, "usage", None))
+        delta = _delta_content(update)
+        if delta:
+            parts.append(delta)
+            yield delta
+
+    content = "".join(parts)
+    logger.debug("Réponse reçue d'Azure OpenAI (streaming): %s", content)
+    _store(cache, query, context, content, query_vector)
+
+
+def _delta_content(update):
+    if not update.choices:
+        return None
+    return update.choices[0].delta.content
@@ -0,0 +1,238 @@
+"""Configuration des logs: file d'attente non bloquante, format JSON, niveaux par logger.
+
+Les threads qui traitent les requêtes ne font que déposer les enregistrements dans une
+file bornée (QueueHandler); un thread dédié (QueueListener) les formate et les écrit. Le
+formatage du message (arguments compris) a lieu dans ce thread, jamais dans la requête.
+File pleine: l'enregistrement est abandonné et compté, la requête n'attend jamais.
+
+Variables d'environnement:
+- LOG_LEVEL: niveau racine (INFO par défaut)
+- LOG_LEVELS: niveaux par logger, ex. "llm=DEBUG,azure=WARNING,werkzeug=WARNING"
+- LOG_FORMAT: json (défaut) ou text
+- LOG_MAX_MESSAGE_LENGTH: longueur maximale d'un message ou d'une trace (4000 par défaut)
+- LOG_SAMPLING: proportion conservée par niveau, ex. "DEBUG=0.01,INFO=0.5" (les
+  avertissements et erreurs sont toujours conservés)
+- LOG_QUEUE_SIZE: taille de la file (10000 par défaut)
+"""
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(name)s - %(message)s"
+# Bibliothèques bavardes (une ligne par requête HTTP) ramenées à WARNING sauf mention contraire
+DEFAULT_LOGGER_LEVELS = {"azure": "WARNING", "urllib3": "WARNING"}
+DEFAULT_MAX_MESSAGE_LENGTH = 4000
+DEFAULT_QUEUE_SIZE = 10000
+
+# Attributs standard d'un LogRecord: tout autre attribut (extra=...) est ajouté au JSON
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener = None
+_handler = None
+_lock = threading.Lock()
+
+
+def truncate(text, max_length):
+    """Coupe text à max_length caractères en indiquant la longueur retirée."""
+    if not max_length or len(text) <= max_length:
+        return text
+    return f"{text[:max_length]}... [+{len(text) - max_length} caractères]"
+
+
+def _pairs(spec):
+    """"a=1, b=2" -> [("a", "1"), ("b", "2")] (éléments vides ignorés)."""
+    pairs = []
+    for item in (spec or "").split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip():
+            pairs.append((name.strip(), value.strip()))
+    return pairs
+
+
+def _level_number(level):
+    number = logging.getLevelName(level.upper())
+    if not isinstance(number, int):
+        raise ValueError(f"Niveau de log inconnu: {level}")
+    return number
+
+
+def parse_levels(spec):
+    """"llm=DEBUG, azure=WARNING" -> {"llm": "DEBUG", "azure": "WARNING"}."""
+    levels = {}
+    for name, level in _pairs(spec):
+        _level_number(level)
+        levels[name] = level.upper()
+    return levels
+
+
+def parse_sampling(spec):
+    """"DEBUG=0.01,INFO=0.5" -> {10: 0.01, 20: 0.5}."""
+    return {_level_number(level): float(rate) for level, rate in _pairs(spec)}
+
+
+class SamplingFilter(logging.Filter):
+    """Conserve une proportion des enregistrements de chaque niveau (rates: {niveau: proportion})."""
+
+    def __init__(self, rates, random_fn=random.random):
+        super().__init__()
+        self.rates = {level: rate for level, rate in rates.items() if level < logging.WARNING}
+        self._random = random_fn
+
+    def filter(self, record):
+        rate = self.rates.get(record.levelno)
+        return rate is None or rate >= 1 or self._random() < rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement, message et trace tronqués à max_length caractères."""
+
+    def __init__(self, max_length=DEFAULT_MAX_MESSAGE_LENGTH):
+        super().__init__()
+        self.max_length = max_length
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": truncate(record.getMessage(), self.max_length),
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            entry["exception"] = truncate(self.formatException(record.exc_info), self.max_length)
+        elif record.exc_text:
+            entry["exception"] = truncate(record.exc_text, self.max_length)
+        if record.stack_info:
+            entry["stack"] = truncate(record.stack_info, self.max_length)
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in entry:
+                entry[key] = value
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TruncatingFormatter(logging.Formatter):
+    """Format texte habituel, message tronqué à max_length caractères."""
+
+    def __init__(self, fmt=TEXT_FORMAT, max_length=DEFAULT_MAX_MESSAGE_LENGTH):
+        super().__init__(fmt)
+        self.max_length = max_length
+
+    def formatMessage(self, record):
+        record.message = truncate(record.message, self.max_length)
+        return super().formatMessage(record)
+
+    def formatException(self, exc_info):
+        return truncate(super().formatException(exc_info), self.max_length)
+
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler qui n'attend jamais: file pleine, l'enregistrement est abandonné et compté.
+
+    Contrairement à QueueHandler, le message n'est pas formaté ici (dans le thread de la
+    requête) mais par le QueueListener.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._unreported = 0
+
+    def prepare(self, record):
+        # Copie pour que les autres handlers du logger voient l'enregistrement d'origine
+        return copy.copy(record)
+
+    def enqueue(self, record):
+        try:
+            if self._unreported:
+                self.queue.put_nowait(self._dropped_record())
+                self._unreported = 0
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._unreported += 1
+
+    def _dropped_record(self):
+        return logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                 "%d messages de log abandonnés (file pleine)", (self._unreported,), None)
+
+
+def configure_logging(level=None, logger_levels=None, log_format=None, max_length=None, sampling=None,
+                      queue_size=None, stream=None):
+    """Installe la chaîne de logs sur le logger racine (paramètres absents: variables d'environnement).
+
+    Peut être rappelée: l'installation précédente est arrêtée (ses messages en attente écrits)
+    puis remplacée. Retourne le NonBlockingQueueHandler installé.
+    """
+    global _listener, _handler
+    env = os.environ
+    level = (level or env.get("LOG_LEVEL", "INFO")).upper()
+    if logger_levels is None:
+        logger_levels = {**DEFAULT_LOGGER_LEVELS, **parse_levels(env.get("LOG_LEVELS"))}
+    log_format = log_format or env.get("LOG_FORMAT", "json")
+    if max_length is None:
+        max_length = int(env.get("LOG_MAX_MESSAGE_LENGTH", str(DEFAULT_MAX_MESSAGE_LENGTH)))
+    if sampling is None:
+        sampling = parse_sampling(env.get("LOG_SAMPLING"))
+    queue_size = queue_size or int(env.get("LOG_QUEUE_SIZE", str(DEFAULT_QUEUE_SIZE)))
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter(max_length) if log_format == "json" else TruncatingFormatter(max_length=max_length))
+
+    with _lock:
+        stop_logging()
+        handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+        if sampling:
+            handler.addFilter(SamplingFilter(sampling))
+        listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+
+        root = logging.getLogger()
+        for existing in list(root.handlers):
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(level)
+        for name, logger_level in logger_levels.items():
+            logging.getLogger(name).setLevel(logger_level)
+
+        listener.start()
+        _handler, _listener = handler, listener
+    return handler
+
+
+def stop_logging():
+    """Arrête le thread d'écriture après avoir écrit les messages en attente."""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except Exception:
+            pass
+        _listener = None
+
+
+def _restart_after_fork():
+    """Processus créé par fork (worker gunicorn): le thread d'écriture n'a pas été copié.
+
+    Nouvelle file (celle du parent peut avoir été copiée verrouillée) et nouveau thread.
+    """
+    global _listener, _lock
+    _lock = threading.Lock()
+    if _handler is None or _listener is None:
+        return
+    handlers = _listener.handlers
+    _handler.queue = queue.Queue(_handler.queue.maxsize)
+    _listener = logging.handlers.QueueListener(_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+atexit.register(stop_logging)
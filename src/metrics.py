@@ -0,0 +1,334 @@
+"""Métriques de l'application: durée de chaque étape d'une requête et exposition Prometheus.
+
+- StageTimer chronomètre les étapes d'une requête (encodage, FAISS, mots-clés, fusion, LLM)
+  avec une horloge monotone; server_timing() les formate pour l'en-tête Server-Timing.
+- Registry regroupe compteurs et histogrammes (avec labels); render() produit le format
+  texte de Prometheus servi par /metrics.
+- Avec plusieurs workers (gunicorn), chaque processus a ses propres valeurs: MetricsFiles
+  les écrit périodiquement dans un dossier partagé (metrics-<pid>.json) et /metrics
+  additionne celles de tous les workers, y compris des workers arrêtés (les compteurs ne
+  décroissent jamais).
+
+Métriques désactivées, NULL_TIMER remplace StageTimer: chaque étape ne coûte qu'un
+gestionnaire de contexte vide.
+"""
+import atexit
+import bisect
+import contextlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Bornes des histogrammes de durée (secondes): de la recherche (ms) à l'appel au LLM (s)
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+FILE_PREFIX = "metrics-"
+
+
+class StageTimer:
+    """Durées des étapes d'une requête, dans l'ordre de leur première exécution.
+
+    Une étape exécutée plusieurs fois cumule ses durées.
+    """
+
+    def __init__(self, clock=time.perf_counter):
+        self._clock = clock
+        self.start = clock()
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.add(name, self._clock() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def elapsed(self):
+        return self._clock() - self.start
+
+    def server_timing(self):
+        """Valeur de l'en-tête Server-Timing (durées en millisecondes), total compris."""
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.stages.items()]
+        parts.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(parts)
+
+
+class NullTimer:
+    """StageTimer sans effet (métriques désactivées)."""
+
+    stages = {}
+    _context = contextlib.nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+    def add(self, name, seconds):
+        pass
+
+    def elapsed(self):
+        return 0.0
+
+    def server_timing(self):
+        return ""
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels attendus {self.labelnames}, reçus {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def samples(self):
+        with self._lock:
+            return [[list(key), value if not isinstance(value, list) else list(value)]
+                    for key, value in self._values.items()]
+
+    def state(self):
+        """Description et valeurs, sérialisables en JSON."""
+        return {"kind": self.kind, "help": self.documentation, "labelnames": list(self.labelnames),
+                "samples": self.samples()}
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+
+class Histogram(Metric):
+    """Histogramme: nombre d'observations par intervalle de buckets, somme et nombre total.
+
+    Chaque échantillon est stocké sous la forme [n_1, ..., n_k, n_inf, somme].
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    def state(self):
+        state = super().state()
+        state["buckets"] = list(self.buckets)
+        return state
+
+
+class CallbackMetric(Metric):
+    """Valeurs lues au moment de la collecte: fn() -> {tuple de labels: valeur}.
+
+    Utile pour des totaux déjà tenus ailleurs (ex. succès/échecs d'un cache).
+    """
+
+    def __init__(self, name, documentation, fn, labelnames=(), kind="counter"):
+        super().__init__(name, documentation, labelnames)
+        self.fn = fn
+        self.kind = kind
+
+    def samples(self):
+        return [[list(key), float(value)] for key, value in self.fn().items()]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Métrique déjà enregistrée: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def callback(self, name, documentation, fn, labelnames=(), kind="counter"):
+        return self.register(CallbackMetric(name, documentation, fn, labelnames, kind))
+
+    def collect(self):
+        """État de toutes les métriques: {nom: état}, sérialisable en JSON."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        states = {}
+        for metric in metrics:
+            try:
+                states[metric.name] = metric.state()
+            except Exception:
+                logger.exception("Collecte impossible de la métrique %s", metric.name)
+        return states
+
+
+def merge_states(states):
+    """Additionne les états de plusieurs processus (mêmes métriques, mêmes labels)."""
+    merged = {}
+    for state in states:
+        for name, metric in state.items():
+            target = merged.setdefault(name, {**metric, "samples": {}})
+            if metric.get("buckets") != target.get("buckets"):
+                logger.warning("Buckets différents pour %s selon les processus, échantillons ignorés", name)
+                continue
+            samples = target["samples"]
+            for labels, value in metric["samples"]:
+                key = tuple(labels)
+                if key not in samples:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(samples[key], value)]
+                else:
+                    samples[key] += value
+    for metric in merged.values():
+        metric["samples"] = [[list(key), value] for key, value in metric["samples"].items()]
+    return merged
+
+
+def _format_value(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in (*zip(names, values), *extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def render(states):
+    """Format d'exposition texte de Prometheus (version 0.0.4)."""
+    lines = []
+    for name, metric in sorted(states.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['kind']}")
+        names = metric["labelnames"]
+        for values, value in sorted(metric["samples"], key=lambda sample: sample[0]):
+            if metric["kind"] != "histogram":
+                lines.append(f"{name}{_labels(names, values)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip([*metric["buckets"], "+Inf"], value[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else f"{bound:g}"
+                lines.append(f"{name}_bucket{_labels(names, values, [('le', le)])} {_format_value(cumulative)}")
+            lines.append(f"{name}_sum{_labels(names, values)} {_format_value(value[-1])}")
+            lines.append(f"{name}_count{_labels(names, values)} {_format_value(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+class MetricsFiles:
+    """Partage des métriques entre workers par des fichiers metrics-<pid>.json.
+
+    Chaque processus écrit l'état de son registre toutes les interval secondes (et à sa
+    sortie); collect() lit l'état courant du processus appelant et les fichiers des autres.
+    Le dossier doit être vidé au démarrage du serveur (clear_directory), sinon les valeurs
+    d'une exécution précédente s'ajoutent.
+    """
+
+    def __init__(self, directory, registry, interval=5.0):
+        self.directory = directory
+        self.registry = registry
+        self.interval = interval
+        self.pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def path(self, pid=None):
+        return os.path.join(self.directory, f"{FILE_PREFIX}{pid or os.getpid()}.json")
+
+    def start(self):
+        """Démarre l'écriture périodique, une fois par processus (à rappeler après un fork)."""
+        if self.pid == os.getpid():
+            return self
+        with self._lock:
+            if self.pid != os.getpid():
+                os.makedirs(self.directory, exist_ok=True)
+                self.pid = os.getpid()
+                self._stop = threading.Event()
+                threading.Thread(target=self._run, args=(self._stop,), name="metrics-writer", daemon=True).start()
+                atexit.register(self.write)
+        return self
+
+    def _run(self, stop):
+        while not stop.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        self._stop.set()
+
+    def write(self):
+        """Écrit l'état du processus (fichier temporaire puis os.replace: jamais de fichier partiel)."""
+        try:
+            fd, tmp = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(self.registry.collect(), f)
+            os.replace(tmp, self.path())
+        except OSError:
+            logger.exception("Écriture des métriques impossible dans %s", self.directory)
+
+    def collect(self):
+        """États de tous les processus, à fusionner avec merge_states."""
+        own = os.path.basename(self.path())
+        states = [self.registry.collect()]
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        for name in names:
+            if not name.startswith(FILE_PREFIX) or not name.endswith(".json") or name == own:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    states.append(json.load(f))
+            except (OSError, ValueError):
+                logger.warning("Fichier de métriques illisible: %s", name)
+        return states
+
+
+def clear_directory(directory):
+    """Supprime les fichiers de métriques d'une exécution précédente."""
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.startswith(FILE_PREFIX) or name.startswith(".tmp-"):
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
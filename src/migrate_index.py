@@ -0,0 +1,34 @@
+"""Migre un index FAISS L2 existant vers le format cosinus (produit scalaire, vecteurs normalisés).
+
+Usage:
+    python src/migrate_index.py [models/unified_index.bin] [models/unified_index_config.json]
+
+Les vecteurs sont relus depuis l'index, normalisés puis réindexés avec le même type
+d'index; l'ordre (et donc l'alignement avec les chunks et métadonnées) est conservé.
+"""
+import os
+import sys
+
+import faiss
+
+from ann_index import load_index_config, migrate_to_cosine, save_index_config
+from artifact_versions import current_dir
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(BASE_DIR, "models")
+
+# Par défaut: l'index de la version publiée (models/CURRENT), ou models/ pour une ancienne installation
+index_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(current_dir(MODELS_DIR), "unified_index.bin")
+config_path = sys.argv[2] if len(sys.argv) > 2 else os.path.join(os.path.dirname(index_path), "unified_index_config.json")
+
+print(f"Chargement de l'index {index_path}...")
+index = faiss.read_index(index_path)
+if index.metric_type == faiss.METRIC_INNER_PRODUCT:
+    print("L'index utilise déjà le produit scalaire: rien à faire.")
+    sys.exit(0)
+
+migrated, config = migrate_to_cosine(index, load_index_config(config_path))
+faiss.write_index(migrated, index_path)
+save_index_config(config, config_path)
+print(f"Index migré: {migrated.ntotal} vecteurs, type {config['index_type']}, métrique {config['metric']}")
+print(f"Configuration sauvegardée dans {config_path}")
@@ -0,0 +1,113 @@
+"""Chargement de l'application en arrière-plan.
+
+Le modèle d'embeddings et les artefacts de recherche (index FAISS, chunks, métadonnées,
+index mots-clés) sont chargés en parallèle dans des threads, sans bloquer l'import du
+module: le serveur répond tout de suite à /healthz (processus vivant) et /readyz passe
+à 200 quand tout est chargé.
+
+Avec gunicorn et preload_app (cf. gunicorn.conf.py), le chargement a lieu une seule fois
+dans le processus maître, qui attend sa fin avant de créer les workers: ceux-ci partagent
+alors le modèle et les artefacts en lecture seule (copy-on-write).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "failed"
+
+
+class Startup:
+    """Exécute des tâches de chargement nommées en parallèle, dans un thread d'arrière-plan.
+
+    tasks: {nom: fonction sans argument}. L'état de chaque tâche (pending, loading, ready,
+    failed), sa durée et son erreur éventuelle sont exposés par report().
+    """
+
+    def __init__(self, tasks):
+        self.tasks = dict(tasks)
+        self.states = {name: PENDING for name in self.tasks}
+        self.durations = {}
+        self.errors = {}
+        self._thread = None
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+
+    def start(self):
+        """Lance le chargement (une seule fois); retourne immédiatement."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="startup", daemon=True)
+                self._thread.start()
+        return self
+
+    def restart(self):
+        """Relance les tâches non terminées (ex. dans un worker créé par fork pendant le chargement,
+        où le thread de chargement n'existe plus)."""
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._thread = None
+        for name, state in self.states.items():
+            if state != READY:
+                self.states[name] = PENDING
+                self.errors.pop(name, None)
+        return self.start()
+
+    def _run(self):
+        start = time.perf_counter()
+        tasks = {name: task for name, task in self.tasks.items() if self.states[name] != READY}
+        with ThreadPoolExecutor(max_workers=max(1, len(tasks)), thread_name_prefix="startup") as executor:
+            for name, task in tasks.items():
+                executor.submit(self._run_task, name, task)
+        self._done.set()
+        if self.ready:
+            logger.info("Démarrage terminé en %.1f s", time.perf_counter() - start)
+        else:
+            logger.error("Démarrage incomplet: %s", ", ".join(sorted(self.errors)))
+
+    def _run_task(self, name, task):
+        self.states[name] = LOADING
+        start = time.perf_counter()
+        try:
+            task()
+            self.states[name] = READY
+        except Exception as e:
+            self.states[name] = FAILED
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            logger.exception("Échec du chargement: %s", name)
+        finally:
+            self.durations[name] = time.perf_counter() - start
+        logger.info("Chargement %s: %s en %.1f s", name, self.states[name], self.durations[name])
+
+    @property
+    def ready(self):
+        return all(state == READY for state in self.states.values())
+
+    @property
+    def done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """Attend la fin du chargement (en lançant au besoin). Retourne True si tout est prêt."""
+        self.start()
+        self._done.wait(timeout)
+        return self.ready
+
+    def report(self):
+        if self.ready:
+            status = READY
+        elif FAILED in self.states.values():
+            status = FAILED
+        else:
+            status = LOADING
+        components = {}
+        for name, state in self.states.items():
+            component = {"status": state}
+            if name in self.durations:
+                component["seconds"] = round(self.durations[name], 3)
+            if name in self.errors:
+                component["error"] = self.errors[name]
+            components[name] = component
+        return {"status": status, "components": components}
@@ -31,6 +31,119 @@ document.addEventListener('DOMContentLoaded', function() {
 		}
 	}
 
+	// Découpe un flux Server-Sent Events en événements {event, data}
+	function parseSseBlock(block) {
+		let event = 'message';
+		const dataLines = [];
+		block.split('\n').forEach(line => {
+			if (line.startsWith('event:')) {
+				event = line.slice(6).trim();
+			} else if (line.startsWith('data:')) {
+				dataLines.push(line.slice(5).trim());
+			}
+		});
+		return { event, data: dataLines.length ? JSON.parse(dataLines.join('\n')) : null };
+	}
+
+	// Bloc « Sources » d'une réponse : un lien par document (titre, page, catégorie)
+	function renderSources(sources) {
+		const block = document.createElement('div');
+		block.className = 'sources';
+		if (!sources || !sources.length) return block;
+
+		const title = document.createElement('div');
+		title.className = 'step-title';
+		title.textContent = 'Sources';
+		block.appendChild(title);
+
+		sources.forEach(source => {
+			const link = document.createElement(source.url ? 'a' : 'span');
+			link.className = 'source-link';
+			if (source.url) {
+				link.href = source.url;
+				link.target = '_blank';
+				link.rel = 'noopener';
+			}
+			const icon = document.createElement('i');
+			icon.className = source.url ? 'fas fa-external-link-alt' : 'fas fa-file-alt';
+			link.appendChild(icon);
+			const page = source.page ? ` (p. ${source.page})` : '';
+			link.appendChild(document.createTextNode(`${source.title}${page} — ${source.category}`));
+
+			const item = document.createElement('div');
+			item.appendChild(link);
+			block.appendChild(item);
+		});
+		return block;
+	}
+
+	async function streamSearch(query) {
+		const response = await fetch('/search/stream', {
+			method: 'POST',
+			headers: {
+				'Content-Type': 'application/json',
+			},
+			body: JSON.stringify({ query }),
+		});
+
+		if (!response.ok || !response.body) {
+			throw new Error('Erreur réseau');
+		}
+
+		const reader = response.body.getReader();
+		const decoder = new TextDecoder();
+		let buffer = '';
+		let content = '';
+		let messageDiv = null;
+		let answerDiv = null;
+
+		// Message de l'assistant : la réponse, suivie du bloc des sources
+		function ensureMessage() {
+			if (!messageDiv) {
+				messageDiv = addMessage('', 'assistant');
+				answerDiv = document.createElement('div');
+				messageDiv.appendChild(answerDiv);
+			}
+		}
+
+		while (true) {
+			const { value, done } = await reader.read();
+			if (done) break;
+			buffer += decoder.decode(value, { stream: true });
+
+			let separator;
+			while ((separator = buffer.indexOf('\n\n')) !== -1) {
+				const { event, data } = parseSseBlock(buffer.slice(0, separator));
+				buffer = buffer.slice(separator + 2);
+
+				switch (event) {
+					case 'sources':
+						// Recherche terminée : les sources s'affichent, la génération commence
+						updateLoadingStep('generate');
+						ensureMessage();
+						messageDiv.appendChild(renderSources(data));
+						chatMessages.scrollTop = chatMessages.scrollHeight;
+						break;
+					case 'token':
+						loading.classList.add('hidden');
+						ensureMessage();
+						content += data.text;
+						answerDiv.innerHTML = content;
+						chatMessages.scrollTop = chatMessages.scrollHeight;
+						break;
+					case 'error':
+						console.error('Erreur reçue:', data.error);
+						addMessage(`Erreur: ${data.error}`, 'assistant');
+						return;
+				}
+			}
+		}
+
+		if (!content) {
+			addMessage('Désolé, la réponse du serveur est dans un format inattendu.', 'assistant');
+		}
+	}
+
 	form.addEventListener('submit', async function(e) {
 		e.preventDefault();
 		
@@ -45,41 +158,9 @@ document.addEventListener('DOMContentLoaded', function() {
 		loading.classList.remove('hidden');
 		
 		try {
-			// Étape 1 : Recherche
-			updateLoadingStep('search');
-			await new Promise(resolve => setTimeout(resolve, 800));
-			
-			// Envoyer la requête
-			const response = await fetch('/search', {
-				method: 'POST',
-				headers: {
-					'Content-Type': 'application/json',
-				},
-				body: JSON.stringify({ query }),
-			});
-			
-			// Étape 2 : Analyse
+			// Étapes 1 et 2 : recherche et analyse, jusqu'à réception des sources
 			updateLoadingStep('analyze');
-			await new Promise(resolve => setTimeout(resolve, 800));
-			
-			if (!response.ok) {
-				throw new Error('Erreur réseau');
-			}
-			
-			// Étape 3 : Génération
-			updateLoadingStep('generate');
-			
-			const data = await response.json();
-			
-			// Traiter la réponse
-			if (data.error) {
-				console.error('Erreur reçue:', data.error);
-				addMessage(`Erreur: ${data.error}`, 'assistant');
-			} else if (data.response) {
-				addMessage(data.response.content, 'assistant');
-			} else {
-				addMessage('Désolé, la réponse du serveur est dans un format inattendu.', 'assistant');
-			}
+			await streamSearch(query);
 		} catch (error) {
 			console.error('Erreur:', error);
 			addMessage('Désolé, une erreur s\'est produite lors de la recherche.', 'assistant');
@@ -97,6 +178,7 @@ document.addEventListener('DOMContentLoaded', function() {
 		messageDiv.innerHTML = content;
 		chatMessages.appendChild(messageDiv);
 		chatMessages.scrollTop = chatMessages.scrollHeight;
+		return messageDiv;
 	}
 	
 	// Fonction pour définir une requête prédéfinie
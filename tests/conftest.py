@@ -0,0 +1,115 @@
+import os
+import tempfile
+import zlib
+from types import SimpleNamespace
+
+import faiss
+import numpy as np
+import pytest
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+
+CHUNKS = [
+    "Pour transformer une demande d'achat en devis, ouvrez la demande.",
+    "La création d'une commande passe par le catalogue des achats.",
+    "Les fournisseurs répondent à une demande de devis depuis le portail.",
+]
+METADATA = [
+    {"title": "Afpa - Demande d'achat", "category": "FINA"},
+    {"title": "Afpa - Création de commande", "category": "FINA"},
+    {"title": "Fournisseurs - Répondre à une demande de devis", "url": "https://exemple.afpa.fr/devis",
+     "url_category": "Portail"},
+]
+
+
+class HashingModel:
+    """Modèle d'embeddings local: sac de mots haché, vecteurs normalisés (déterministe)."""
+
+    dimension = 32
+
+    def encode(self, texts, batch_size=32):
+        self.calls = getattr(self, "calls", 0) + 1
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                vectors[row, zlib.crc32(word.encode("utf-8")) % self.dimension] += 1.0
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+
+def stub_update(text=None, usage=None):
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text is not None else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class StubChatClient:
+    """Remplace ChatClientManager: réponse fixe, en un bloc ou en deux fragments (stream=True)."""
+
+    def __init__(self, content="<p>Réponse</p>", error=None):
+        self.content = content
+        self.error = error
+        self.calls = 0
+
+    def complete(self, messages, model, stream=False, **kwargs):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        if stream:
+            return iter([stub_update(self.content[:3]), stub_update(self.content[3:]), stub_update()])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+
+@pytest.fixture(scope="session")
+def app_unified():
+    """Module src/app_unified.py, importé sans modèle ni artefacts réels.
+
+    Le chargement en arrière-plan lancé à l'import échoue aussitôt (dossier d'artefacts
+    vide, backend ONNX absent): chaque test installe ses propres artefacts.
+    """
+    patch = pytest.MonkeyPatch()
+    patch.setenv("MODELS_DIR", tempfile.mkdtemp(prefix="chatbot-tests-"))
+    patch.setenv("EMBEDDING_BACKEND", "onnx")
+    patch.setenv("EMBEDDING_ONNX_DIR", os.path.join(tempfile.gettempdir(), "chatbot-tests-no-onnx"))
+    patch.setenv("ARTIFACT_WATCH_INTERVAL", "0")
+    patch.setenv("FLASK_SECRET_KEY", "tests")
+    patch.setenv("DEPLOYMENT_NAME", "gpt-4o")
+    patch.setenv("LOG_FORMAT", "text")
+    patch.delenv("METRICS_DIR", raising=False)
+    patch.syspath_prepend(SRC_DIR)
+    import app_unified as module
+    module.startup.wait(30)
+    yield module
+    patch.undo()
+
+
+@pytest.fixture
+def search_app(app_unified, monkeypatch):
+    """app_unified prêt à servir: petit corpus, modèle haché, client LLM local."""
+    from keyword_index import KeywordIndex
+    from startup import Startup
+
+    model = HashingModel()
+    vectors = model.encode(CHUNKS)
+    index = faiss.IndexFlatIP(model.dimension)
+    index.add(vectors)
+
+    monkeypatch.setattr(app_unified, "embedding_model", model)
+    monkeypatch.setattr(app_unified, "chat_client", StubChatClient())
+    monkeypatch.setattr(app_unified, "startup", Startup({}))
+    app_unified.startup.wait(5)
+    monkeypatch.setattr(app_unified, "snapshot", app_unified.SearchSnapshot(
+        index, CHUNKS, METADATA, KeywordIndex.build(CHUNKS, METADATA), "tests"))
+    app_unified.query_embedding_cache.clear()
+    app_unified.response_cache.clear()
+    yield app_unified
+    app_unified.query_embedding_cache.clear()
+    app_unified.response_cache.clear()
+
+
+@pytest.fixture
+def client(search_app):
+    """Client de test Flask connecté."""
+    test_client = search_app.app.test_client()
+    with test_client.session_transaction() as session:
+        session["username"] = "admin"
+    return test_client
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from src.ann_index import (INDEX_TYPES, apply_search_params, build_index, load_index_config,
+                           resolve_index_config, save_index_config)
+
+
+@pytest.fixture(scope="module")
+def clustered():
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((20, 32))
+    labels = rng.integers(0, 20, 4000)
+    embeddings = (centers[labels] + 0.1 * rng.standard_normal((4000, 32))).astype("float32")
+    return embeddings, labels
+
+
+@pytest.fixture(scope="module")
+def embeddings(clustered):
+    return clustered[0]
+
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_every_index_type_builds_and_finds_nearest_vectors(clustered, index_type):
+    embeddings, labels = clustered
+    config = resolve_index_config(index_type, len(embeddings), embeddings.shape[1])
+    index = build_index(embeddings, config)
+    assert index.ntotal == len(embeddings)
+
+    _, ids = index.search(embeddings[:20], 10)
+    if index_type == "ivfpq":
+        # Quantification avec perte: les voisins doivent au moins appartenir au même groupe
+        assert (labels[ids] == labels[:20, None]).mean() >= 0.95
+    else:
+        assert sum(i in row for i, row in enumerate(ids)) >= 18
+
+
+def test_ivf_parameters_are_bounded_by_training_size():
+    config = resolve_index_config("ivfpq", 500, 384)
+    assert config["params"]["nlist"] <= 500 // 39
+    assert 384 % config["params"]["pq_m"] == 0
+    with pytest.raises(ValueError):
+        resolve_index_config("annoy", 500, 384)
+
+
+def test_search_parameters_are_restored_after_reload(embeddings, tmp_path):
+    config = resolve_index_config("hnsw", len(embeddings), embeddings.shape[1], {"efSearch": 123})
+    index = build_index(embeddings, config)
+    faiss.write_index(index, str(tmp_path / "index.bin"))
+    save_index_config(config, str(tmp_path / "config.json"))
+
+    reloaded = faiss.read_index(str(tmp_path / "index.bin"))
+    apply_search_params(reloaded, load_index_config(str(tmp_path / "config.json")))
+    assert faiss.downcast_index(reloaded).hnsw.efSearch == 123
+
+    apply_search_params(reloaded, config, {"efSearch": "32"})
+    assert faiss.downcast_index(reloaded).hnsw.efSearch == 32
@@ -0,0 +1,208 @@
+import json
+import os
+
+import faiss
+import numpy as np
+import pytest
+
+from tests.conftest import CHUNKS, METADATA, HashingModel
+
+
+def sse_frames(body):
+    """[(événement, données JSON)] d'un flux Server-Sent Events."""
+    frames = []
+    for block in body.split("\n\n"):
+        if not block:
+            continue
+        lines = dict(line.split(": ", 1) for line in block.split("\n"))
+        frames.append((lines["event"], json.loads(lines["data"])))
+    return frames
+
+
+def test_search_stream_sends_sources_then_tokens_then_done(client):
+    response = client.post("/search/stream", json={"query": "répondre à une demande de devis"})
+
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    frames = sse_frames(response.get_data(as_text=True))
+    events = [event for event, _ in frames]
+    assert events == ["sources", "token", "token", "done"]
+    sources = frames[0][1]
+    assert sources and sources[0]["title"] == "Fournisseurs - Répondre à une demande de devis"
+    assert "".join(data["text"] for event, data in frames if event == "token") == "<p>Réponse</p>"
+    assert frames[-1][1] == {}
+
+
+def test_search_stream_reports_llm_failure_as_error_event(client, search_app):
+    search_app.chat_client.error = RuntimeError("Azure indisponible")
+
+    response = client.post("/search/stream", json={"query": "créer une commande"})
+
+    assert response.status_code == 200
+    frames = sse_frames(response.get_data(as_text=True))
+    assert [event for event, _ in frames] == ["sources", "error"]
+    assert frames[-1][1] == {"error": "Une erreur est survenue"}
+
+
+def test_search_stream_requires_a_query(client):
+    assert client.post("/search/stream", json={}).status_code == 400
+
+
+def test_healthz_always_answers(app_unified, monkeypatch):
+    from startup import Startup
+    monkeypatch.setattr(app_unified, "startup", Startup({"model": lambda: None}))
+    response = app_unified.app.test_client().get("/healthz")
+    assert response.status_code == 200
+    assert response.get_json() == {"status": "ok"}
+
+
+def test_readyz_reports_pending_failed_then_ready(app_unified, monkeypatch):
+    from startup import Startup
+    client = app_unified.app.test_client()
+
+    def failing():
+        raise OSError("index absent")
+
+    monkeypatch.setattr(app_unified, "startup", Startup({"model": lambda: None, "artifacts": failing}))
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    assert response.get_json()["components"]["artifacts"]["status"] == "pending"
+
+    app_unified.startup.wait(5)
+    response = client.get("/readyz")
+    assert response.status_code == 503
+    report = response.get_json()
+    assert report["status"] == "failed"
+    assert report["components"]["model"]["status"] == "ready"
+    assert report["components"]["artifacts"]["error"] == "OSError: index absent"
+
+    app_unified.startup.tasks["artifacts"] = lambda: None
+    app_unified.startup.restart()
+    app_unified.startup.wait(5)
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "ready"
+
+
+def publish_test_version(app_unified, models_dir, keyword_corpus=(CHUNKS, METADATA)):
+    """Publie une version du petit corpus (index, chunks, index mots-clés de keyword_corpus, vecteurs bruts)."""
+    import artifact_store
+    import artifact_versions
+    from ann_index import save_index_config
+    from keyword_index import KeywordIndex
+
+    version, staging = artifact_versions.create_version(models_dir)
+    index = faiss.IndexFlatIP(HashingModel.dimension)
+    vectors = HashingModel().encode(CHUNKS)
+    index.add(vectors)
+    faiss.write_index(index, os.path.join(staging, app_unified.INDEX_FILE))
+    save_index_config({"index_type": "flat", "metric": "ip", "params": {}},
+                      os.path.join(staging, app_unified.INDEX_CONFIG_FILE))
+    artifact_store.write_artifacts(staging, CHUNKS, METADATA)
+    KeywordIndex.build(*keyword_corpus).save(os.path.join(staging, app_unified.KEYWORD_INDEX_FILE))
+    # Lu seulement par la mise à jour incrémentale
+    np.save(os.path.join(staging, "unified_embeddings.npy"), vectors)
+    directory = artifact_versions.commit_version(models_dir, version, {"vectors": 3, "chunks": 3, "metadata": 3})
+    artifact_versions.publish(models_dir, version)
+    return version, directory
+
+
+def test_published_version_is_never_rewritten_when_its_keyword_index_is_stale(app_unified, tmp_path, monkeypatch):
+    import artifact_versions
+
+    models_dir = str(tmp_path)
+    # Index mots-clés d'un corpus précédent (2 chunks au lieu de 3): obsolète
+    version, directory = publish_test_version(app_unified, models_dir, (CHUNKS[:2], METADATA[:2]))
+    files = {name: os.path.getmtime(os.path.join(directory, name)) for name in os.listdir(directory)}
+    monkeypatch.setattr(app_unified, "MODELS_DIR", models_dir)
+
+    for _ in range(2):  # Le second chargement simule un redémarrage
+        loaded = app_unified.load_unified_system()
+        assert loaded.version == version
+        assert loaded.keyword_index.n_docs == len(CHUNKS)
+
+    assert {name: os.path.getmtime(os.path.join(directory, name)) for name in os.listdir(directory)} == files
+    artifact_versions.verify_version(directory)
+
+
+def test_only_the_files_opened_by_the_app_are_verified_at_load(app_unified, tmp_path, monkeypatch):
+    import artifact_versions
+
+    models_dir = str(tmp_path)
+    version, directory = publish_test_version(app_unified, models_dir)
+    monkeypatch.setattr(app_unified, "MODELS_DIR", models_dir)
+    with open(os.path.join(directory, "unified_embeddings.npy"), "ab") as f:
+        f.write(b"fichier de construction modifie")
+
+    assert app_unified.load_unified_system().version == version
+
+    with open(os.path.join(directory, "unified_chunks.bin"), "ab") as f:
+        f.write(b"!")
+    with pytest.raises(artifact_versions.ArtifactIntegrityError):
+        app_unified.load_unified_system()
+
+
+def test_keyword_index_of_another_corpus_with_the_same_size_is_rebuilt(app_unified, tmp_path):
+    from keyword_index import KeywordIndex
+    path = str(tmp_path / app_unified.KEYWORD_INDEX_FILE)
+    edited = CHUNKS[:2] + ["Les fournisseurs consultent leurs commandes depuis le portail."]
+    KeywordIndex.build(edited, METADATA).save(path)
+
+    kw_index = app_unified.load_keyword_index(CHUNKS, METADATA, path)
+
+    assert kw_index.search("consultent") == []
+    assert KeywordIndex.load(path).fingerprint == kw_index.fingerprint
+
+
+def test_search_documents_batch_matches_per_query_search(search_app):
+    snapshot = search_app.snapshot
+    queries = ["demande de devis", "créer une commande", "demande de devis", "aucun terme connu"]
+
+    batch = search_app.search_documents_batch(queries, snapshot.index, snapshot.chunks, snapshot.metadata, 2,
+                                              keyword_index=snapshot.keyword_index)
+
+    assert batch == [search_app.search_documents(query, snapshot.index, snapshot.chunks, snapshot.metadata, 2,
+                                                 keyword_index=snapshot.keyword_index) for query in queries]
+    # Requêtes distinctes encodées en un seul appel au modèle
+    search_app.query_embedding_cache.clear()
+    search_app.embedding_model.calls = 0
+    search_app.search_documents_batch(queries, snapshot.index, snapshot.chunks, snapshot.metadata, 2,
+                                      keyword_index=snapshot.keyword_index)
+    assert search_app.embedding_model.calls == 1
+
+
+def test_search_batch_returns_sources_and_optional_answers(client, search_app):
+    response = client.post("/search/batch", json={"queries": ["demande de devis", "créer une commande"], "top_k": 1})
+
+    assert response.status_code == 200
+    results = response.get_json()["results"]
+    assert [item["query"] for item in results] == ["demande de devis", "créer une commande"]
+    assert [len(item["sources"]) for item in results] == [1, 1]
+    assert all("content" not in item for item in results)
+    assert search_app.chat_client.calls == 0
+
+    response = client.post("/search/batch", json={"queries": ["créer une commande"], "generate": True})
+    assert response.get_json()["results"][0]["content"] == "<p>Réponse</p>"
+
+
+def test_search_batch_requires_a_session(search_app):
+    response = search_app.app.test_client().post("/search/batch", json={"queries": ["devis"]})
+    assert response.status_code == 302
+    assert "/login" in response.headers["Location"]
+
+
+@pytest.mark.parametrize("payload", [
+    {"queries": "demande de devis"},
+    {"queries": []},
+    {"queries": ["devis"] * 3},
+    {"queries": ["devis"], "top_k": 0},
+    {"queries": ["devis"], "top_k": "5"},
+    {"queries": ["devis"], "top_k": 51},
+    ["devis"],
+])
+def test_search_batch_rejects_invalid_requests(client, search_app, monkeypatch, payload):
+    monkeypatch.setattr(search_app, "SEARCH_BATCH_MAX_QUERIES", 2)
+    response = client.post("/search/batch", json=payload)
+    assert response.status_code == 400
+    assert response.get_json()["error"]
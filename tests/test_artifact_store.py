@@ -0,0 +1,69 @@
+import os
+
+import faiss
+import numpy as np
+
+from src.ann_index import build_index, read_index_mmap, resolve_index_config
+from src.artifact_store import (
+    artifacts_outdated, load_legacy_artifacts, open_artifacts, write_artifacts
+)
+from src.keyword_index import KeywordIndex
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "models")
+
+
+def test_compact_format_round_trips_shipped_artifacts(tmp_path):
+    chunks, metadata = load_legacy_artifacts(MODELS_DIR)
+    write_artifacts(str(tmp_path), chunks, metadata)
+    stored_chunks, stored_metadata = open_artifacts(str(tmp_path))
+
+    assert len(stored_chunks) == len(chunks)
+    assert list(stored_chunks) == chunks
+    assert [stored_metadata[i] for i in range(len(metadata))] == metadata
+    assert stored_chunks[np.int64(3)] == chunks[3]
+    assert stored_metadata.column("title") == [meta["title"] for meta in metadata]
+
+    # La recherche par mots-clés donne les mêmes résultats sur les deux formats
+    expected = KeywordIndex.build(chunks, metadata).search("demande d'achat")
+    assert KeywordIndex.build(stored_chunks, stored_metadata).search("demande d'achat") == expected
+
+
+def test_metadata_columns_keep_missing_keys_and_value_types(tmp_path):
+    chunks = ["é" * 3, "", "texte"]
+    metadata = [
+        {"title": "A", "chunk_id": 0, "url": "https://example.org/a"},
+        {"title": "A", "chunk_id": 1},
+        {"title": "1", "chunk_id": 1, "category": "FINA"},
+    ]
+    write_artifacts(str(tmp_path), chunks, metadata)
+    stored_chunks, stored_metadata = open_artifacts(str(tmp_path))
+
+    assert list(stored_chunks) == chunks
+    assert list(stored_metadata) == metadata
+    assert "url" not in stored_metadata[1]
+    assert stored_metadata.column("url") == ["https://example.org/a", None, None]
+
+
+def test_legacy_files_newer_than_compact_format_are_outdated(tmp_path):
+    assert artifacts_outdated(str(tmp_path))
+    write_artifacts(str(tmp_path), ["a"], [{"title": "a"}])
+    assert not artifacts_outdated(str(tmp_path))
+
+    legacy = tmp_path / "unified_chunks.json"
+    legacy.write_text('{"chunks": ["b"]}', encoding="utf-8")
+    future = os.path.getmtime(tmp_path / "unified_chunks.bin") + 10
+    os.utime(legacy, (future, future))
+    assert artifacts_outdated(str(tmp_path))
+
+
+def test_mmap_index_matches_in_memory_index(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 32)).astype("float32")
+    for index_type in ("flat", "hnsw", "ivf"):
+        config = resolve_index_config(index_type, len(vectors), vectors.shape[1])
+        path = str(tmp_path / f"{index_type}.bin")
+        faiss.write_index(build_index(vectors, config), path)
+
+        expected = faiss.read_index(path).search(vectors[:5], 5)
+        mapped = read_index_mmap(path, config).search(vectors[:5], 5)
+        np.testing.assert_array_equal(mapped[1], expected[1])
@@ -0,0 +1,100 @@
+import os
+
+import pytest
+
+from src.artifact_versions import (
+    ArtifactIntegrityError, ArtifactWatcher, commit_version, create_version, current_dir, current_version,
+    list_versions, prune, publish, verify_counts, verify_version
+)
+
+
+def write_version(models_dir, text, counts=None):
+    version, path = create_version(str(models_dir))
+    with open(os.path.join(path, "unified_index.bin"), "w") as f:
+        f.write(text)
+    commit_version(str(models_dir), version, counts or {"vectors": 1, "chunks": 1, "metadata": 1})
+    return version
+
+
+def test_publish_switches_pointer_and_prune_keeps_current(tmp_path):
+    assert current_dir(str(tmp_path)) == str(tmp_path)  # Ancienne disposition à plat
+
+    versions = [write_version(tmp_path, f"index {i}") for i in range(4)]
+    assert list_versions(str(tmp_path)) == versions
+    publish(str(tmp_path), versions[1])
+    assert current_version(str(tmp_path)) == versions[1]
+    with open(os.path.join(current_dir(str(tmp_path)), "unified_index.bin")) as f:
+        assert f.read() == "index 1"
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+    removed = prune(str(tmp_path), keep=2)
+    assert removed == [versions[0]]
+    assert list_versions(str(tmp_path)) == versions[1:]
+
+    with pytest.raises(FileNotFoundError):
+        publish(str(tmp_path), "absente")
+    assert current_version(str(tmp_path)) == versions[1]
+
+
+def test_watcher_loads_each_new_version_once_and_skips_failed_ones(tmp_path):
+    first, second, third = write_version(tmp_path, "a"), write_version(tmp_path, "b"), write_version(tmp_path, "c")
+    publish(str(tmp_path), first)
+    loaded, attempts = [], []
+
+    def on_change(version):
+        attempts.append(version)
+        if version == second:
+            raise OSError("version incomplète")
+        loaded.append(version)
+
+    watcher = ArtifactWatcher(str(tmp_path), on_change, version=first)
+    assert not watcher.check()
+
+    publish(str(tmp_path), second)
+    assert not watcher.check()  # Échec: la version servie ne change pas
+    assert not watcher.check()  # ... et la version en échec n'est pas retentée
+    assert watcher.version == first and attempts == [second]
+
+    publish(str(tmp_path), third)
+    assert watcher.check()
+    assert not watcher.check()
+    assert loaded == [third] and watcher.version == third
+
+
+def test_unfinished_version_is_invisible_and_corruption_is_detected(tmp_path):
+    version, staging = create_version(str(tmp_path))
+    with open(os.path.join(staging, "unified_chunks.bin"), "wb") as f:
+        f.write(b"chunk 0chunk 1")
+    # Arrêt brutal avant commit_version: rien n'est visible ni publiable
+    assert list_versions(str(tmp_path)) == []
+    with pytest.raises(FileNotFoundError):
+        publish(str(tmp_path), version)
+
+    path = commit_version(str(tmp_path), version, {"vectors": 2, "chunks": 2, "metadata": 2})
+    manifest = verify_version(path)
+    assert manifest["counts"] == {"vectors": 2, "chunks": 2, "metadata": 2}
+    verify_counts(manifest, vectors=2, chunks=2, metadata=2)
+    with pytest.raises(ArtifactIntegrityError):
+        verify_counts(manifest, vectors=2, chunks=3, metadata=3)
+    with pytest.raises(ArtifactIntegrityError):
+        verify_counts(None, vectors=2, chunks=2, metadata=1)
+
+    with open(os.path.join(path, "unified_chunks.bin"), "r+b") as f:
+        f.write(b"C")
+    with pytest.raises(ArtifactIntegrityError):
+        verify_version(path)
+    # Sans sommes de contrôle, seule la taille est vérifiée
+    verify_version(path, checksums=False)
+    # Seuls les fichiers demandés (et présents dans le manifeste) sont vérifiés
+    verify_version(path, files=["unified_index.bin", "absent.bin"])
+
+
+def test_prune_removes_abandoned_staging_directories_only(tmp_path):
+    _, abandoned = create_version(str(tmp_path))
+    _, in_progress = create_version(str(tmp_path))
+    os.utime(abandoned, (0, 0))
+
+    prune(str(tmp_path))
+
+    assert not os.path.exists(abandoned)
+    assert os.path.exists(in_progress)
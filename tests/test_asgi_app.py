@@ -0,0 +1,115 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+
+class StubAsyncChatClient:
+    """Remplace AsyncChatClientManager: réponse fixe, en un bloc ou en deux fragments."""
+
+    def __init__(self, content="<p>Réponse</p>"):
+        self.content = content
+        self.calls = 0
+
+    async def complete(self, messages, model, **kwargs):
+        self.calls += 1
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.content))])
+
+    async def stream(self, messages, model, **kwargs):
+        self.calls += 1
+        for part in (self.content[:3], self.content[3:]):
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+
+
+@pytest.fixture
+def asgi_app(search_app, monkeypatch):
+    import asgi_app as module
+    monkeypatch.setattr(module, "async_chat_client", StubAsyncChatClient())
+    return module
+
+
+def session_cookie(flask_app, username="admin"):
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    value = serializer.dumps({"username": username})
+    return f"{flask_app.config['SESSION_COOKIE_NAME']}={value}".encode("latin-1")
+
+
+def call(application, method, path, body=b"", cookie=None):
+    """Exécute une requête HTTP sur l'application ASGI. Retourne (statut, en-têtes, corps)."""
+    headers = [(b"content-type", b"application/json")]
+    if cookie:
+        headers.append((b"cookie", cookie))
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": method,
+             "scheme": "http", "path": path, "raw_path": path.encode(), "query_string": b"",
+             "root_path": "", "headers": headers, "server": ("testserver", 80), "client": ("127.0.0.1", 1234)}
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(application(scope, receive, send))
+    start = sent[0]
+    return (start["status"], {name.decode(): value.decode() for name, value in start["headers"]},
+            b"".join(message.get("body", b"") for message in sent[1:]))
+
+
+def test_search_requires_a_session(asgi_app):
+    status, headers, _ = call(asgi_app.application, "POST", "/search", b'{"query": "devis"}')
+    assert status == 302
+    assert headers["location"] == "/login?next=%2Fsearch"
+
+
+def test_search_returns_answer_sources_and_server_timing(asgi_app):
+    cookie = session_cookie(asgi_app.app_unified.app)
+    status, headers, body = call(asgi_app.application, "POST", "/search",
+                                 json.dumps({"query": "créer une commande"}).encode(), cookie)
+
+    assert status == 200
+    payload = json.loads(body)
+    assert payload["response"]["content"] == "<p>Réponse</p>"
+    assert payload["response"]["sources"][0]["title"] == "Afpa - Création de commande"
+    assert "total;dur=" in headers["server-timing"]
+
+
+@pytest.mark.parametrize("body", [b'["devis"]', b'{"query": 3}', b"{}", b"pas du json"])
+def test_search_rejects_bodies_without_a_query(asgi_app, body):
+    cookie = session_cookie(asgi_app.app_unified.app)
+    status, _, payload = call(asgi_app.application, "POST", "/search", body, cookie)
+    assert status == 400
+    assert json.loads(payload) == {"error": "Query is required"}
+    assert asgi_app.async_chat_client.calls == 0
+
+
+def test_search_stream_sends_sse_frames(asgi_app):
+    cookie = session_cookie(asgi_app.app_unified.app)
+    status, headers, body = call(asgi_app.application, "POST", "/search/stream",
+                                 json.dumps({"query": "demande de devis"}).encode(), cookie)
+
+    assert status == 200
+    assert headers["content-type"].startswith("text/event-stream")
+    text = body.decode("utf-8")
+    assert [line for line in text.splitlines() if line.startswith("event: ")] == [
+        "event: sources", "event: token", "event: token", "event: done"]
+
+
+def test_search_returns_503_while_starting(asgi_app, monkeypatch):
+    from startup import Startup
+    monkeypatch.setattr(asgi_app.app_unified, "startup", Startup({"model": lambda: None}))
+
+    cookie = session_cookie(asgi_app.app_unified.app)
+    status, headers, body = call(asgi_app.application, "POST", "/search", b'{"query": "devis"}', cookie)
+
+    assert status == 503
+    assert headers["retry-after"] == "5"
+    assert json.loads(body)["startup"]["components"]["model"]["status"] == "pending"
+
+
+def test_other_routes_are_delegated_to_flask(asgi_app):
+    status, _, body = call(asgi_app.application, "GET", "/healthz")
+    assert status == 200
+    assert json.loads(body) == {"status": "ok"}
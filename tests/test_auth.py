@@ -1,5 +1,8 @@
 import pytest
 import json
+import multiprocessing
+import os
+import threading
 from src.auth import verify_credentials, hash_password
 
 
@@ -38,3 +41,50 @@ def test_verify_credentials_failure_no_user(temp_users_file):
     assert verify_credentials('nouser', 'password123') is False
 
 
+def test_users_file_is_parsed_only_when_it_changes(temp_users_file, monkeypatch):
+    import src.auth as auth
+    parses = []
+    real_load = json.load
+    monkeypatch.setattr(auth.json, "load", lambda f: parses.append(1) or real_load(f))
+
+    for _ in range(5):
+        assert auth.verify_credentials('testuser', 'password123')
+        assert auth.get_user('testuser')["role"] == "user"
+    assert len(parses) <= 1
+
+    # Modification par un autre processus (remplacement du fichier): relue au prochain accès
+    users = {"other": {"password": hash_password("x"), "role": "admin", "name": "Autre"}}
+    tmp = temp_users_file + ".new"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(users, f)
+    os.replace(tmp, temp_users_file)
+    assert auth.get_user('testuser') is None
+    assert auth.get_user('other')["role"] == "admin"
+
+
+def add_users_in_process(prefix, count):
+    from src.auth import add_user
+    for i in range(count):
+        assert add_user(f"{prefix}{i}", "secret")[0]
+
+
+def test_concurrent_writers_never_lose_updates(temp_users_file):
+    from src.auth import add_user, delete_user, get_all_users, update_user
+
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=add_users_in_process, args=(f"p{n}_", 10)) for n in range(4)]
+    threads = [threading.Thread(target=add_users_in_process, args=(f"t{n}_", 10)) for n in range(2)]
+    for worker in workers + threads:
+        worker.start()
+    for worker in workers + threads:
+        worker.join()
+    assert all(worker.exitcode == 0 for worker in workers)
+
+    with open(temp_users_file, encoding="utf-8") as f:
+        assert len(json.load(f)) == 1 + 60
+    assert len(get_all_users()) == 61
+    assert add_user("p0_0", "x") == (False, "Cet identifiant existe déjà")
+    assert update_user("p0_0", role="admin")[0]
+    assert delete_user("p1_0")[0]
+    assert get_all_users()["p0_0"]["role"] == "admin" and "p1_0" not in get_all_users()
+    assert not [name for name in os.listdir(os.path.dirname(temp_users_file)) if name.endswith(".tmp")]
@@ -0,0 +1,37 @@
+from src.caching import LRUCache, normalize_query
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_query_collapses_whitespace_and_case():
+    assert normalize_query("  Transformer une  DEMANDE d'achat ") == "transformer une demande d'achat"
+
+
+def test_lru_cache_evicts_least_recently_used_and_counts_hits():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_lru_cache_expires_entries_after_ttl():
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=60, clock=clock)
+    cache.set("q", "vecteur")
+    clock.now = 59
+    assert cache.get("q") == "vecteur"
+    clock.now = 121
+    assert cache.get("q") is None
+    assert len(cache) == 0
@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+
+from src.ann_index import build_index, migrate_to_cosine, resolve_index_config, similarity_scores
+
+MODELS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "models")
+SHIPPED_INDEX = os.path.join(MODELS_DIR, "unified_index.bin")
+SHIPPED_METADATA = os.path.join(MODELS_DIR, "unified_metadata.pkl")
+
+
+@pytest.fixture(scope="module")
+def shipped_index():
+    if not os.path.exists(SHIPPED_INDEX):
+        pytest.skip("Artefacts models/ absents")
+    return faiss.read_index(SHIPPED_INDEX)
+
+
+def test_migrated_index_returns_true_cosine_scores(shipped_index):
+    migrated, config = migrate_to_cosine(shipped_index)
+    assert migrated.metric_type == faiss.METRIC_INNER_PRODUCT
+    assert migrated.ntotal == shipped_index.ntotal
+    assert config["metric"] == "ip"
+
+    vectors = migrated.reconstruct_n(0, migrated.ntotal)
+    scores, ids = migrated.search(vectors, 5)
+    # Chaque chunk se retrouve lui-même (les doublons exacts sont ex aequo) avec un cosinus de 1
+    assert all(i in row for i, row in enumerate(ids))
+    np.testing.assert_allclose(scores[:, 0], 1.0, atol=1e-4)
+    assert (scores <= 1.0 + 1e-5).all() and (scores >= -1.0 - 1e-5).all()
+
+
+def test_migration_preserves_retrieval_ranking_of_shipped_artifacts(shipped_index):
+    import pickle
+
+    with open(SHIPPED_METADATA, "rb") as f:
+        metadata = pickle.load(f)
+    migrated, _ = migrate_to_cosine(shipped_index)
+    vectors = shipped_index.reconstruct_n(0, shipped_index.ntotal)
+
+    # Requête = centroïde des chunks d'un document: le document doit sortir en tête
+    titles = sorted({meta["title"] for meta in metadata})
+    for title in titles:
+        rows = [i for i, meta in enumerate(metadata) if meta["title"] == title]
+        query = vectors[rows].mean(axis=0, keepdims=True)
+        faiss.normalize_L2(query)
+        legacy_distances, legacy_ids = shipped_index.search(query, 5)
+        scores, ids = migrated.search(query, 5)
+        assert title in {metadata[i]["title"] for i in ids[0]}
+        assert set(ids[0]) == set(legacy_ids[0])
+        np.testing.assert_allclose(scores, similarity_scores(shipped_index, legacy_distances), atol=1e-4)
+
+
+def test_new_indexes_normalize_embeddings():
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((200, 16)).astype("float32") * 10
+    index = build_index(embeddings, resolve_index_config("flat", 200, 16))
+    scores, _ = index.search(embeddings[:1] / np.linalg.norm(embeddings[:1]), 1)
+    assert scores[0][0] == pytest.approx(1.0, abs=1e-5)
@@ -0,0 +1,156 @@
+import zlib
+from functools import partial
+
+import numpy as np
+import pytest
+
+from src.embedding import EmbeddingBatcher, MultiProcessEncoder, plan_batches
+from src.index_manifest import IncrementalCorpus, IndexManifest
+
+
+class FakeEncoder:
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[len(text), sum(map(ord, text)) % 997] for text in texts], dtype="float32")
+
+
+def expected(texts):
+    return np.array([[len(text), sum(map(ord, text)) % 997] for text in texts], dtype="float32")
+
+
+class HashingModel:
+    """Modèle déterministe: projection d'un sac de trigrammes, normalisée (même interface qu'un SentenceTransformer)."""
+
+    def __init__(self, dimension):
+        self.projection = np.random.default_rng(0).standard_normal((4096, dimension)).astype("float32")
+
+    def encode(self, texts, batch_size=32):
+        counts = np.zeros((len(texts), 4096), dtype="float32")
+        for row, text in enumerate(texts):
+            for i in range(max(1, len(text) - 2)):
+                counts[row, zlib.crc32(text[i:i + 3].encode()) % 4096] += 1
+        vectors = counts @ self.projection
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def load_hashing_model(dimension):
+    return HashingModel(dimension)
+
+
+class WordCountingModel(HashingModel):
+    """HashingModel avec un « tokenizer »: un token par mot, plus deux tokens spéciaux."""
+
+    def count_tokens(self, texts):
+        return [len(text.split()) + 2 for text in texts]
+
+
+def load_word_counting_model(dimension):
+    return WordCountingModel(dimension)
+
+
+def test_batches_are_sorted_and_sized_by_padded_token_budget():
+    lengths = [50, 5, 500, 6, 48, 7, 510]
+    batches = plan_batches(lengths, max_batch_tokens=1000, max_batch_size=64)
+
+    assert [i for batch in batches for i in batch] == sorted(range(len(lengths)), key=lengths.__getitem__)
+    for batch in batches:
+        assert len(batch) * max(lengths[i] for i in batch) <= 1000 or len(batch) == 1
+    # Les textes courts partagent un grand lot, les longs sont isolés
+    assert batches[0] == [1, 3, 5, 4, 0]
+    assert batches[-2:] == [[2], [6]]
+
+
+def test_chunks_from_several_files_are_encoded_together_in_order():
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, lambda texts: [len(t) for t in texts],
+                               max_batch_tokens=100, buffer_size=1000)
+    files = [["court", "un texte nettement plus long " * 2], ["b"], ["moyen texte", "x" * 90]]
+    handles = [batcher.submit(chunks) for chunks in files]
+    assert encoder.batches == []
+
+    for chunks, handle in zip(files, handles):
+        np.testing.assert_array_equal(handle.result(), expected(chunks))
+    # Un seul passage pour les trois fichiers, lots regroupant des chunks de fichiers différents
+    assert encoder.batches[0] == ["b", "court", "moyen texte"]
+    assert batcher.stats["chunks"] == 5
+    assert batcher.stats["padded_tokens"] < 5 * 90
+
+
+def test_incremental_corpus_resolves_deferred_embeddings():
+    encoder = FakeEncoder()
+    batcher = EmbeddingBatcher(encoder, buffer_size=3)
+    corpus = IncrementalCorpus(IndexManifest({}))
+    for key, chunks in {"a": ["a1", "a2"], "b": ["b1", "b2", "b3"], "c": ["c1"]}.items():
+        corpus.add(key, "v1", key, chunks, [{"title": key}] * len(chunks), batcher)
+
+    chunks, _, embeddings, _ = corpus.result()
+    np.testing.assert_array_equal(embeddings, expected(chunks))
+    assert len(encoder.batches) == 2
+
+
+def test_encoding_error_is_raised_for_every_pending_file():
+    def failing(texts):
+        raise ValueError("modèle indisponible")
+
+    batcher = EmbeddingBatcher(failing)
+    first, second = batcher.submit(["a"]), batcher.submit(["b"])
+    with pytest.raises(ValueError):
+        batcher.flush()
+    with pytest.raises(RuntimeError):
+        second.result()
+    with pytest.raises(RuntimeError):
+        first.result()
+
+
+def test_multi_process_embeddings_are_identical_to_single_process():
+    rng = np.random.default_rng(3)
+    words = ["achat", "commande", "facture", "fournisseur", "validation", "budget", "procédure"]
+    files = [[" ".join(rng.choice(words, rng.integers(2, 120))) for _ in range(rng.integers(1, 30))]
+             for _ in range(12)]
+
+    model = HashingModel(32)
+    single = EmbeddingBatcher(lambda batch: model.encode(batch, batch_size=len(batch)), max_batch_tokens=600)
+    expected_vectors = [single.submit(chunks) for chunks in files]
+    single.flush()
+
+    with MultiProcessEncoder(partial(load_hashing_model, 32), workers=2, threads_per_worker=1) as encoder:
+        multi = EmbeddingBatcher(encoder, max_batch_tokens=600)
+        handles = [multi.submit(chunks) for chunks in files]
+        multi.flush()
+
+    assert multi.stats["batches"] == single.stats["batches"] > 2
+    for handle, reference in zip(handles, expected_vectors):
+        np.testing.assert_array_equal(handle.result(), reference.result())
+
+
+def test_multi_process_encoder_counts_tokens_in_its_workers():
+    texts = ["demande d'achat", "création d'une commande depuis le catalogue", "", "devis"] * 3
+    with MultiProcessEncoder(partial(load_word_counting_model, 32), workers=2, threads_per_worker=1) as encoder:
+        assert encoder.count_tokens(texts) == WordCountingModel(32).count_tokens(texts)
+        assert encoder.count_tokens([]) == []
+
+
+def test_multi_process_sentence_transformers_match_single_process():
+    pytest.importorskip("sentence_transformers")
+    from src.embedding_backends import load_embedding_backend
+
+    files = [["Comment transformer une demande d'achat en devis ?", "Validation d'une facture fournisseur"],
+             ["Création d'une commande depuis le catalogue"] * 3,
+             ["Procédure budgétaire " * n for n in (1, 20, 60)]]
+    model = load_embedding_backend("sentence-transformers")
+    single = EmbeddingBatcher(lambda batch: model.encode(batch, batch_size=len(batch)), max_batch_tokens=600)
+    expected_vectors = [single.submit(chunks) for chunks in files]
+    single.flush()
+
+    with MultiProcessEncoder(partial(load_embedding_backend, "sentence-transformers"), workers=2,
+                             threads_per_worker=1) as encoder:
+        multi = EmbeddingBatcher(encoder, max_batch_tokens=600)
+        handles = [multi.submit(chunks) for chunks in files]
+        multi.flush()
+
+    for handle, reference in zip(handles, expected_vectors):
+        # Même modèle, mêmes lots: seul l'ordre des calculs flottants peut différer (threads)
+        np.testing.assert_allclose(handle.result(), reference.result(), rtol=0, atol=1e-5)
@@ -0,0 +1,80 @@
+import zlib
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src.embedding import tokenizer_token_counts
+from src.embedding_backends import OnnxBackend, load_embedding_backend
+
+QUERIES = ["Comment transformer une demande d'achat en devis ?", "réception d'une commande fournisseur"]
+DOCUMENTS = [
+    "Transformer une demande d'achat en devis depuis le pavé Achats.",
+    "Recherche des réceptions par fournisseur sur les 60 derniers jours.",
+    "Procédure de validation budgétaire des engagements.",
+    "Créer un bon de commande à partir d'un devis validé.",
+]
+
+
+class WordTokenizer:
+    """Substitut de tokenizers.Tokenizer: un identifiant par mot, [CLS] et [SEP] autour."""
+
+    def encode_batch(self, texts):
+        encodings = []
+        for text in texts:
+            ids = [101] + [zlib.crc32(word.encode()) % 1000 + 1000 for word in text.lower().split()] + [102]
+            encodings.append(SimpleNamespace(ids=ids, attention_mask=[1] * len(ids), type_ids=[0] * len(ids)))
+        return encodings
+
+
+class LookupSession:
+    """Substitut d'InferenceSession: états cachés = table de plongements, bruit fort sur le padding."""
+
+    def __init__(self):
+        self.table = np.random.default_rng(0).standard_normal((2048, 16)).astype("float32")
+        self.table[0] = 1000.0
+
+    def get_inputs(self):
+        return [SimpleNamespace(name="input_ids"), SimpleNamespace(name="attention_mask")]
+
+    def run(self, output_names, feeds):
+        assert set(feeds) == {"input_ids", "attention_mask"}
+        return [self.table[feeds["input_ids"]]]
+
+
+def test_onnx_backend_pools_real_tokens_only_and_normalizes():
+    backend = OnnxBackend(LookupSession(), WordTokenizer())
+    texts = ["devis", "une demande d'achat beaucoup plus longue que la précédente"]
+
+    together = backend.encode(texts, batch_size=2)
+    alone = np.concatenate([backend.encode([text]) for text in texts])
+
+    # Le padding du texte court ne change pas son vecteur
+    np.testing.assert_allclose(together, alone, rtol=1e-5, atol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(together, axis=1), 1.0, rtol=1e-5)
+    assert tokenizer_token_counts(backend)(texts) == [3, 11]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        load_embedding_backend("tensorflow")
+
+
+def cosine_scores(backend):
+    return backend.encode(QUERIES) @ backend.encode(DOCUMENTS).T
+
+
+def test_onnx_backends_match_sentence_transformers_scores(tmp_path):
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    from src.embedding_backends import SentenceTransformerBackend, export_onnx
+
+    export_onnx(str(tmp_path))
+    reference = cosine_scores(SentenceTransformerBackend())
+    onnx = cosine_scores(OnnxBackend.from_directory(str(tmp_path)))
+    int8 = cosine_scores(OnnxBackend.from_directory(str(tmp_path), quantized=True))
+
+    np.testing.assert_allclose(onnx, reference, atol=1e-4)
+    np.testing.assert_allclose(int8, reference, atol=0.05)
+    assert (int8.argmax(axis=1) == reference.argmax(axis=1)).all()
@@ -0,0 +1,152 @@
+import random
+import tempfile
+import threading
+import time
+
+import fitz
+
+from src.extraction_pipeline import (
+    READ_BLOCK_SIZE, DownloadedFile, ExtractionPipeline, chunk_segments, download_to_tempfile, extract_document_chunks,
+    parse_document, read_local_file
+)
+
+
+def make_container(root, n_docs):
+    """Substitut de conteneur Azure: un dossier de fichiers .txt et .pdf."""
+    entries = []
+    for i in range(n_docs):
+        if i % 3 == 0:
+            name = f"FINA/doc{i}.pdf"
+            path = root / f"doc{i}.pdf"
+            with fitz.open() as pdf:
+                pdf.new_page().insert_text((72, 72), f"Procédure {i}")
+                pdf.save(str(path))
+        else:
+            name = f"FINA/doc{i}.txt"
+            path = root / f"doc{i}.txt"
+            path.write_text(f"Procédure {i}", encoding="utf-8")
+        entries.append({"type": "azure", "name": name, "path": str(path)})
+    return entries
+
+
+def slow_fetch(entry):
+    # Latence réseau variable: les téléchargements se terminent dans le désordre
+    time.sleep(random.uniform(0, 0.02))
+    return read_local_file(entry)
+
+
+def test_results_follow_input_order_with_process_parsers(tmp_path):
+    entries = make_container(tmp_path, 12)
+    pipeline = ExtractionPipeline(slow_fetch, parse_document, download_workers=4, parse_workers=2)
+
+    results = list(pipeline.run(entries))
+
+    assert [entry["name"] for entry, _, _ in results] == [entry["name"] for entry in entries]
+    assert [text for _, text, _ in results] == [f"Procédure {i}" for i in range(12)]
+    assert all(error is None for _, _, error in results)
+
+
+def test_errors_are_reported_per_document(tmp_path):
+    entries = make_container(tmp_path, 3)
+    entries[1]["path"] = str(tmp_path / "absent.txt")
+    pipeline = ExtractionPipeline(read_local_file, parse_document, download_workers=2, parse_workers=0)
+
+    results = list(pipeline.run(entries))
+
+    assert [text for _, text, _ in results] == ["Procédure 0", None, "Procédure 2"]
+    assert isinstance(results[1][2], FileNotFoundError)
+
+
+def test_slow_consumer_bounds_documents_in_flight(tmp_path):
+    entries = make_container(tmp_path, 20)
+    lock = threading.Lock()
+    fetched, consumed, max_in_flight = [0], [0], [0]
+
+    def counting_fetch(entry):
+        with lock:
+            fetched[0] += 1
+            max_in_flight[0] = max(max_in_flight[0], fetched[0] - consumed[0])
+        return read_local_file(entry)
+
+    pipeline = ExtractionPipeline(counting_fetch, parse_document, download_workers=8, parse_workers=0,
+                                  max_pending=3)
+    for _ in pipeline.run(entries):
+        time.sleep(0.005)
+        with lock:
+            consumed[0] += 1
+
+    assert fetched[0] == 20
+    assert max_in_flight[0] <= 3
+
+
+def slow_parse(name, source):
+    # Extraction lente: des extractions restent en file quand le consommateur s'arrête
+    time.sleep(0.05)
+    return extract_document_chunks(name, source, chunk_size=100, chunk_overlap=0)
+
+
+def test_closing_the_generator_early_leaves_no_temporary_file(tmp_path, monkeypatch):
+    downloads_dir = tmp_path / "downloads"
+    downloads_dir.mkdir()
+    monkeypatch.setattr(tempfile, "tempdir", str(downloads_dir))
+    entries = make_container(tmp_path, 20)
+
+    def fetch_to_tempfile(entry):
+        return download_to_tempfile([read_local_file(entry)], suffix=entry["name"][-4:])
+
+    pipeline = ExtractionPipeline(fetch_to_tempfile, slow_parse, download_workers=4, parse_workers=1, max_pending=8)
+    results = pipeline.run(entries)
+    entry, parsed, error = next(results)
+    results.close()
+
+    assert error is None and parsed.chunks == ["Procédure 0"]
+    assert list(downloads_dir.iterdir()) == []
+
+
+def test_chunks_are_built_incrementally_with_their_start_page():
+    consumed = []
+
+    def pages():
+        for number in range(1, 51):
+            consumed.append(number)
+            yield number, f"Page {number}. " + "mot " * 200
+
+    chunks = chunk_segments(pages(), chunk_size=1000, chunk_overlap=200)
+    first_chunk, first_page = next(chunks)
+    # Le premier chunk est produit sans avoir lu tout le document
+    assert first_page == 1 and first_chunk.startswith("Page 1.")
+    assert len(consumed) < 10
+
+    rest = list(chunks)
+    assert all(len(chunk) <= 1000 for chunk, _ in rest)
+    pages_by_chunk = [page for _, page in [(first_chunk, first_page)] + rest]
+    assert pages_by_chunk == sorted(pages_by_chunk) and pages_by_chunk[-1] == 50
+    for chunk, page in rest:
+        if chunk.startswith("Page "):
+            assert chunk.startswith(f"Page {page}.")
+
+
+def test_pdf_is_extracted_page_by_page_and_temporary_file_removed(tmp_path):
+    path = tmp_path / "manuel.pdf"
+    with fitz.open() as pdf:
+        for number in range(1, 4):
+            pdf.new_page().insert_text((72, 72), f"Chapitre {number} " + "texte " * 10)
+        pdf.save(str(path))
+
+    parsed = extract_document_chunks("FINA/manuel.pdf", DownloadedFile(str(path), True),
+                                     chunk_size=80, chunk_overlap=0)
+
+    assert not path.exists()
+    assert [page for chunk, page in zip(parsed.chunks, parsed.pages) if chunk.startswith("Chapitre")] == [1, 2, 3]
+    assert len(parsed.sha256) == 64
+
+
+def test_txt_blocks_are_joined_without_cutting_words(tmp_path):
+    # 6 caractères par mot: les blocs de READ_BLOCK_SIZE caractères coupent des mots
+    path = tmp_path / "long.txt"
+    path.write_text("motif " * (3 * READ_BLOCK_SIZE // 6), encoding="utf-8")
+
+    parsed = extract_document_chunks("FINA/long.txt", str(path), chunk_size=1000, chunk_overlap=200)
+
+    assert {word for chunk in parsed.chunks for word in chunk.split()} == {"motif"}
+    assert parse_document("FINA/long.txt", str(path)).split() == ["motif"] * (3 * READ_BLOCK_SIZE // 6)
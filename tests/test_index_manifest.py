@@ -0,0 +1,85 @@
+import numpy as np
+
+from src.index_manifest import IncrementalCorpus, IndexManifest, content_hash
+
+SETTINGS = {"embedding_model": "test", "chunk_size": 1000, "chunk_overlap": 200}
+
+
+class CountingEmbedder:
+    def __init__(self):
+        self.encoded = []
+
+    def __call__(self, chunks):
+        self.encoded.extend(chunks)
+        return np.array([[float(len(c)), 1.0] for c in chunks], dtype="float32")
+
+
+def build(sources, previous=None, embed=None):
+    """sources: {clé: (version, texte)}; chaque texte donne un chunk par ligne."""
+    embed = embed or CountingEmbedder()
+    if previous is None:
+        corpus = IncrementalCorpus(IndexManifest(SETTINGS))
+    else:
+        chunks, metadata, embeddings, manifest = previous
+        corpus = IncrementalCorpus.from_artifacts(manifest, chunks, metadata, embeddings)
+    for key, (version, text) in sources.items():
+        if corpus.unchanged(key, version):
+            continue
+        chunks = text.splitlines()
+        metadata = [{"title": key, "chunk_id": i} for i in range(len(chunks))]
+        corpus.add(key, version, content_hash(text), chunks, metadata, embed)
+    return corpus, embed
+
+
+def test_unchanged_sources_are_not_reencoded_and_removed_ones_are_dropped(tmp_path):
+    first, _ = build({"a": ("v1", "a1\na2"), "b": ("v1", "b1"), "c": ("v1", "c1\nc2\nc3")})
+    previous = first.result()
+    previous[3].save(str(tmp_path / "manifest.json"))
+    manifest = IndexManifest.load(str(tmp_path / "manifest.json"), SETTINGS)
+
+    corpus, embed = build({"a": ("v1", "a1\na2"), "c": ("v2", "c1\nc2 modifié"), "d": ("v1", "d1")},
+                          previous[:3] + (manifest,))
+    chunks, metadata, embeddings, new_manifest = corpus.result()
+
+    assert embed.encoded == ["c1", "c2 modifié", "d1"]
+    assert corpus.stats == {"unchanged": 1, "added": 1, "changed": 1, "removed": 1}
+    assert chunks == ["a1", "a2", "c1", "c2 modifié", "d1"]
+    assert [meta["title"] for meta in metadata] == ["a", "a", "c", "c", "d"]
+    assert embeddings.shape == (5, 2)
+    for key, entry in new_manifest.sources.items():
+        assert all(meta["title"] == key for meta in metadata[entry["start"]:entry["end"]])
+    np.testing.assert_array_equal(embeddings[:2], previous[2][:2])
+
+
+def test_new_version_with_same_text_reuses_vectors(tmp_path):
+    previous = build({"a": ("etag-1", "a1\na2")})[0].result()
+    corpus, embed = build({"a": ("etag-2", "a1\na2")}, previous)
+
+    assert embed.encoded == []
+    assert corpus.modified
+    assert corpus.result()[3].get("a")["version"] == "etag-2"
+
+    # Rien n'a changé: pas besoin de réécrire les artefacts
+    corpus, _ = build({"a": ("etag-1", "a1\na2")}, previous)
+    assert not corpus.modified
+
+
+def test_incompatible_manifest_or_artifacts_force_full_rebuild(tmp_path):
+    chunks, metadata, embeddings, manifest = build({"a": ("v1", "a1\na2")})[0].result()
+    path = str(tmp_path / "manifest.json")
+    manifest.save(path)
+
+    assert len(IndexManifest.load(path, dict(SETTINGS, embedding_model="autre"))) == 0
+    corpus = IncrementalCorpus.from_artifacts(manifest, chunks[:1], metadata[:1], embeddings[:1])
+    assert not corpus.unchanged("a", "v1")
+
+
+def test_derived_settings_roundtrip_without_invalidating_sources(tmp_path):
+    manifest = build({"a": ("v1", "a1\na2")})[0].result()[3]
+    manifest.derived = {"index": {"index_type": "hnsw", "M": 32}, "urls_sha256": "abc"}
+    path = str(tmp_path / "manifest.json")
+    manifest.save(path)
+
+    loaded = IndexManifest.load(path, SETTINGS)
+    assert loaded.derived == manifest.derived
+    assert loaded.get("a") == manifest.get("a")
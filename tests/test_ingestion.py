@@ -0,0 +1,85 @@
+import os
+import signal
+import time
+
+import pytest
+
+# Dépendances d'extraction (OCR, Office) non requises par les autres tests
+for module in ("pytesseract", "docx", "pandas", "cv2"):
+    pytest.importorskip(module)
+
+from src import ingestion
+
+
+def make_documents(root):
+    for folder, names in {"": ["b.txt", "a.txt"], "FINA": ["c.txt", "vide.txt"]}.items():
+        os.makedirs(os.path.join(root, folder), exist_ok=True)
+        for name in names:
+            with open(os.path.join(root, folder, name), "w", encoding="utf-8") as f:
+                f.write("" if name == "vide.txt" else f"Contenu de {name}\n" * 20)
+
+
+def processed_tree(root):
+    tree = {}
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            with open(os.path.join(dirpath, name), encoding="utf-8") as f:
+                lines = [line for line in f if not line.startswith("DATE_EXTRACTION")]
+            tree[os.path.relpath(os.path.join(dirpath, name), root)] = lines
+    return tree
+
+
+def run(tmp_path, monkeypatch, label, **kwargs):
+    doc_dir, processed_dir = tmp_path / "documents", tmp_path / label
+    if not doc_dir.exists():
+        make_documents(str(doc_dir))
+    processed_dir.mkdir()
+    monkeypatch.setattr(ingestion, "DOC_DIR", str(doc_dir))
+    monkeypatch.setattr(ingestion, "PROCESSED_DIR", str(processed_dir))
+    return ingestion.process_documents(url_mappings={}, **kwargs), processed_tree(str(processed_dir))
+
+
+def test_process_pool_output_matches_sequential_run(tmp_path, monkeypatch):
+    sequential_stats, sequential_tree = run(tmp_path, monkeypatch, "sequential", workers=1)
+    parallel_stats, parallel_tree = run(tmp_path, monkeypatch, "parallel", workers=3)
+
+    assert parallel_tree == sequential_tree
+    assert len(parallel_tree) == 3
+    for key in ("total", "processed", "success", "timeouts", "formats"):
+        assert parallel_stats[key] == sequential_stats[key]
+    assert parallel_stats["workers"] == 3
+
+
+def test_slow_file_is_reported_as_timeout(tmp_path, monkeypatch):
+    original = ingestion.extract_text
+
+    def slow_extract(file_path):
+        if file_path.endswith("c.txt"):
+            time.sleep(5)
+        return original(file_path)
+
+    monkeypatch.setattr(ingestion, "extract_text", slow_extract)
+    stats, tree = run(tmp_path, monkeypatch, "timeout", workers=1, timeout=0.2)
+
+    assert stats["timeouts"] == 1
+    assert stats["success"] == 2
+    assert "c.txt" not in tree
+
+
+def hanging_extract(file_path, timeout=None):
+    # Extraction bloquée qui ignore SIGALRM (ex. code natif): seul le processus principal peut l'arrêter
+    if file_path.endswith("c.txt"):
+        signal.signal(signal.SIGALRM, signal.SIG_IGN)
+        time.sleep(60)
+    return ingestion.extract_text_with_timeout(file_path, timeout)
+
+
+def test_hung_worker_is_terminated_and_pool_recreated(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion, "extract_text_with_timeout", hanging_extract)
+    start = time.monotonic()
+    stats, tree = run(tmp_path, monkeypatch, "hung", workers=2, timeout=0.1)
+
+    assert time.monotonic() - start < 30
+    assert stats["timeouts"] == 1
+    assert stats["success"] == 2
+    assert "c.txt" not in "".join(tree)
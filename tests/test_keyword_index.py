@@ -0,0 +1,64 @@
+from src.keyword_index import KeywordIndex, corpus_fingerprint, normalize_text, tokenize
+
+
+CHUNKS = [
+    "Pour transformer une demande d'achat en devis, ouvrez la demande.",
+    "La création d'une commande passe par le catalogue des achats.",
+    "Les fournisseurs répondent à une demande de devis depuis le portail.",
+]
+METADATA = [
+    {"title": "Afpa - Demande d'achat"},
+    {"title": "Afpa - Création de commande"},
+    {"title": "Fournisseurs - Répondre à une demande de devis"},
+]
+
+
+def test_normalize_text_folds_case_accents_and_ligatures():
+    assert normalize_text("Création ÉCRAN cœur uƟliser") == "creation ecran coeur utiliser"
+
+
+def test_tokenize_drops_short_words_and_plurals():
+    assert tokenize("Les achats du catalogue") == ["achat", "catalogue"]
+
+
+def test_search_only_returns_matching_chunks_with_bounded_scores():
+    kw_index = KeywordIndex.build(CHUNKS, METADATA)
+    results = kw_index.search("creation commande")
+    assert [idx for idx, _ in results] == [1]
+    assert results[0][1] == 1.0
+
+
+def test_title_match_ranks_first_and_index_roundtrips(tmp_path):
+    kw_index = KeywordIndex.build(CHUNKS, METADATA)
+    path = tmp_path / "keywords.pkl"
+    kw_index.save(str(path))
+    loaded = KeywordIndex.load(str(path))
+
+    results = loaded.search("répondre devis")
+    assert results[0][0] == 2
+    assert all(0 < score <= 1.0 for _, score in results)
+    assert loaded.n_docs == len(CHUNKS)
+    assert loaded.fingerprint == corpus_fingerprint(CHUNKS, METADATA)
+
+
+def test_normalized_corpus_is_a_contiguous_token_buffer():
+    corpus = KeywordIndex.build(CHUNKS, METADATA).corpus
+    assert len(corpus) == len(CHUNKS)
+    assert corpus.content_offsets[-1] == len(corpus.content_tokens)
+    start, end = corpus.content_offsets[1], corpus.content_offsets[2]
+    assert [corpus.vocab[i] for i in corpus.content_tokens[start:end]] == tokenize(CHUNKS[1])
+
+
+def test_search_batch_matches_search_for_each_query():
+    kw_index = KeywordIndex.build(CHUNKS, METADATA)
+    queries = ["répondre devis", "devis", "", "introuvable"]
+
+    assert kw_index.search_batch(queries, top_k=3) == [kw_index.search(q, top_k=3) for q in queries]
+    assert kw_index.search_batch(queries)[2:] == [[], []]
+
+
+def test_fingerprint_changes_with_content_at_constant_size():
+    edited = CHUNKS[:2] + ["Les fournisseurs consultent leurs commandes depuis le portail."]
+    assert corpus_fingerprint(edited, METADATA) != corpus_fingerprint(CHUNKS, METADATA)
+    renamed = METADATA[:2] + [{"title": "Fournisseurs - Portail"}]
+    assert corpus_fingerprint(CHUNKS, renamed) != corpus_fingerprint(CHUNKS, METADATA)
@@ -0,0 +1,141 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from src import llm
+from src.caching import ResponseCache
+
+
+class StubClient:
+    """Client local qui remplace ChatCompletionsClient et compte les appels."""
+
+    def __init__(self):
+        self.calls = []
+
+    def complete(self, messages, model, stream=False, **kwargs):
+        self.calls.append((messages, model))
+        content = f"<p>Réponse {len(self.calls)}</p>"
+        if stream:
+            return iter([
+                SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=part))])
+                for part in (content[:3], content[3:])
+            ] + [SimpleNamespace(choices=[])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+DOCUMENTS = [
+    {"title": "Afpa - Demande d'achat", "category": "FINA", "extract": "...", "chunk_index": 3},
+    {"title": "Afpa - Devis", "category": "FINA", "extract": "...", "chunk_index": 7},
+]
+
+
+def test_identical_question_and_documents_hit_the_cache():
+    client = StubClient()
+    cache = ResponseCache(maxsize=8)
+
+    first = llm.generate_response("Transformer une DA en devis", DOCUMENTS, client, "gpt-4o", cache=cache)
+    second = llm.generate_response("transformer une  DA en devis", DOCUMENTS, client, "gpt-4o", cache=cache)
+
+    assert first == second
+    assert len(client.calls) == 1
+
+
+def test_cache_key_includes_documents_deployment_and_artifact_version():
+    client = StubClient()
+    cache = ResponseCache(maxsize=8)
+    query = "Transformer une DA en devis"
+
+    llm.generate_response(query, DOCUMENTS, client, "gpt-4o", cache=cache, artifact_version="v1")
+    llm.generate_response(query, DOCUMENTS[::-1], client, "gpt-4o", cache=cache, artifact_version="v1")
+    llm.generate_response(query, DOCUMENTS, client, "gpt-4o-mini", cache=cache, artifact_version="v1")
+    llm.generate_response(query, DOCUMENTS, client, "gpt-4o", cache=cache, artifact_version="v2")
+
+    assert len(client.calls) == 4
+
+
+def test_near_duplicate_question_reuses_answer_above_threshold():
+    client = StubClient()
+    cache = ResponseCache(maxsize=8, similarity_threshold=0.95)
+    vector = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    close = np.array([0.99, 0.05, 0.0], dtype=np.float32)
+    far = np.array([0.5, 0.8, 0.0], dtype=np.float32)
+
+    llm.generate_response("Comment créer une DA ?", DOCUMENTS, client, "gpt-4o", cache=cache, query_vector=vector)
+    llm.generate_response("Comment faire une DA ?", DOCUMENTS, client, "gpt-4o", cache=cache, query_vector=close)
+    assert len(client.calls) == 1
+
+    llm.generate_response("Qui valide une DA ?", DOCUMENTS, client, "gpt-4o", cache=cache, query_vector=far)
+    assert len(client.calls) == 2
+    assert cache.stats()["semantic_hits"] == 1
+
+
+def test_clear_invalidates_cached_answers():
+    client = StubClient()
+    cache = ResponseCache(maxsize=8)
+    llm.generate_response("question", DOCUMENTS, client, "gpt-4o", cache=cache)
+    cache.clear()
+    llm.generate_response("question", DOCUMENTS, client, "gpt-4o", cache=cache)
+    assert len(client.calls) == 2
+
+
+def test_stream_response_yields_tokens_then_serves_cached_answer():
+    client = StubClient()
+    cache = ResponseCache(maxsize=8)
+
+    streamed = list(llm.stream_response("question", DOCUMENTS, client, "gpt-4o", cache=cache))
+    assert streamed == ["<p>", "Réponse 1</p>"]
+
+    assert list(llm.stream_response("question", DOCUMENTS, client, "gpt-4o", cache=cache)) == ["<p>Réponse 1</p>"]
+    assert len(client.calls) == 1
+
+
+def test_usage_is_reported_for_llm_calls_but_not_cache_hits():
+    class UsageClient(StubClient):
+        def complete(self, messages, model, stream=False, **kwargs):
+            response = super().complete(messages, model, **kwargs)
+            response.usage = SimpleNamespace(prompt_tokens=120, completion_tokens=30)
+            return response
+
+    usages = []
+    cache = ResponseCache(maxsize=8)
+    for _ in range(2):
+        llm.generate_response("Transformer une DA en devis", DOCUMENTS, UsageClient(), "gpt-4o",
+                              cache=cache, on_usage=usages.append)
+
+    assert [(u.prompt_tokens, u.completion_tokens) for u in usages] == [(120, 30)]
+
+
+def test_client_manager_reuses_one_client_per_process():
+    manager = llm.ChatClientManager(endpoint="http://127.0.0.1:9", api_key="fake")
+    assert manager.get_client() is manager.get_client()
+
+
+def test_client_manager_enforces_concurrency_limit():
+    manager = llm.ChatClientManager(endpoint="http://127.0.0.1:9", api_key="fake",
+                                    max_concurrency=1, acquire_timeout=0.01)
+    manager._semaphore.acquire()
+    try:
+        with pytest.raises(llm.LLMBusyError):
+            manager.complete(messages=[], model="gpt-4o")
+    finally:
+        manager._semaphore.release()
+
+
+def test_async_client_manager_closes_client_of_previous_event_loop(monkeypatch):
+    class FakeAsyncClient:
+        def __init__(self, **kwargs):
+            self.closed = False
+
+        async def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(llm, "AsyncChatCompletionsClient", FakeAsyncClient)
+    manager = llm.AsyncChatClientManager(endpoint="http://127.0.0.1:9", api_key="fake")
+
+    first = asyncio.run(manager.get_client())
+    second = asyncio.run(manager.get_client())
+
+    assert second is not first
+    assert first.closed and not second.closed
@@ -0,0 +1,95 @@
+import io
+import json
+import logging
+import queue
+
+import pytest
+
+from src import log_config
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    log_config.stop_logging()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+    logging.getLogger("tests.llm").setLevel(logging.NOTSET)
+
+
+def make_record(msg, args=(), level=logging.INFO, **extra):
+    record = logging.LogRecord("app_unified", level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_formatter_truncates_message_and_keeps_extra_fields():
+    formatter = log_config.JsonFormatter(max_length=10)
+    entry = json.loads(formatter.format(make_record("Contexte: %s", ("x" * 50,), request_id="abc")))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "app_unified"
+    assert entry["message"] == "Contexte: ... [+50 caractères]"
+    assert entry["request_id"] == "abc"
+
+
+def test_pipeline_writes_json_lines_with_per_logger_levels(restore_logging):
+    stream = io.StringIO()
+    log_config.configure_logging(level="INFO", logger_levels={"tests.llm": "WARNING"}, log_format="json",
+                                 max_length=100, sampling={}, stream=stream)
+    logging.getLogger("tests.app").info("Requête reçue: %s", "devis")
+    logging.getLogger("tests.llm").info("Contexte complet")  # Sous le niveau du logger: ignoré
+    logging.getLogger("tests.llm").warning("Réponse lente")
+    log_config.stop_logging()  # Écrit les messages en attente
+
+    entries = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(e["logger"], e["message"]) for e in entries] == [
+        ("tests.app", "Requête reçue: devis"),
+        ("tests.llm", "Réponse lente"),
+    ]
+
+
+def test_handler_defers_formatting_to_the_listener():
+    handler = log_config.NonBlockingQueueHandler(queue.Queue())
+    record = make_record("Réponse: %s", ("texte",))
+    handler.handle(record)
+
+    queued = handler.queue.get_nowait()
+    assert queued is not record
+    assert queued.msg == "Réponse: %s" and queued.args == ("texte",)
+
+
+def test_full_queue_drops_records_without_blocking_and_reports_them():
+    handler = log_config.NonBlockingQueueHandler(queue.Queue(maxsize=1))
+    for i in range(3):
+        handler.handle(make_record("message %d", (i,)))
+    assert handler.dropped == 2
+
+    handler.queue.get_nowait()
+    handler.queue = queue.Queue(maxsize=2)
+    handler.handle(make_record("suivant"))
+    report, record = handler.queue.get_nowait(), handler.queue.get_nowait()
+    assert report.levelno == logging.WARNING
+    assert report.getMessage() == "2 messages de log abandonnés (file pleine)"
+    assert record.getMessage() == "suivant"
+
+
+def test_sampling_keeps_a_share_of_low_levels_and_all_warnings():
+    draws = iter([0.5, 0.005, 0.5])
+    sampler = log_config.SamplingFilter(log_config.parse_sampling("DEBUG=0.01"), random_fn=lambda: next(draws))
+
+    assert not sampler.filter(make_record("a", level=logging.DEBUG))
+    assert sampler.filter(make_record("b", level=logging.DEBUG))
+    assert sampler.filter(make_record("c", level=logging.INFO))
+    assert sampler.filter(make_record("d", level=logging.ERROR))
+
+
+def test_parse_levels_rejects_unknown_level():
+    assert log_config.parse_levels("llm=debug, azure=WARNING") == {"llm": "DEBUG", "azure": "WARNING"}
+    with pytest.raises(ValueError):
+        log_config.parse_levels("llm=VERBOSE")
@@ -0,0 +1,111 @@
+import json
+import os
+
+import pytest
+
+from src import metrics
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_stage_timer_formats_server_timing_in_order():
+    clock = FakeClock()
+    timer = metrics.StageTimer(clock=clock)
+    with timer.stage("encode"):
+        clock.now += 0.004
+    with timer.stage("faiss"):
+        clock.now += 0.0015
+    with timer.stage("encode"):  # Une étape répétée cumule ses durées
+        clock.now += 0.001
+
+    assert timer.stages == pytest.approx({"encode": 0.005, "faiss": 0.0015})
+    assert timer.server_timing() == "encode;dur=5.00, faiss;dur=1.50, total;dur=6.50"
+
+
+def test_stage_timer_records_stage_that_raises():
+    clock = FakeClock()
+    timer = metrics.StageTimer(clock=clock)
+    with pytest.raises(RuntimeError):
+        with timer.stage("llm"):
+            clock.now += 2
+            raise RuntimeError("Azure indisponible")
+    assert timer.stages == {"llm": 2}
+
+
+def test_null_timer_records_nothing():
+    with metrics.NULL_TIMER.stage("encode"):
+        pass
+    assert metrics.NULL_TIMER.stages == {}
+    assert metrics.NULL_TIMER.server_timing() == ""
+
+
+def test_render_counters_and_cumulative_histograms():
+    registry = metrics.Registry()
+    requests_total = registry.counter("requests_total", "Requêtes", ("endpoint", "status"))
+    duration = registry.histogram("duration_seconds", "Durée", ("stage",), buckets=(0.01, 0.1))
+    requests_total.inc(endpoint="/search", status=200)
+    requests_total.inc(2, endpoint="/search", status=200)
+    for value in (0.005, 0.05, 0.5):
+        duration.observe(value, stage="faiss")
+
+    text = metrics.render(registry.collect())
+
+    assert "# TYPE requests_total counter" in text
+    assert 'requests_total{endpoint="/search",status="200"} 3' in text
+    assert "# TYPE duration_seconds histogram" in text
+    assert 'duration_seconds_bucket{stage="faiss",le="0.01"} 1' in text
+    assert 'duration_seconds_bucket{stage="faiss",le="0.1"} 2' in text
+    assert 'duration_seconds_bucket{stage="faiss",le="+Inf"} 3' in text
+    assert 'duration_seconds_sum{stage="faiss"} 0.555' in text
+    assert 'duration_seconds_count{stage="faiss"} 3' in text
+
+
+def test_labels_are_checked_and_escaped():
+    registry = metrics.Registry()
+    counter = registry.counter("errors_total", "Erreurs", ("endpoint",))
+    with pytest.raises(ValueError):
+        counter.inc(stage="encode")
+    counter.inc(endpoint='a"b\\c')
+    assert 'errors_total{endpoint="a\\"b\\\\c"} 1' in metrics.render(registry.collect())
+
+
+def test_callback_metric_reads_values_at_collection():
+    stats = {"hits": 1}
+    registry = metrics.Registry()
+    registry.callback("cache_requests_total", "Caches", lambda: {("query", "hit"): stats["hits"]},
+                      ("cache", "result"))
+    stats["hits"] = 5
+    assert 'cache_requests_total{cache="query",result="hit"} 5' in metrics.render(registry.collect())
+
+
+def test_metrics_files_sum_all_workers(tmp_path):
+    directory = str(tmp_path)
+    # Un autre worker (même registre, autre pid) a déjà écrit ses valeurs
+    other = metrics.Registry()
+    other.counter("requests_total", "Requêtes", ("status",)).inc(3, status=200)
+    other.histogram("duration_seconds", "Durée", buckets=(1.0,)).observe(0.5)
+    with open(os.path.join(directory, "metrics-999999.json"), "w", encoding="utf-8") as f:
+        json.dump(other.collect(), f)
+
+    registry = metrics.Registry()
+    registry.counter("requests_total", "Requêtes", ("status",)).inc(2, status=200)
+    registry.histogram("duration_seconds", "Durée", buckets=(1.0,)).observe(2.0)
+    files = metrics.MetricsFiles(directory, registry)
+
+    text = metrics.render(metrics.merge_states(files.collect()))
+    assert 'requests_total{status="200"} 5' in text
+    assert 'duration_seconds_bucket{le="1"} 1' in text
+    assert 'duration_seconds_count 2' in text
+
+    # Le fichier du processus courant est ignoré au profit de ses valeurs en mémoire
+    files.write()
+    assert 'requests_total{status="200"} 5' in metrics.render(metrics.merge_states(files.collect()))
+
+    metrics.clear_directory(directory)
+    assert os.listdir(directory) == []
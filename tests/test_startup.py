@@ -0,0 +1,46 @@
+import threading
+
+from src.startup import Startup
+
+
+def test_tasks_load_concurrently_in_background():
+    both_started = threading.Barrier(2, timeout=5)
+    release = threading.Event()
+
+    def task():
+        both_started.wait()  # Échoue si les tâches s'exécutent l'une après l'autre
+        release.wait(5)
+
+    startup = Startup({"model": task, "artifacts": task}).start()
+    # start() rend la main immédiatement
+    assert not startup.ready
+    assert startup.report()["status"] == "loading"
+
+    release.set()
+    assert startup.wait(5)
+    report = startup.report()
+    assert report["status"] == "ready"
+    assert set(report["components"]) == {"model", "artifacts"}
+    assert all(component["status"] == "ready" for component in report["components"].values())
+
+
+def test_failure_is_reported_and_restart_only_reruns_failed_tasks():
+    calls = {"model": 0, "artifacts": 0}
+
+    def model():
+        calls["model"] += 1
+
+    def artifacts():
+        calls["artifacts"] += 1
+        if calls["artifacts"] == 1:
+            raise FileNotFoundError("models/unified_index.bin")
+
+    startup = Startup({"model": model, "artifacts": artifacts})
+    assert not startup.wait(5)
+    report = startup.report()
+    assert report["status"] == "failed"
+    assert "FileNotFoundError" in report["components"]["artifacts"]["error"]
+
+    startup.restart()
+    assert startup.wait(5)
+    assert calls == {"model": 1, "artifacts": 2}